@@ -0,0 +1,75 @@
+import numpy as np
+
+
+class StreamingAccumulator:
+    """
+    Folds frames in one at a time: int64 running sum (float64 for float frames) plus Welford running mean / variance.
+    Memory stays at a few frame-sized arrays no matter how many frames are added.
+    """
+
+    def __init__(self, track_max=False):
+        self.track_max = track_max    # per-pixel maximum, needed for cosmic ray rejection (cosmic.py)
+        self.count = 0
+        self.sum = None
+        self.mean = None
+        self.m2 = None
+        self.max = None
+        self._delta = None
+        self._tmp = None
+
+    def reset(self, shape, sum_dtype=np.int64):
+        """
+        Start a new acquisition. Result arrays are new so earlier results can still be saved in the background
+        """
+        self.count = 0
+        self.sum = np.zeros(shape, dtype=sum_dtype)
+        self.mean = np.zeros(shape, dtype=np.float64)
+        self.m2 = np.zeros(shape, dtype=np.float64)
+        self.max = None
+        if self._delta is None or self._delta.shape != tuple(shape):
+            self._delta = np.empty(shape, dtype=np.float64)
+            self._tmp = np.empty(shape, dtype=np.float64)
+
+    def clear(self):
+        self.count = 0
+        self.sum = self.mean = self.m2 = self.max = None
+
+    def set_total(self, total, count):
+        """
+        Result of a sum made elsewhere (camera on-board accumulation): sum and mean are set,
+        the per-frame spread is not known so variance() is unavailable until the next reset
+        """
+        self.reset(total.shape, np.float64 if total.dtype.kind == "f" else np.int64)
+        np.add(self.sum, total, out=self.sum)
+        self.count = count
+        np.divide(self.sum, count, out=self.mean)
+        self.m2 = None
+
+    def add(self, frame):
+        if self.sum is None or self.sum.shape != frame.shape:
+            self.reset(frame.shape, np.float64 if frame.dtype.kind == "f" else np.int64)
+        self.count += 1
+        np.add(self.sum, frame, out=self.sum)
+        if self.track_max:
+            if self.max is None:
+                self.max = frame.astype(self.sum.dtype)
+            else:
+                np.maximum(self.max, frame, out=self.max)
+
+        # Welford: mean += d / n, m2 += d * (x - new mean)
+        np.subtract(frame, self.mean, out=self._delta)
+        np.multiply(self._delta, 1.0 / self.count, out=self._tmp)
+        self.mean += self._tmp
+        np.subtract(frame, self.mean, out=self._tmp)
+        self._tmp *= self._delta
+        self.m2 += self._tmp
+
+    def variance(self, ddof=1):
+        if self.m2 is None:
+            raise ValueError("Variance is not available for an on-board accumulation")
+        if self.count <= ddof:
+            return np.zeros_like(self.mean)
+        return self.m2 / (self.count - ddof)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
@@ -0,0 +1,180 @@
+import json
+import numpy as np
+from pathlib import Path
+
+
+INDEX_DTYPE = np.dtype([
+    ("timestamp", "f8"),        # time.time() when the frame was stored
+    ("exposure", "f4"),         # s
+    ("temperature", "f4"),      # C
+    ("hbin", "u2"),
+    ("vbin", "u2"),
+    ("read_mode", "u1"),        # index in READ_MODES
+])
+READ_MODES = ["image", "fvb", "single_track"]
+
+
+class FrameArchive:
+    """
+    Append-only frame archive for long time series, one set of files per run:
+        <name>.frames   raw frames back to back (np.memmap, grows in blocks of grow_by frames)
+        <name>.index    one INDEX_DTYPE record per frame (np.memmap)
+        <name>.json     shape, dtype, number of frames and meta (run-wide info, e.g. spectrometer position and axis)
+
+    An existing archive is continued only with the same frame shape and meta (None: any meta), otherwise ValueError.
+
+    Appending writes straight into the mapped file, nothing is kept in RAM except the OS page cache.
+    Readers get copies of the frames they index, so any frame range can be read without loading the rest.
+    view() gives memmap slices without copying, they become invalid when the files grow or are closed
+    and (on Windows) a view still held then makes the resize fail.
+    """
+
+    def __init__(self, path, shape=None, dtype=np.uint16, grow_by=256, readonly=False, meta=None):
+        self.path = Path(path)
+        self.grow_by = grow_by
+        self.readonly = readonly
+        header = self.path.with_suffix(".json")
+
+        if header.exists():     # continue (or read) an existing archive
+            info = json.loads(header.read_text())
+            self.shape = tuple(info["shape"])
+            self.dtype = np.dtype(info["dtype"])
+            self.count = info["count"]
+            self.meta = info.get("meta", {})
+            if shape is not None and tuple(shape) != self.shape:
+                raise ValueError(f"Archive {self.path} holds frames of shape {self.shape}, not {tuple(shape)}")
+            if meta is not None and json.loads(json.dumps(meta)) != self.meta:     # compared as stored (tuples -> lists)
+                raise ValueError(f"Archive {self.path} was written with different meta, start a new archive")
+        else:
+            if readonly or shape is None:
+                raise FileNotFoundError(f"No archive at {self.path}")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.shape = tuple(shape)
+            self.dtype = np.dtype(dtype)
+            self.count = 0
+            self.meta = meta or {}
+
+        self.frame_size = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.capacity = 0
+        self._frames = None
+        self._index = None
+        self._map(max(self.count, 0 if readonly else grow_by))
+        if not readonly:
+            self._write_header()
+
+    # ===== FILES =====
+
+    def _map(self, capacity):
+        """
+        (Re)map both files with room for capacity frames, files are extended as needed
+        """
+        self._frames = self._index = None     # drop old maps before resizing
+        if not self.readonly:
+            for suffix, size in ((".frames", self.frame_size), (".index", INDEX_DTYPE.itemsize)):
+                file = self.path.with_suffix(suffix)
+                with open(file, "ab") as f:
+                    if f.tell() < capacity * size:
+                        try:
+                            f.truncate(capacity * size)
+                        except OSError as e:    # Windows: a mapped file can't be resized while views exist
+                            raise RuntimeError(f"Archive {self.path} can't grow while views of it are held, "
+                                               f"release the arrays from view() / next_slot()") from e
+        self.capacity = capacity
+        if capacity == 0:
+            return
+        mode = "r" if self.readonly else "r+"
+        self._frames = np.memmap(self.path.with_suffix(".frames"), dtype=self.dtype, mode=mode, shape=(capacity,) + self.shape)
+        self._index = np.memmap(self.path.with_suffix(".index"), dtype=INDEX_DTYPE, mode=mode, shape=(capacity,))
+
+    def _write_header(self):
+        info = {"shape": list(self.shape), "dtype": self.dtype.str, "count": self.count, "meta": self.meta}
+        self.path.with_suffix(".json").write_text(json.dumps(info))
+
+    def flush(self):
+        if self.readonly or self._frames is None:
+            return
+        self._frames.flush()
+        self._index.flush()
+        self._write_header()
+
+    def close(self):
+        """
+        Flush and cut the files down to the stored frames
+        """
+        if self.readonly:
+            self._frames = self._index = None
+            return
+        self.flush()
+        self._frames = self._index = None
+        try:
+            for suffix, size in ((".frames", self.frame_size), (".index", INDEX_DTYPE.itemsize)):
+                with open(self.path.with_suffix(suffix), "r+b") as f:
+                    f.truncate(self.count * size)
+        except OSError as e:    # views still held (Windows), the header count marks where the frames end
+            print(f"Archive {self.path} left at {self.capacity} frame slots ({self.count} stored): {e}")
+            return
+        self.capacity = self.count
+
+    # ===== WRITING =====
+
+    def next_slot(self):
+        """
+        Writable view of the next frame in the file, for producers that can fill it in place
+        Call commit() once it is filled
+        """
+        if self.count >= self.capacity:
+            self._map(self.capacity + self.grow_by)
+        return self._frames[self.count]
+
+    def commit(self, timestamp, exposure=np.nan, temperature=np.nan, hbin=1, vbin=1, read_mode="image"):
+        self._index[self.count] = (timestamp, exposure, temperature, hbin, vbin, READ_MODES.index(read_mode))
+        self.count += 1
+
+    def append(self, frame, timestamp, **settings):
+        """
+        Copy one frame into the file (no intermediate buffers), settings go to the index
+        """
+        frame = np.asarray(frame)
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match the archive {self.shape}")
+        np.copyto(self.next_slot(), frame, casting="same_kind")
+        self.commit(timestamp, **settings)
+
+    # ===== READING =====
+
+    def __len__(self):
+        return self.count
+
+    def view(self, item=slice(None)):
+        """
+        Memmap view of stored frames, nothing is read until used
+        Invalid after the archive grows or is closed, don't keep it across appends
+        """
+        if self._frames is None:    # read-only archive without frames
+            return np.empty((0,) + self.shape, dtype=self.dtype)[item]
+        return self._frames[:self.count][item]
+
+    def __getitem__(self, item):
+        """
+        archive[i] / archive[a:b] / archive[[i, j]]: stored frames copied into memory (only the indexed ones are read)
+        """
+        return np.array(self.view(item))
+
+    def read(self, start=0, stop=None):
+        """
+        Frames start..stop copied into memory
+        """
+        return self[start:stop]
+
+    @property
+    def index(self):
+        if self._index is None:
+            return np.empty(0, dtype=INDEX_DTYPE)
+        return np.array(self._index[:self.count])    # copy, like the frames
+
+    @classmethod
+    def open(cls, path):
+        """
+        Read-only access, also while another process is still appending (sees frames up to its last flush)
+        """
+        return cls(path, readonly=True)
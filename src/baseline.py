@@ -0,0 +1,119 @@
+import numpy as np
+
+
+class BaselineCorrector:
+    """
+    Fluorescence background removal for single spectra (n,) or stacks (N, n).
+
+    "asls": asymmetric least squares (Eilers & Boelens), smoothness lam, asymmetry p.
+            A stack is solved as one block-diagonal banded system per iteration, the banded
+            lam * D'D penalty is built once per (N, n, lam) and reused.
+    "poly": iterative polynomial fit of the points below the current fit (modpoly).
+            The least squares pseudo-inverse is computed once per (n, order), a stack is fitted with one matmul.
+    """
+
+    def __init__(self, method="asls", lam=1e6, p=0.01, niter=10, order=3, poly_iter=30, max_entries=8):
+        self.method = method
+        self.lam = lam
+        self.p = p
+        self.niter = niter
+        self.order = order
+        self.poly_iter = poly_iter
+        self.max_entries = max_entries
+        self._penalty = {}
+        self._pinv = {}
+
+    def _cache(self, cache, key, value):
+        if len(cache) >= self.max_entries:
+            cache.pop(next(iter(cache)))
+        cache[key] = value
+        return value
+
+    # ===== ASLS =====
+
+    def _penalty_bands(self, count, n):
+        """
+        lam * D'D (D = second difference) for count independent spectra of length n,
+        upper banded form for solveh_banded: row 0 = 2nd superdiagonal, row 1 = 1st, row 2 = diagonal
+        """
+        key = (count, n, self.lam)
+        bands = self._penalty.get(key)
+        if bands is not None:
+            return bands
+
+        main = np.full(n, 6.0)
+        main[[0, -1]] = 1.0
+        main[[1, -2]] = 5.0
+        first = np.full(n, -4.0)
+        first[[1, -1]] = -2.0
+        first[0] = 0.0          # entry 0 of a superdiagonal row is unused, also no coupling to the previous spectrum
+        second = np.ones(n)
+        second[:2] = 0.0
+
+        bands = np.stack([np.tile(second, count), np.tile(first, count), np.tile(main, count)]) * self.lam
+        bands.flags.writeable = False
+        return self._cache(self._penalty, key, bands)
+
+    def _asls(self, y):
+        try:
+            from scipy.linalg import solveh_banded     # on first use, scipy.linalg takes ~0.3 s to import
+        except ImportError:     # polynomial baselines work with numpy only
+            raise ImportError("scipy is needed for the asls baseline, use method='poly' without it")
+        count, n = y.shape
+        penalty = self._penalty_bands(count, n)
+        flat = y.reshape(-1)
+        w = np.ones_like(flat)
+        ab = np.empty_like(penalty)
+        z = flat
+        for _ in range(self.niter):
+            ab[:] = penalty
+            ab[2] += w
+            z = solveh_banded(ab, w * flat, check_finite=False)
+            new_w = np.where(flat > z, self.p, 1 - self.p)
+            if np.array_equal(new_w, w):
+                break
+            w = new_w
+        return z.reshape(count, n)
+
+    # ===== POLYNOMIAL =====
+
+    def _poly_pinv(self, n):
+        key = (n, self.order)
+        pinv = self._pinv.get(key)
+        if pinv is None:
+            x = np.linspace(-1, 1, n)
+            vander = np.vander(x, self.order + 1)
+            pinv = self._cache(self._pinv, key, (vander, np.linalg.pinv(vander)))
+        return pinv
+
+    def _poly(self, y):
+        vander, pinv = self._poly_pinv(y.shape[1])
+        work = y.copy()
+        for _ in range(self.poly_iter):
+            fit = (work @ pinv.T) @ vander.T        # (N, n), one matmul pair for the whole stack
+            np.minimum(work, fit, out=work)         # peaks are pulled down to the fit, background stays
+        return fit
+
+    # ===== API =====
+
+    def baseline(self, spectra):
+        """
+        Baseline of (n,) or (N, n) spectra, float64, same shape
+        """
+        y = np.asarray(spectra, dtype=np.float64)
+        single = y.ndim == 1
+        y = np.atleast_2d(y)
+        if self.method == "asls":
+            z = self._asls(y)
+        elif self.method == "poly":
+            z = self._poly(y)
+        else:
+            raise ValueError(f"Unknown baseline method: {self.method}")
+        return z[0] if single else z
+
+    def correct(self, spectra):
+        """
+        spectra - baseline
+        """
+        y = np.asarray(spectra, dtype=np.float64)
+        return y - self.baseline(y)
@@ -0,0 +1,266 @@
+"""
+Headless benchmark of the acquire -> spectrum -> normalize -> render -> save chain on the simulated camera.
+
+    python benchmark.py --frames 500 --out bench.json
+    python benchmark.py --frames 500 --out bench_new.json --compare bench.json
+    python benchmark.py --startup
+
+Reports per-stage latency percentiles, sustained fps, memory high-water mark and bytes written.
+--startup instead measures the time until the main window is shown, with the import time per module.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from pathlib import Path
+from controller import RamanCameraController
+from test_cam import TestCameraModel
+from test_spec import TestSpectrometerModel
+
+try:
+    import resource     # not available on Windows
+except ImportError:
+    resource = None
+
+try:
+    from PyQt5.QtGui import QImage
+except ImportError:
+    QImage = None
+
+
+class StageTimer:
+    """
+    Collects latencies per named stage
+    """
+
+    def __init__(self):
+        self.samples = {}
+
+    def time(self, stage, func, *args, **kwargs):
+        t0 = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.samples.setdefault(stage, []).append(time.perf_counter() - t0)
+        return result
+
+    def summary(self):
+        out = {}
+        for stage, values in self.samples.items():
+            ms = np.array(values) * 1e3
+            out[stage] = {
+                "n": len(ms),
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p90_ms": float(np.percentile(ms, 90)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "max_ms": float(ms.max()),
+            }
+        return out
+
+
+def render(frame8, h, w):
+    # what display_image does before scaling, without needing a window
+    return QImage(frame8.data, w, h, w, QImage.Format_Grayscale8).copy()
+
+
+def run_live(ctrl, timer, n_frames):
+    """
+    Live chain: read -> spectrum -> normalize -> render, like LiveWorker + update_preview
+    """
+    camera = ctrl.camera
+    ctrl.start_live()
+    t0 = time.perf_counter()
+    done = 0
+    while done < n_frames:
+        frame = timer.time("live_read", ctrl.wait_live_frame, 1.0)
+        if frame is None:
+            continue
+        timer.time("spectrum", camera.frame_to_spectrum, frame)
+        frame8, h, w = timer.time("normalize", ctrl.adjust_frame, frame)
+        if QImage is not None:
+            timer.time("render", render, frame8, h, w)
+        ctrl.release_frame(frame)
+        done += 1
+    elapsed = time.perf_counter() - t0
+    ctrl.stop_live()
+    return done / elapsed
+
+
+def run_acquire_save(ctrl, timer, n_frames):
+    """
+    Acquisition chain: acquire_single -> save_results (queued) and the final flush
+    """
+    params = {"acq_mode": "single", "exposure": ctrl.camera.cam.get_exposure(), "hbin": 1, "vbin": 1, "roi": None, "temp": -80}
+    t0 = time.perf_counter()
+    for _ in range(n_frames):
+        frame, spectrum = timer.time("acquire_single", ctrl.acquire_data, params)
+        timer.time("save_submit", ctrl.save_results, params, frame, spectrum)
+    timer.time("save_flush", ctrl.flush_writer)
+    elapsed = time.perf_counter() - t0
+    return n_frames / elapsed
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def run(n_frames=200, realtime=False, exposure=0.01, storage="h5", compression=None):
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory() as tmp:
+        camera = TestCameraModel(realtime=realtime, seed=0)
+        camera.set_save_path(tmp)
+        camera.storage_backend = storage
+        camera.storage_compression = compression
+        ctrl = RamanCameraController(view=None, camera=camera, spec=TestSpectrometerModel())
+        camera.connect_cam()
+        camera.load_capabilities()
+        camera.set_default_settings()
+
+        tracemalloc.start()
+        live_fps = run_live(ctrl, timer, n_frames)
+        camera.settings.apply(exposure=exposure)
+        acq_fps = run_acquire_save(ctrl, timer, n_frames)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        bytes_written = 0
+        if camera.storage:
+            camera.storage.flush()
+            bytes_written = camera.storage.size()
+        writer = ctrl.get_writer_metrics()
+        ctrl.close_writer()
+        ctrl.disconnect_cam()
+
+    return {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"frames": n_frames, "realtime": realtime, "exposure_s": exposure, "storage": storage, "compression": compression},
+        "stages": timer.summary(),
+        "live_fps": live_fps,
+        "acquire_save_fps": acq_fps,
+        "python_peak_mb": peak / 2**20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10 if resource else None,
+        "bytes_written": bytes_written,
+        "writer": writer,
+    }
+
+
+# runs in a fresh interpreter, so nothing is imported yet
+STARTUP_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+import gui
+t_import = time.perf_counter()
+window = gui.MainWindow()
+window.show()
+app.processEvents()
+t_shown = time.perf_counter()
+print("STARTUP", json.dumps({"import_s": t_import - t0, "window_s": t_shown - t0, "modules": sorted(sys.modules)}), flush=True)
+"""
+
+# should only be imported once a device is connected / a plot is saved / the simulator is chosen
+DEFERRED = ["pylablib", "matplotlib", "scipy", "h5py", "unittest.mock", "test_cam", "test_spec", "simulator"]
+
+
+def startup_profile(top=15):
+    """
+    Time until the main window is on screen (from the first import), and the slowest imports on the way
+    """
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    with tempfile.TemporaryDirectory() as tmp:     # the window creates ./data, keep it out of the tree
+        env["PYTHONPATH"] = str(Path(__file__).parent)
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+                              cwd=tmp, env=env, capture_output=True, text=True)
+        wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"Startup script failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(next(line for line in proc.stdout.splitlines() if line.startswith("STARTUP "))[len("STARTUP "):])
+
+    imports = []    # (cumulative s, self s, module) of the top level imports and their direct imports
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:      # deeper imports are part of their parent's cumulative time
+            imports.append((int(cumulative) * 1e-6, int(own) * 1e-6, name.strip()))
+    imports.sort(reverse=True)
+
+    loaded = set(result["modules"])
+    return {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "process_s": wall,
+        "import_s": result["import_s"],
+        "window_s": result["window_s"],
+        "imports": [{"module": m, "cumulative_s": c, "self_s": o} for c, o, m in imports[:top]],
+        "deferred_loaded": [m for m in DEFERRED if m in loaded],
+    }
+
+
+def print_startup(result):
+    print(f"window shown after {result['window_s'] * 1e3:.0f} ms (imports {result['import_s'] * 1e3:.0f} ms, "
+          f"process {result['process_s'] * 1e3:.0f} ms)")
+    for entry in result["imports"]:
+        print(f"  {entry['module']:<32}{entry['cumulative_s'] * 1e3:8.1f} ms")
+    if result["deferred_loaded"]:
+        print(f"loaded at startup although only needed later: {', '.join(result['deferred_loaded'])}")
+
+
+def compare(old, new):
+    """
+    Print p50 latency change per stage between two result files
+    """
+    print(f"{'stage':<16}{'old p50':>10}{'new p50':>10}{'change':>10}")
+    for stage, s in new["stages"].items():
+        if stage not in old["stages"]:
+            continue
+        a, b = old["stages"][stage]["p50_ms"], s["p50_ms"]
+        print(f"{stage:<16}{a:>10.3f}{b:>10.3f}{(b - a) / a * 100 if a else 0:>9.1f}%")
+    print(f"{'live fps':<16}{old['live_fps']:>10.1f}{new['live_fps']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline benchmark on the simulated camera")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--exposure", type=float, default=0.01)
+    parser.add_argument("--realtime", action="store_true", help="wait for simulated exposure/readout")
+    parser.add_argument("--storage", default="h5", choices=["h5", "npz"])
+    parser.add_argument("--compression", default=None)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare against")
+    parser.add_argument("--startup", action="store_true", help="measure GUI startup instead of the pipeline")
+    args = parser.parse_args()
+
+    if args.startup:
+        result = startup_profile()
+        Path(args.out).write_text(json.dumps(result, indent=2))
+        print_startup(result)
+        return
+
+    result = run(args.frames, args.realtime, args.exposure, args.storage, args.compression)
+    Path(args.out).write_text(json.dumps(result, indent=2))
+
+    for stage, s in result["stages"].items():
+        print(f"{stage:<16} p50 {s['p50_ms']:8.3f} ms   p99 {s['p99_ms']:8.3f} ms")
+    print(f"live: {result['live_fps']:.1f} fps | acquire+save: {result['acquire_save_fps']:.1f} fps | "
+          f"peak {result['python_peak_mb']:.1f} MB | written {result['bytes_written'] / 2**20:.1f} MB")
+    print(f"Results saved to {args.out}")
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), result)
+
+
+if __name__ == "__main__":
+    main()
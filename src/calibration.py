@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class CalibrationCache:
+    """
+    Pixel -> wavelength / Raman shift axes for the spectra.
+
+    The Shamrock gives the wavelength of every detector column for the current grating and centre wavelength,
+    which is cropped / binned to the camera ROI here. Axes are kept per (grating, centre wavelength, ROI, hbin),
+    so after the first spectrum of a configuration every further one gets its axis from a dict lookup.
+    Must be invalidated whenever the spectrometer is moved (SpectrometerModel does this).
+    """
+
+    def __init__(self, laser_wavelength=785e-9, max_entries=32):
+        self.laser_wavelength = laser_wavelength    # m
+        self.max_entries = max_entries
+        self._axes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        self._axes.clear()
+
+    def set_laser_wavelength(self, wavelength):
+        """
+        Laser line in m, Raman shift axes are recomputed on next use
+        """
+        self.laser_wavelength = wavelength
+        self.invalidate()
+
+    def get(self, key, compute):
+        """
+        key: (grating, centre wavelength, (hstart, hend), hbin)
+        compute: called on a miss, returns the full-chip wavelength of every column in m
+        Returns {"wavelength_nm": ..., "raman_shift_cm1": ...} (shared, read-only arrays)
+        """
+        axis = self._axes.get(key)
+        if axis is not None:
+            self.hits += 1
+            return axis
+
+        self.misses += 1
+        _, _, (hstart, hend), hbin = key
+        wavelength = np.asarray(compute(), dtype=np.float64) * 1e9
+        nbins = (hend - hstart) // hbin
+        # centre of each superpixel = mean wavelength of its columns
+        wavelength = wavelength[hstart:hstart + nbins * hbin].reshape(nbins, hbin).mean(axis=1)
+        shift = 1e7 / (self.laser_wavelength * 1e9) - 1e7 / wavelength
+
+        wavelength.flags.writeable = False
+        shift.flags.writeable = False
+        axis = {"wavelength_nm": wavelength, "raman_shift_cm1": shift}
+
+        if len(self._axes) >= self.max_entries:
+            self._axes.pop(next(iter(self._axes)))  # oldest first
+        self._axes[key] = axis
+        return axis
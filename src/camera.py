@@ -1,11 +1,25 @@
 import time
-import json
+import copy
 import numpy as np
-import pylablib as pll
-from pylablib.devices import Andor
 from pathlib import Path
-import matplotlib.pyplot as plt
 from pprint import pformat
+from lazy import LazyModule
+from storage import open_storage
+from display import DisplayMapper
+from framebuf import FramePool
+from accumulate import StreamingAccumulator
+from cosmic import CosmicRayFilter
+from archive import FrameArchive
+from darks import DarkLibrary
+from extraction import SpectrumExtractor
+from telemetry import TelemetrySampler
+from cooling import ThermalController
+from capabilities import CapabilityCache, collect_capabilities
+from settings import CameraSettings
+
+# imported on first use (connect / dll path), not at GUI startup
+pll = LazyModule("pylablib")
+Andor = LazyModule("pylablib.devices.Andor")
 
 
 class RamanCameraModel:
@@ -14,11 +28,60 @@ class RamanCameraModel:
         self.cam = None
         self.is_live = False    # if camera is capturing live images
         self.busy = False
+        self.read_mode = "image"    # "image" | "fvb" | "single_track"
 
         # default paths:
         self.save_path = Path("./data")
         self.save_path.mkdir(exist_ok=True)
 
+        # one storage file per session
+        self.storage = None
+        self.storage_backend = "h5"       # "h5" | "npz"
+        self.storage_compression = None   # None | "gzip" | "lzf"
+
+        # long kinetic / run till abort series can also stream every frame into a memmap archive
+        self.archive = None
+        self.archive_flush_every = 100    # frames, readers see new frames after a flush
+        self.archive_meta = {}     # stored in the archive header (spectrometer position and axis, set by the controller)
+
+        # frames are copied into reusable buffers, consumers call release_frame when done
+        self.pool = FramePool(capacity=8)
+
+        # accumulate / kinetic / run till abort fold frames in here as they arrive
+        self.accumulator = StreamingAccumulator()
+        self.acq_stats = {}
+        self.stop_requested = False
+
+        # image mode spectra: row sum, resampled along the slit curvature once a model is set
+        self.extractor = SpectrumExtractor()
+
+        # cosmic ray rejection on acquired (not live) data
+        self.cosmic = CosmicRayFilter()
+        self.cosmic_removal = False
+
+        # master darks, reused while exposure / temperature / readout settings stay the same
+        self.darks = DarkLibrary(self.save_path / "darks", max_entries=16, max_age_s=6 * 3600, temp_band=2.0)
+        self.dark_subtraction = False
+        self.auto_dark = True       # take a dark when none is cached for the current settings
+        self.dark_frames = 16
+        self._dark_acc = StreamingAccumulator(track_max=True)
+
+        # temperature / status sampled on one thread, GUI, cooling, darks and archive read the cached values
+        self.telemetry = TelemetrySampler(self._read_telemetry, interval=1.0, history=3600)
+
+        # cooling / warm-up runs with ETA and stabilization detection, acquisitions may start near the setpoint
+        self.thermal = ThermalController(self, near_band=3.0, tolerance=0.5, stable_rate=0.5, stable_window=20.0)
+
+        # static device properties (amp modes, speeds, sizes, ROI limits) cached per serial + SDK version
+        self.capability_cache = CapabilityCache(self.save_path / "capabilities")
+        self.capabilities = {}
+
+        # desired / applied camera settings, only changed parameters are sent to the camera
+        self.settings = CameraSettings()
+
+        # preview 16bit -> 8bit mapping
+        self.display = DisplayMapper(mode="percentile", limits=(0.5, 99.5), update_every=10)
+
 
 
 
@@ -47,9 +110,35 @@ class RamanCameraModel:
         except:
             raise ConnectionError("Could not connect to device")
     
+    def get_sdk_version(self):
+        return Andor.get_SDK2_version()
+
+    def load_capabilities(self,refresh=False):
+        """
+        Capability profile of the connected camera from the cache (two SDK queries),
+        collected from the camera and stored if there is none for this serial / SDK version or refresh is set
+        Returns True if the cached profile was used
+        """
+        serial = self.cam.get_device_info().serial_number
+        sdk_version = self.get_sdk_version()
+        profile = None if refresh else self.capability_cache.load(serial, sdk_version)
+        cached = profile is not None
+        if not cached:
+            profile = collect_capabilities(self.cam)
+            self.capability_cache.save(serial, sdk_version, profile)
+        self.capabilities = profile
+        return cached
+
+    def get_capability(self,name,default=None):
+        """
+        Cached capability (see capabilities.collect_capabilities), no SDK call
+        """
+        return self.capabilities.get(name, default)
+
     def get_cam_params(self,save_path=Path("./cam_params.txt")):
         """
         Collect and save camera parameters in readable format.
+        Full dump (about 28 SDK queries), on demand; connecting uses the capability cache instead
         """
 
         info = {}
@@ -95,7 +184,15 @@ class RamanCameraModel:
         Return tuple (width, height) pixels of the camera
         Not affected by ROI
         """
-        return self.cam.get_detector_size()
+        size = self.get_capability("detector_size")
+        return tuple(size) if size else self.cam.get_detector_size()
+
+    def get_pixel_size(self):
+        """
+        (width, height) of a pixel in m
+        """
+        size = self.get_capability("pixel_size")
+        return tuple(size) if size else self.cam.get_pixel_size()
     
     def get_data_dim(self):
         """
@@ -109,132 +206,138 @@ class RamanCameraModel:
         (might delete in future)
         """
         self.cam.init_amp_mode()
-        w,h = self.cam.get_detector_size()  # get the size of the camera
+        w,h = self.detect_cam_size()  # get the size of the camera
         self.cam.setup_image_mode(hstart=0,hend=w,vstart=0,vend=h,hbin=1,vbin=1)         # takes extreme values by default, but just a precaution
         self.cam.set_read_mode("image")     # reads images (read about this one, not sure)
+        self.read_mode = "image"
 
         # self.cam.set_fan_mode("low")
-        self.cam.set_frame_format("list")   # 2D array
+        self.cam.set_frame_format("array")  # grab returns one 3D array (n,h,w) instead of a list
         self.cam.set_image_indexing("rct")  # (row,column) format of the image indexing
+        self.settings.bind(self.cam)        # later changes push only what differs from this
 
         print(f"Camera initialized")
         return
 
 
-    def set_cam_settings(self, exposure, hbin,vbin,read_mode,acq_mode,accum_n=None,roi=None):
-        # self.cam.set_acquisition(
-        #     exposure=exposure,
-        #     hbin=hbin,
-        #     vbin=vbin,
-        #     read_mode=read_mode,
-        #     acq_mode=acq_mode,
-        # )
-        
-        # cfg = self._acq_cfg
-        # cfg["exposure"] = exposure
-        # cfg["hbin"] = hbin
-        # cfg["vbin"] = vbin
-        # cfg["read_mode"] = read_mode
-        # cfg["acq_mode"] = acq_mode
-        # cfg["accum_n"] = accum_n
-        # cfg["roi"] = roi
-
-        # self.cam.set_trigger_mode("int")  # internal trigger | exposure starts immediately
-
-        self.cam.set_shutter(0, 0, "auto")  # fully electronic shutter
-
-
-        self.cam.set_shutter(opening_time=0, closing_time=0)  # if no shutter
-        # self.cam.set_shutter(0, 0, "open")  # fully electronic shutter
+    def set_cam_settings(self, exposure, hbin,vbin,read_mode,acq_mode,accum_n=None,roi=None,track_center=None,track_height=1,
+                         shutter="auto",vsspeed=0,hsspeed=0,preamp=1):
+        """
+        Desired settings for the next acquisitions, only the ones that differ from what the camera has are pushed (see settings.py)
+        roi: (x, y, w, h) in image mode, full chip if None | vsspeed, hsspeed, preamp: indices (preamp clipped to the available ones)
+        accum_n is set by acquire_accumulate itself
+        Returns the names of the pushed settings
+        """
+        if read_mode == "image":
+            readout = ("image", self._image_window(roi, hbin, vbin))
+        else:
+            readout = self._spectrum_readout(read_mode, track_center, track_height)
 
-        self.cam.set_exposure(exposure)
-        self.cam.set_read_mode(read_mode)
+        gains = [m["preamp"] for m in self.get_capability("amp_modes", []) if m["hsspeed"] == hsspeed]
+        if gains:
+            preamp = min(preamp, max(gains))
 
-        if read_mode == "image":
-            width, height = self.cam.get_detector_size()
-            if roi is None:
-                hstart, hend = 0, width
-                vstart, vend = 0, height
-            else:
-                x,y,w_roi,h_roi = roi
-                hstart, hend = x, x + w_roi
-                vstart, vend = y, y + h_roi
-            
-            self.cam.setup_image_mode(
-                hstart=hstart,
-                hend=hend,
-                vstart=vstart,
-                vend=vend,
-                hbin=hbin,
-                vbin=vbin,
-            )
-
-        self.cam.set_acquisition_mode("single")
-
-        # what?
-        # set vertical shift speed
-        vsspeeds = self.cam.get_vsspeeds()
-        self.cam.set_vsspeed(vsspeeds[0])   # slowest = highest quality
-
-        # set horizontal shift speed
-        hsspeeds = self.cam.get_hsspeeds(0)
-        self.cam.set_hsspeed(0, hsspeeds[0])  # amplifier index 0, slowest speed
-
-        # pre amp gain
-        gains = self.cam.get_preampgains()
-        self.cam.set_preampgain(gains[1])  # medium gain recommended
-
-
-        # acq_mode="single"   # 'single' | 'accumulate' | 'kinetic' | 'run_till_abort'
-        # acq_mode = "run_till_abort" # run until stopped
-        # acq_mode="accumulate" # might use for accumulate feature
-    
+        pushed = self.settings.apply(shutter=shutter, amp_mode=(hsspeed, preamp), vsspeed=vsspeed,
+                                     readout=readout, acq_mode=acq_mode, exposure=exposure)
+        self.read_mode = read_mode
+        return pushed
 
-    def set_roi(self,roi,hbin,vbin):
+    def _image_window(self,roi,hbin,vbin):
+        """
+        (hstart, hend, vstart, vend, hbin, vbin) for roi = (x, y, w, h), full chip if roi is None
+        """
+        if roi is None:
+            width, height = self.detect_cam_size()
+            return (0, width, 0, height, hbin, vbin)
         x,y,w,h = roi
-        self.cam.set_roi(x,y,w,h,hbin=hbin,vbin=vbin)
-    
-    def cool_cam(self,target_temp=-80.0):
-        self.busy = True
-        self.cancel = False
-        self.cam.set_temperature(target_temp, enable_cooler=True)
-        # t0 = time.time()
+        return (x, x + w, y, y + h, hbin, vbin)
 
-        while True:
-            if self.cancel:
-                print("Cooling canceled")
-                break
+    def _spectrum_readout(self,mode,center=None,height=1):
+        if mode == "fvb":
+            return ("fvb", ())
+        if mode == "single_track":
+            if center is None:
+                center = self.detect_cam_size()[1] // 2   # middle row
+            return ("single_track", (center, height))
+        raise ValueError(f"Unknown spectrum read mode: {mode}")
 
-            temp = round(self.cam.get_temperature(),2)
-            print(f"Cooling: {temp}, Status: {self.cam.get_temperature_status()}")
+    def get_settings_stats(self):
+        return self.settings.stats()
 
-            if temp <= target_temp:
-                print(f"Temperature stabilized, Status: {self.cam.get_temperature_status()}")
-                break
-            # if time.time() - t0 > time_out:
-            #     raise RuntimeError("Cooling timeout")
-
-            time.sleep(1)
-        self.busy = False
+    def set_spectrum_mode(self,mode="fvb",center=None,height=1):
+        """
+        Bin on the chip and read spectra directly (1024 values per read instead of the whole image)
+        mode: "fvb" (full vertical binning) | "single_track" (`height` rows around row `center` binned together)
+        """
+        self.settings.apply(readout=self._spectrum_readout(mode, center, height))
+        self.read_mode = mode
+        print(f"Spectrum mode: {mode}")
 
-    def warm_cam(self,safe_temp=-20):
-        self.busy = True
-        self.cancel = True
+    def is_spectrum_mode(self):
+        return self.read_mode in ("fvb", "single_track")
 
-        self.cam.set_cooler(on=False)
-        print("Warming (cooler OFF)")
+    def get_spectral_window(self):
+        """
+        (first column, end column, hbin) of the chip area the spectrum comes from
+        """
+        width, _ = self.detect_cam_size()
+        if self.is_spectrum_mode():
+            return 0, width, 1
+        hstart, hend, _, _, hbin, _ = self.cam.get_roi()
+        return hstart, hend, hbin
 
-        while True:
+    def get_readout_window(self):
+        """
+        (read mode, window): window is the ROI with binning in image mode, (center, width) in single track, () in fvb
+        """
+        if self.read_mode == "image":
+            return self.read_mode, tuple(self.cam.get_roi())
+        if self.read_mode == "single_track":
+            return self.read_mode, tuple(self.cam.get_single_track_mode_parameters())
+        return self.read_mode, ()
 
-            t = round(self.cam.get_temperature(),2)
-            print(f"Warming T = {t:.1f}")
+    def set_roi(self,roi,hbin,vbin):
+        """
+        roi: (x, y, w, h) of the chip read in image mode
+        """
+        self.settings.apply(readout=("image", self._image_window(roi, hbin, vbin)))
+        self.read_mode = "image"
+    
+    def cool_cam(self,target_temp=-80.0,timeout=None,on_progress=None):
+        """
+        Cool to target_temp and wait until the temperature is stable (see ThermalController)
+        Returns the final state: "stable" | "cancelled" | "timeout"
+        """
+        self.busy = True
+        try:
+            state = self.thermal.cool(target_temp, timeout, on_progress or self._print_progress)
+        finally:
+            self.busy = False
+        print(f"Cooling {state}, T = {self.thermal.progress.get('temperature')}")
+        return state
 
-            if t >= safe_temp:
-                break
+    def warm_cam(self,safe_temp=-20,timeout=None,on_progress=None):
+        """
+        Cooler off (a cooling run in progress is cancelled), wait until the temperature is at least safe_temp
+        Returns "warm" | "cancelled" | "timeout"
+        """
+        self.busy = True
+        try:
+            state = self.thermal.warm(safe_temp, timeout, on_progress or self._print_progress)
+        finally:
+            self.busy = False
+        print(f"Warming {state}, T = {self.thermal.progress.get('temperature')}")
+        return state
 
-            time.sleep(1)
+    def cancel_thermal(self):
+        self.thermal.cancel()
 
-        self.busy = False
+    def _print_progress(self,progress):
+        if progress.get("temperature") is None:
+            return
+        eta = progress["eta_s"]
+        eta = "--" if eta is None else ("never" if eta == float("inf") else f"{eta:.0f} s")
+        print(f"{progress['state'].capitalize()}: {progress['temperature']:.2f}, Status: {progress['status']}, ETA {eta}")
 
     def safe_close(self):
         """
@@ -244,7 +347,7 @@ class RamanCameraModel:
         if not self.cam:
             return
         
-        self.cancel=True
+        self.thermal.cancel()
         
         try:
             if self.cam.acquisition_in_progress():
@@ -253,22 +356,68 @@ class RamanCameraModel:
             pass
 
         # self.warm_cam()
-        
+
+        self.close_session()
+        self.close_archive()
         self.close_cam()
         
         return
 
     def close_cam(self):
+        self.stop_telemetry()
+        self.capabilities = {}      # the next camera may be another one
+        self.settings.bind(None)
         if self.cam:
             self.cam.close()
             self.cam = None
             print("Camera disconnected safely")
     
     def get_temp(self):
+        """
+        Newest (temperature, status), from the telemetry cache while the sampler runs (no SDK call)
+        """
         if not self.cam:
             return "--",""
-        
-        return self.cam.get_temperature(), self.cam.get_temperature_status()
+        sample = self.telemetry.latest() if self.telemetry.is_running() else None
+        if sample is None:
+            return round(self.cam.get_temperature(),2), self.cam.get_temperature_status()
+        return round(sample["temperature"],2), sample["temp_status"]
+
+    def next_temp(self):
+        """
+        (temperature, status) of the next telemetry sample, for loops that follow the temperature
+        Without the sampler: waits one interval and reads the camera
+        """
+        if self.telemetry.is_running():
+            sample = self.telemetry.wait_next(timeout=5 * self.telemetry.interval)
+            if sample is not None:
+                return round(sample["temperature"],2), sample["temp_status"]
+        else:
+            time.sleep(self.telemetry.interval)
+        return round(self.cam.get_temperature(),2), self.cam.get_temperature_status()
+
+    def current_temperature(self):
+        """
+        Temperature for metadata / dark keys: cached sample if it is recent, camera read otherwise
+        """
+        sample = self.telemetry.latest()
+        if sample is not None and self.telemetry.is_running() and time.time() - sample["time"] < 2 * self.telemetry.interval:
+            return sample["temperature"]
+        return self.cam.get_temperature()
+
+    # ===== TELEMETRY =====
+
+    def _read_telemetry(self):
+        return self.cam.get_temperature(), self.cam.get_temperature_status(), self.cam.get_status()
+
+    def start_telemetry(self,interval=None):
+        if interval is not None:
+            self.telemetry.interval = interval
+        if self.cam:
+            self.telemetry.start()
+
+    def stop_telemetry(self):
+        self.telemetry.stop()
 
 
 
@@ -281,8 +430,9 @@ class RamanCameraModel:
         if self.is_live or not self.cam:
             return
     
-        self.cam.set_exposure(0.03)     # update fast
+        self.settings.apply(exposure=0.03)     # update fast
         self.cam.start_acquisition(mode="cont")     # sets acquisition mode to "run till abort"
+        self.settings.mark(acq_mode="cont")
         self.is_live = True  
         print("Live mode started")
         return
@@ -301,10 +451,85 @@ class RamanCameraModel:
             return None
         
         frame = self.cam.read_newest_image(peek=False)  # reads last unread image available in the buffer, peak=False marks it as read
-        return frame
+        return self.pool.put(frame)
+
+    def wait_live_frame(self,timeout=0.2):
+        """
+        Block until a new live frame arrives (called from the live thread, not the GUI)
+        Returns None on timeout so the caller can check if it should stop
+        """
+        if self.cam is None or not self.is_live:
+            return None
+        try:
+            self.cam.wait_for_frame(since="lastread", timeout=timeout)
+        except Andor.AndorTimeoutError:
+            return None
+        return self.pool.put(self.cam.read_newest_image(peek=False))
+
+    def release_frame(self,frame):
+        """
+        Give a frame returned by live/acquisition methods back to the pool
+        """
+        self.pool.release(frame)
+
+    def get_live_spectrum(self,timeout=0.2):
+        """
+        Next live spectrum as 1-D array (release it with release_frame)
+        """
+        frame = self.wait_live_frame(timeout)
+        if frame is None:
+            return None
+        spectrum = self.frame_to_spectrum(frame)
+        if not self.is_spectrum_mode():
+            self.release_frame(frame)   # summed into a new array, the frame itself is not needed anymore
+        return spectrum
 
     # ===== ACQUISITION =====
 
+    def frame_to_spectrum(self,frame):
+        """
+        1-D spectrum of a frame: already binned on the chip in fvb/single_track, summed over rows in image mode
+        """
+        if self.is_spectrum_mode():
+            return frame.reshape(-1)    # view, stays in the pool
+        if self.extractor.curved():
+            return self.extractor.extract(frame, self._frame_window(frame))
+        return frame.sum(axis=0, dtype=np.float64 if frame.dtype.kind == "f" else np.int64)
+
+    def _frame_window(self,frame):
+        # ROI the frame was read with, full unbinned chip for frames of another shape
+        window = self.cam.get_roi()
+        hstart, hend, vstart, vend, hbin, vbin = window
+        if frame.shape != ((vend - vstart) // vbin, (hend - hstart) // hbin):
+            return (0, frame.shape[1], 0, frame.shape[0], 1, 1)
+        return tuple(window)
+
+    def extract_tracks(self,frame,tracks):
+        """
+        Several spectra from one image frame, tracks = [(first row, end row), ...] in frame rows
+        Returns (n_tracks, width), curvature corrected if a model is set
+        """
+        return self.extractor.extract(frame, self._frame_window(frame), tracks)
+
+    def calibrate_curvature(self,frame,columns,half_width=6,order=2):
+        """
+        Fit the slit curvature from an image of narrow lamp lines at the given approximate columns
+        """
+        coeffs = self.extractor.calibrate(frame, columns, half_width, order, self._frame_window(frame))
+        print(f"Slit curvature: {coeffs}")
+        return coeffs
+
+    def acquire_spectrum(self):
+        """
+        Single spectrum read directly from the sensor (needs set_spectrum_mode first)
+        """
+        if not self.is_spectrum_mode():
+            self.set_spectrum_mode("fvb")
+        frame = self.simple_acq()
+        if frame is None:
+            return None
+        return frame.reshape(-1)
+
     def simple_acq(self,num_frames=0):
         if not self.cam:
             print("No camera detected for a snap")
@@ -315,12 +540,14 @@ class RamanCameraModel:
 
         if num_frames == 0:
             frame = self.cam.snap()   # grab single frame
+            self.settings.mark(acq_mode="cont")     # pylablib's snap / grab leave the camera in run till abort mode
             print("Single frame acquired")
-            return frame
+            return self.pool.put(frame)
         else:
-            frames = self.cam.grab(num_frames)  # grab 10 frames
+            frames = self.cam.grab(num_frames)  # grab 10 frames, (n,h,w) array
+            self.settings.mark(acq_mode="cont")
             print("Multiple frames acquired")
-            return frames
+            return self.pool.put(frames)
 
 
     
@@ -345,36 +572,278 @@ class RamanCameraModel:
 
     #     return frame, spectrum
 
-    # def acquire_single(self):
-    #     self.cam.start_acquisition()
-    #     print(f"Camera acquiring: {self.cam.get_attribute_value('CameraAcquiring')}") # check if the camera is acquiring
-    #     frame = self.cam.wait_for_frame()
-    #     spectrum = frame.sum(axis=0).astype(np.int32)   # turn raw 2D into 1D spectrum by summing the column pixels (more score -> brighter -> higher score)
+    def _stream_frames(self,n=None,timeout=5.0):
+        """
+        Yield frames of the running acquisition as soon as they arrive
+        Stops after n frames (None = until stop_acquiring() is called), always stops the acquisition at the end
+        """
+        self.stop_requested = False
+        read = 0
+        try:
+            while (n is None or read < n) and not self.stop_requested:
+                try:
+                    self.cam.wait_for_frame(since="lastread", timeout=timeout)
+                except Andor.AndorTimeoutError:
+                    if n is None:
+                        continue    # run till abort, just check the stop flag again
+                    raise
+                for frame in self.cam.read_multiple_images():   # everything unread, in order
+                    yield frame
+                    read += 1
+                    if n is not None and read >= n:
+                        break
+        finally:
+            self.cam.stop_acquisition()
+
+    def stop_acquiring(self):
+        """
+        Ends a running run-till-abort (or any streamed) acquisition after the current frame
+        """
+        self.stop_requested = True
 
-    #     return frame, spectrum
-    
-    # def acquire_accumulate(self,n):
-    #     self.cam.set_number_accumulations(n)
-    #     self.cam.start_acquisition()
-    #     frame = self.cam.wait_for_frame()
-    #     spectrum = frame.sum(axis=0).astype(np.int32)
-    #     return frame, spectrum
-    
-    # def acquire_rta(self):
-    #     self.cam.start_acquisition()    
-    #     try:
-    #         while True:
-    #             frame = self.cam.wait_for_frame(timeout=5.0)
-    #             spectrum = frame.sum(axis=0).astype(np.int32)
-    #     except KeyboardInterrupt:
-    #         pass
-    #     finally:
-    #         self.cam.abort_acquisition()
-    #         return frame, spectrum
-        
-    # def acquire_kinetic(self):
-    #     # To do
-    #     pass
+    def _record_stats(self,mode,frames,t0):
+        dt = time.perf_counter() - t0
+        self.acq_stats = {"mode": mode, "frames": frames, "time_s": dt, "fps": frames / dt if dt > 0 else 0.0}
+        print(f"{mode}: {frames} frames in {dt:.3f} s")
+
+    def acquire_single(self,process=True):
+        """
+        One exposure, returns (frame, spectrum)
+        process=False returns the raw readout instead, finish it later with finish_acquisition (same for all acquire_*)
+        """
+        frame = self.simple_acq()
+        raw = {"mode": "single", "frame": frame, "n": 1}
+        return self.finish_acquisition(raw) if process else raw
+
+    def acquire_accumulate(self,n,hardware=True,process=True):
+        """
+        Sum of n exposures, returns (summed frame, spectrum)
+        hardware=True: the camera sums on board and reads out once (SDK accumulate mode)
+        hardware=False: n frames are read and folded into self.accumulator as they arrive,
+        which also gives the per-pixel variance (self.accumulator.variance())
+        """
+        if self.is_live:
+            self.end_live()
+        t0 = time.perf_counter()
+
+        if hardware:
+            self.cam.setup_accum_mode(n)
+            self.settings.mark(acq_mode="accum")
+            self.cam.start_acquisition()
+            timeout = n * self.cam.get_cycle_timings().accum_cycle_time + 5.0
+            # the on-board sum exceeds 16 bit: read it with GetImages (32 bit), pylablib uses GetImages16 by default
+            dtype = self.cam._default_image_dtype
+            self.cam._default_image_dtype = "<u4"
+            try:
+                self.cam.wait_for_frame(timeout=timeout)
+                frame = self.cam.read_newest_image()
+            finally:
+                self.cam._default_image_dtype = dtype
+                self.cam.stop_acquisition()
+            self.accumulator.set_total(frame, n)
+        else:
+            self.cam.setup_kinetic_mode(n)
+            self.settings.mark(acq_mode="kinetic")
+            self.cam.start_acquisition()
+            self.accumulator.track_max = self.cosmic_removal
+            self.accumulator.clear()
+            for frame in self._stream_frames(n):
+                self.accumulator.add(frame)
+
+        self._record_stats("accumulate_hw" if hardware else "accumulate_sw", n, t0)
+        # shallow copy: the result arrays are replaced (not overwritten) by the next acquisition
+        raw = {"mode": "accumulate", "frame": self.accumulator.sum, "n": n, "hardware": hardware,
+               "accumulator": copy.copy(self.accumulator)}
+        return self.finish_acquisition(raw) if process else raw
+
+    def remove_cosmics(self,frames):
+        """
+        Cosmic ray rejection on already acquired data:
+        a stack (n, h, w) from grab(n) is compared across frames, a single frame / spectrum against its neighbours
+        Returns (cleaned data, mask of replaced pixels)
+        """
+        frames = np.asarray(frames)
+        if frames.ndim == 3 or (frames.ndim == 2 and self.is_spectrum_mode() and frames.shape[0] >= 3):
+            return self.cosmic.clean_stack(frames)
+        return self.cosmic.clean_frame(frames)
+
+    def acquire_kinetic(self,n,cycle_time=0.0,archive=False,process=True):
+        """
+        Kinetic series of n frames
+        Returns (mean frame, spectra) where spectra is an (n, width) array, one spectrum per cycle
+        (fewer rows if stopped early, (None, (0, width) array) if no frame arrived)
+        archive=True also appends every frame to self.archive
+        """
+        if self.is_live:
+            self.end_live()
+        t0 = time.perf_counter()
+
+        self.cam.setup_kinetic_mode(n, cycle_time=cycle_time)
+        self.settings.mark(acq_mode="kinetic")
+        settings = self._archive_settings() if archive else None
+        self.cam.start_acquisition()
+        self.accumulator.clear()
+        spectra = None
+        for i, frame in enumerate(self._stream_frames(n)):
+            spectrum = self.frame_to_spectrum(frame)
+            if spectra is None:
+                spectra = np.empty((n, spectrum.size), dtype=spectrum.dtype)
+            spectra[i] = spectrum
+            self.accumulator.add(frame)
+            if archive:
+                self._archive_frame(frame, settings)
+        if archive and self.archive:
+            self.archive.flush()
+
+        self._record_stats("kinetic", self.accumulator.count, t0)
+        if spectra is None:     # stopped / timed out before the first frame
+            start, end, hbin = self.get_spectral_window()
+            spectra = np.empty((0, (end - start) // hbin), dtype=np.float64)
+        else:
+            spectra = spectra[:self.accumulator.count]      # stop_acquiring() may end the series early
+        raw = {"mode": "kinetic", "frame": self.accumulator.mean, "n": self.accumulator.count, "spectra": spectra}
+        return self.finish_acquisition(raw) if process else raw
+
+    def acquire_rta(self,max_frames=None,archive=False,process=True):
+        """
+        Run till abort: frames are averaged until stop_acquiring() is called (or max_frames are read)
+        Returns (mean frame, spectrum)
+        archive=True also appends every frame to self.archive (overnight series without keeping frames in RAM)
+        """
+        if self.is_live:
+            self.end_live()
+        t0 = time.perf_counter()
+
+        settings = self._archive_settings() if archive else None
+        self.cam.start_acquisition(mode="cont")
+        self.settings.mark(acq_mode="cont")
+        self.accumulator.clear()
+        for frame in self._stream_frames(max_frames, timeout=0.5):
+            self.accumulator.add(frame)
+            if archive:
+                self._archive_frame(frame, settings)
+        if archive and self.archive:
+            self.archive.flush()
+
+        self._record_stats("run_till_abort", self.accumulator.count, t0)
+        raw = {"mode": "run_till_abort", "frame": self.accumulator.mean, "n": self.accumulator.count}
+        return self.finish_acquisition(raw) if process else raw
+
+    def finish_acquisition(self,raw):
+        """
+        Cosmic ray removal and dark subtraction of a raw readout from acquire_*(process=False)
+        Returns (frame, spectrum) like the acquire_* methods
+        """
+        mode, frame, n = raw["mode"], raw["frame"], raw["n"]
+        if mode == "kinetic":
+            spectra = raw["spectra"]
+            if frame is None:
+                return None, spectra
+            if self.dark_subtraction:
+                dark = self.get_dark()
+                if dark is not None:
+                    frame = self.darks.subtract(frame, dark)
+                    spectra = spectra - self.frame_to_spectrum(dark)
+            return frame, spectra
+
+        if frame is None or n == 0:
+            return None, None
+        if mode == "single":
+            if self.cosmic_removal:
+                cleaned, _ = self.cosmic.clean_frame(frame)
+                self.release_frame(frame)
+                frame = cleaned
+            if self.dark_subtraction:
+                corrected = self.subtract_dark(frame)
+                if corrected is not frame:
+                    self.release_frame(frame)
+                frame = corrected
+        elif mode == "accumulate":
+            if self.cosmic_removal:
+                if not raw["hardware"] and n >= 3:
+                    frame, _ = self.cosmic.clean_accumulated(raw["accumulator"])    # drop each pixel's outlying brightest sample
+                else:
+                    frame, _ = self.cosmic.clean_frame(frame)   # on-board sum, only the summed frame is available
+                print(f"Cosmic rays: {self.cosmic.last_count} pixels replaced")
+            if self.dark_subtraction:
+                frame = self.subtract_dark(frame, n)
+        elif self.dark_subtraction:
+            frame = self.subtract_dark(frame)
+        return frame, self.frame_to_spectrum(frame)
+
+    # ===== DARKS =====
+
+    def dark_key(self):
+        """
+        Everything a dark frame depends on, as a tuple
+        Taken from the applied settings (no SDK calls), the camera is asked only for settings that are not known
+        """
+        applied = self.settings.applied
+        if "readout" in applied:
+            read_mode, window = applied["readout"]
+        else:
+            read_mode, window = self.get_readout_window()
+        if "amp_mode" in applied:
+            hsspeed, preamp = applied["amp_mode"]
+        else:
+            amp = self.cam.get_amp_mode()
+            hsspeed, preamp = amp.hsspeed, amp.preamp
+        exposure = applied["exposure"] if "exposure" in applied else self.cam.get_exposure()
+        vsspeed = applied["vsspeed"] if "vsspeed" in applied else self.cam.get_vsspeed()
+        return (read_mode, tuple(int(v) for v in window), round(float(exposure), 6), self.darks.band(self.current_temperature()),
+                int(hsspeed), int(vsspeed), int(preamp))
+
+    def acquire_dark(self,n=None,key=None):
+        """
+        Mean of n frames with the shutter closed, stored in the dark library
+        """
+        n = n or self.dark_frames
+        key = key or self.dark_key()
+        if self.is_live:
+            self.end_live()
+        # only the shutter is switched and restored, other pending settings stay for the next apply
+        shutter = self.settings.applied.get("shutter") or self.cam.get_shutter()
+        self.cam.setup_shutter("closed")
+        self.settings.mark(shutter="closed")
+        try:
+            self.cam.setup_kinetic_mode(n)
+            self.settings.mark(acq_mode="kinetic")
+            self.cam.start_acquisition()
+            self._dark_acc.clear()
+            for frame in self._stream_frames(n):
+                self._dark_acc.add(frame)
+        finally:
+            self.cam.setup_shutter(shutter)
+            self.settings.mark(shutter=shutter)
+
+        if n >= 3:
+            total, _ = self.cosmic.clean_accumulated(self._dark_acc)   # a cosmic ray must not end up in every corrected frame
+            dark = total / n
+        else:
+            dark = self._dark_acc.mean
+        print(f"Dark acquired: {n} frames, key {key}")
+        return self.darks.put(key, dark, frames=n)
+
+    def get_dark(self):
+        """
+        Master dark for the current settings: from the library, acquired on a miss if auto_dark is set
+        """
+        key = self.dark_key()
+        dark = self.darks.get(key)
+        if dark is None and self.auto_dark:
+            dark = self.acquire_dark(key=key)
+        return dark
+
+    def subtract_dark(self,frame,n=1):
+        """
+        frame - n * dark (n: number of summed exposures)
+        Float frames owned by the caller are corrected in place, pooled / integer frames give a new array
+        """
+        dark = self.get_dark()
+        if dark is None:
+            print("No dark for the current settings, frame not corrected")
+            return frame
+        return self.darks.subtract(frame, dark, n)
 
 
 
@@ -382,19 +851,79 @@ class RamanCameraModel:
     # ===== FILE MANAGEMENT =====
 
     def set_save_path(self,save_path):
-        self.save_path = save_path
+        self.close_session()    # next session goes to the new folder
+        self.close_archive()
+        self.save_path = Path(save_path)
+
+    def open_session(self,name=None):
+        """
+        Start a new session file, all following save_data/save_meta calls go there
+        """
+        self.close_session()
+        name = name or time.strftime("session_%Y%m%d_%H%M%S")
+        self.storage = open_storage(self.save_path / name, self.storage_backend, self.storage_compression)
+        print(f"Saving to {self.storage.path}")
+
+    def flush_session(self):
+        if self.storage:
+            self.storage.flush()
+
+    def close_session(self):
+        if self.storage:
+            self.storage.close()
+            self.storage = None
+
+    def open_archive(self,shape,dtype,name=None):
+        """
+        Start a new frame archive (see archive.py), archived acquisitions append to it
+        """
+        self.close_archive()
+        if name is None:
+            # the time stamp has 1 s resolution, a series started in the same second (e.g. the next stitched window) gets a counter
+            stamp = time.strftime("series_%Y%m%d_%H%M%S")
+            name, i = stamp, 1
+            while (self.save_path / name).with_suffix(".json").exists():
+                name, i = f"{stamp}_{i}", i + 1
+        self.archive = FrameArchive(self.save_path / name, shape=shape, dtype=dtype, meta=self.archive_meta)
+        print(f"Archiving frames to {self.archive.path}")
+
+    def close_archive(self):
+        if self.archive:
+            self.archive.close()
+            self.archive = None
+
+    def _archive_settings(self):
+        # read once per acquisition, settings don't change while it runs
+        if self.archive is not None and self.archive.meta != self.archive_meta:
+            self.close_archive()    # spectrometer moved: new series, the header axis must match the frames
+        hbin, vbin = (1, 1) if self.is_spectrum_mode() else self.cam.get_roi()[4:6]
+        return {"exposure": self.cam.get_exposure(), "temperature": self.current_temperature(),
+                "hbin": hbin, "vbin": vbin, "read_mode": self.read_mode}
+
+    def _archive_frame(self,frame,settings):
+        if self.archive is None or self.archive.shape != frame.shape or self.archive.dtype != frame.dtype:
+            self.open_archive(frame.shape, frame.dtype)     # new series when the frame format changes
+        self.archive.append(frame, time.time(), **settings)
+        if self.archive.count % self.archive_flush_every == 0:
+            self.archive.flush()
     
     def set_dlls_path(self,dlls_path):
         pll.par["devices/dll/andor_sdk2"] = dlls_path
     
-    def save_data(self, frame, spectrum, timestamp):
-        np.savetxt(self.save_path / f"{timestamp}_frame.csv", frame, delimiter=",", fmt="%d")   # save image
-        np.savetxt(self.save_path / f"{timestamp}_spectrum.csv", spectrum, delimiter=",", fmt="%d")     # save spectrum
+    def save_data(self, frame, spectrum, timestamp, axis=None):
+        """
+        axis: {"wavelength_nm": ..., "raman_shift_cm1": ...} stored next to the spectrum (None if no spectrometer)
+        """
+        if self.storage is None:
+            self.open_session()
+        self.storage.write_data(timestamp, frame, spectrum, axis)    # binary, no text formatting
     
-    def save_meta(self, frame, exposure, hbin, vbin, roi, temp, timestamp):
+    def save_meta(self, frame, exposure, hbin, vbin, roi, temp, timestamp, extra=None):
+        # runs on the writer thread: device info from the capability profile, no SDK call next to the acquisition
+        info = self.get_capability("device_info", {})
         meta = {
-            "camera_model": self.cam.get_model(),
-            "serial": self.cam.get_serial_number(),
+            "camera_model": info.get("head_model"),
+            "serial": info.get("serial_number"),
             "exposure_s": exposure,
             "binning": {"h": hbin, "v": vbin},
             "roi": roi,
@@ -402,7 +931,11 @@ class RamanCameraModel:
             "frame_shape": frame.shape,
             "timestamp": timestamp,
         }
-        (self.save_path / f"meta_{timestamp}.json").write_text(json.dumps(meta, indent=2))
+        if extra:
+            meta.update(extra)
+        if self.storage is None:
+            self.open_session()
+        self.storage.write_meta(timestamp, meta)    # stored as attributes of the record
 
         # ask what to save??
 
@@ -412,15 +945,18 @@ class RamanCameraModel:
 
     def plot_spec(self,spectrum,exp_time):
 
+        from matplotlib.figure import Figure     # only needed here, pyplot is not (no GUI backend, no global figures)
+
         self.save_path.mkdir(parents=True, exist_ok=True)
-        plt.figure()
-        plt.plot(spectrum)
-        plt.title("Spectrum")
-        plt.savefig(self.save_path / f"{exp_time}_plot.png", dpi=200) # dpi is dots per inch -> more dots - better quality
+        fig = Figure()
+        ax = fig.add_subplot()
+        ax.plot(spectrum)
+        ax.set_title("Spectrum")
+        fig.savefig(self.save_path / f"{exp_time}_plot.png", dpi=200) # dpi is dots per inch -> more dots - better quality
 
 
     # ==== MATH =====
     def adjust_frame(self,frame):
-        frame8 = (frame / frame.max() * 255).astype(np.uint8)   # 8bit grayscale
+        frame8 = self.display.map(frame)   # 8bit grayscale through the LUT, buffer reused every frame
         h, w = frame8.shape
         return (frame8,h,w)
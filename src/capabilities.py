@@ -0,0 +1,79 @@
+import json
+import time
+from pathlib import Path
+
+
+FORMAT = 1      # bump when the stored fields change, older files are collected again
+
+
+def _jsonable(value):
+    """
+    SDK results (named tuples, tuples, numpy scalars) as plain JSON values, named tuples become dicts
+    """
+    if hasattr(value, "_asdict"):
+        return {k: _jsonable(v) for k, v in value._asdict().items()}
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if hasattr(value, "item"):      # numpy scalar
+        return value.item()
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def collect_capabilities(cam):
+    """
+    Everything about the camera that does not change while serial number and SDK version stay the same
+    """
+    return _jsonable({
+        "device_info": cam.get_device_info(),
+        "capabilities": cam.get_capabilities(),
+        "pixel_size": cam.get_pixel_size(),
+        "detector_size": cam.get_detector_size(),
+        "temperature_range": cam.get_temperature_range(),
+        "amp_modes": cam.get_all_amp_modes(),
+        "max_vsspeed": cam.get_max_vsspeed(),
+        "vsspeeds_us": cam.get_all_vsspeeds(),
+        "roi_limits": cam.get_roi_limits(),
+    })
+
+
+class CapabilityCache:
+    """
+    Capability profiles of the cameras seen so far, one JSON file per serial number in directory.
+    A profile is used only for the same SDK version (and file format), otherwise it is collected again.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def _file(self, serial):
+        return self.directory / f"caps_{serial}.json"
+
+    def load(self, serial, sdk_version):
+        """
+        Stored profile or None if there is none for this serial / SDK version
+        """
+        path = self._file(serial)
+        if not path.exists():
+            return None
+        try:
+            stored = json.loads(path.read_text())
+        except ValueError:      # damaged file, collect again
+            return None
+        if stored.get("format") != FORMAT or stored.get("sdk_version") != sdk_version:
+            return None
+        return stored["profile"]
+
+    def save(self, serial, sdk_version, profile):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stored = {"format": FORMAT, "serial": serial, "sdk_version": sdk_version, "created": time.time(), "profile": profile}
+        self._file(serial).write_text(json.dumps(stored, indent=1))
+
+    def invalidate(self, serial=None):
+        paths = [self._file(serial)] if serial is not None else self.directory.glob("caps_*.json")
+        for path in paths:
+            if path.exists():
+                path.unlink()
@@ -1,19 +1,57 @@
-from camera import RamanCameraModel
-from spectrometer import SpectrometerModel
-from unittest.mock import MagicMock
-from test_cam import TestCameraModel
-from test_spec import TestSpectrometerModel
+import importlib
+import os
+from writer import AsyncWriter
+from stitch import plan_windows, glue
+from correction import ResponseCorrection
+from baseline import BaselineCorrector
+from peaks import PeakAnalyzer, PEAK_DTYPE
+from archive import FrameArchive
+import numpy as np
 import time
 
+# device models per backend: (camera module, class), (spectrometer module, class)
+# the test doubles are only imported when the simulated backend is chosen
+BACKENDS = {
+    "andor": (("camera", "RamanCameraModel"), ("spectrometer", "SpectrometerModel")),
+    "simulated": (("test_cam", "TestCameraModel"), ("test_spec", "TestSpectrometerModel")),
+}
+
+
+def load_backend(name=None):
+    """
+    (camera class, spectrometer class) of a backend, name from RAMAN_BACKEND if not given ("andor" by default)
+    """
+    name = name or os.environ.get("RAMAN_BACKEND", "andor")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown device backend: {name} (choose from {', '.join(BACKENDS)})")
+    return tuple(getattr(importlib.import_module(module), cls) for module, cls in BACKENDS[name])
+
+
 class RamanCameraController:
 
-    def __init__(self,view):
+    def __init__(self,view,camera=None,spec=None,backend=None):
         self.view = view
-        self.camera = RamanCameraModel()
-        # self.camera = TestCameraModel()
-        self.spec = SpectrometerModel()
-        # self.spec = TestSpectrometerModel()
-        # self.camera = MagicMock()    # use temporally for testing
+        if camera is None or spec is None:
+            camera_cls, spec_cls = load_backend(backend)
+            camera = camera or camera_cls()
+            spec = spec or spec_cls()
+        self.camera = camera
+        self.spec = spec
+
+        # saving runs on its own thread, acquisition only waits if the queue is full
+        self.writer = AsyncWriter(maxsize=8, on_error=self.on_write_error)
+        self.write_errors = []
+
+        # flat field / spectral response, applied to acquired data and live spectra when enabled
+        self.correction = ResponseCorrection()
+        self.intensity_correction = False
+
+        # fluorescence background removal for displayed live spectra and on request
+        self.baseline = BaselineCorrector(method="asls")
+        self.baseline_removal = False
+
+        # peak positions / widths / areas, live readout and batch analysis of runs
+        self.peaks = PeakAnalyzer()
 
 
     # ==== Camera methods =====
@@ -21,21 +59,50 @@ class RamanCameraController:
 
     def connect_cam(self):
         self.camera.connect_cam()
-        self.camera.get_cam_params()     # save cam defaults for later
+        if not self.camera.load_capabilities():
+            self.camera.get_cam_params()     # new camera / SDK: save cam defaults for later
         self.camera.set_default_settings()
+        self.camera.start_telemetry()
         # self.cool_cam(target_temp=-80)
         return
     
+    def refresh_capabilities(self):
+        """
+        Query the camera again (e.g. after a firmware change) and rewrite the profile and cam_params.txt
+        """
+        self.camera.load_capabilities(refresh=True)
+        self.camera.get_cam_params()
+
+    def get_capabilities(self):
+        return self.camera.capabilities
+
     def isBusy_cam(self):
         return self.camera.busy
 
-    def cool_cam(self,target_temp):
-        self.camera.cool_cam(target_temp)
+    def cool_cam(self,target_temp,timeout=None,on_progress=None):
+        return self.camera.cool_cam(target_temp, timeout=timeout, on_progress=on_progress)
+
+    def warm_cam(self,timeout=None,on_progress=None):
+        return self.camera.warm_cam(timeout=timeout, on_progress=on_progress)
 
-    def warm_cam(self):
-        self.camera.warm_cam()
+    def cancel_thermal(self):
+        self.camera.cancel_thermal()
+
+    def get_thermal_progress(self):
+        """
+        Last cooling / warm-up progress: state, temperature, target, rate, eta, status, elapsed
+        """
+        return self.camera.thermal.progress
+
+    def wait_cold(self,near=True,timeout=None):
+        """
+        Block while the camera is still cooling: until it is near the setpoint (near=True) or stable
+        """
+        if not self.camera.thermal.wait_ready(near, timeout):
+            raise TimeoutError(f"Camera not at the setpoint after {timeout} s (state: {self.camera.thermal.state})")
 
     def disconnect_cam(self):
+        self.writer.flush()     # everything queued must reach the session file before it is closed
         self.camera.safe_close()
         return
 
@@ -49,16 +116,156 @@ class RamanCameraController:
     
     def get_temp(self):
         return self.camera.get_temp()
+
+    def get_telemetry(self,seconds=None):
+        """
+        Sampled temperature / status history (SAMPLE_DTYPE array, oldest first), the last `seconds` if given
+        """
+        return self.camera.telemetry.history(seconds)
+
+    def set_telemetry_interval(self,interval):
+        self.camera.telemetry.interval = interval
+        self.camera.telemetry.request()
     
     def get_live_frame(self):
         return self.camera.get_live_frame()
+
+    def wait_live_frame(self,timeout=0.2):
+        return self.camera.wait_live_frame(timeout)
+
+    def release_frame(self,frame):
+        self.camera.release_frame(frame)
     
     def acquire_single(self):
         return self.camera.simple_acq()
     
+    def set_spectrum_mode(self,mode="fvb",center=None,height=1):
+        self.camera.set_spectrum_mode(mode,center,height)
+
+    def apply_cam_settings(self,settings):
+        """
+        settings: keyword arguments of camera.set_cam_settings (a preset), only the changed ones reach the camera
+        """
+        return self.camera.set_cam_settings(**settings)
+
+    def get_live_spectrum(self,timeout=0.2):
+        spectrum = self.camera.get_live_spectrum(timeout)
+        if spectrum is None:
+            return None
+        processed = spectrum
+        if self._correcting():
+            processed = self.correction.apply(processed, self._correction_maps()[1])
+        if self.baseline_removal:
+            processed = self.baseline.correct(processed)
+        if processed is not spectrum:
+            self.camera.release_frame(spectrum)     # pooled view, the processed copy replaces it
+        return processed
+
+    def acquire_spectrum(self):
+        return self.camera.acquire_spectrum()
+
     def adjust_frame(self,frame):
         return self.camera.adjust_frame(frame)
 
+    def set_display_mapping(self,mode,limits,gamma=1.0,log=False):
+        """
+        mode: "percentile" (limits in %) | "window" (limits in counts) | "max"
+        """
+        display = self.camera.display
+        display.gamma = gamma
+        display.log = log
+        display.set_mode(mode, limits)
+
+    def set_cosmic_removal(self,enabled,nsigma=None,method=None):
+        """
+        method: "median" | "sigma_clip", used for stacks
+        """
+        self.camera.cosmic_removal = enabled
+        if nsigma is not None:
+            self.camera.cosmic.nsigma = nsigma
+        if method is not None:
+            self.camera.cosmic.method = method
+
+    def set_dark_subtraction(self,enabled,auto_dark=True):
+        self.camera.dark_subtraction = enabled
+        self.camera.auto_dark = auto_dark
+
+    def acquire_dark(self,n=None):
+        return self.camera.acquire_dark(n)
+
+    def set_baseline_removal(self,enabled,method=None,**params):
+        """
+        method: "asls" (params lam, p, niter) | "poly" (params order, poly_iter)
+        """
+        if method is not None:
+            self.baseline.method = method
+        for name, value in params.items():
+            setattr(self.baseline, name, value)
+        self.baseline_removal = enabled
+
+    def remove_baseline(self,spectra):
+        """
+        Background subtracted copy of one spectrum (n,) or a stack (N, n), e.g. kinetic spectra
+        """
+        return self.baseline.correct(spectra)
+
+    def _axis_values(self,axis,width):
+        """
+        Current spectral axis values ("raman_shift_cm1" | "wavelength_nm") for width points, None (pixels) if not available
+        """
+        calibration = self.get_spectral_axis() if axis is not None else None
+        if calibration is not None and len(calibration[axis]) == width:
+            return calibration[axis]
+        return None
+
+    def analyze_peaks(self,spectra,axis="raman_shift_cm1"):
+        """
+        Fitted peaks of one spectrum (n,) or a stack (N, n), PEAK_DTYPE array (see peaks.py)
+        axis: "raman_shift_cm1" | "wavelength_nm" for positions / widths on the current spectral axis,
+        pixels if None or the spectrometer is not connected
+        """
+        spectra = np.atleast_2d(spectra)
+        return self.peaks.analyze(spectra, self._axis_values(axis, spectra.shape[1]))
+
+    def live_peaks(self,frame,count=3):
+        """
+        The count strongest peaks of a live frame for the readout and their unit ("cm⁻¹" | "px")
+        Called from the live worker thread, axis lookups and fitting stay off the GUI thread
+        """
+        spectrum = self.camera.frame_to_spectrum(frame)
+        if self.baseline_removal:
+            spectrum = self.baseline.correct(spectrum)
+        values = self._axis_values("raman_shift_cm1", spectrum.size)
+        peaks = self.peaks.analyze(np.atleast_2d(spectrum), values)
+        return peaks[np.argsort(peaks["height"])[::-1][:count]], ("px" if values is None else "cm⁻¹")
+
+    def analyze_archive(self,path,chunk=1000,axis="raman_shift_cm1"):
+        """
+        Offline peak analysis of a frame archive (row-summed spectra), chunk frames at a time
+        Positions / widths use the axis stored with the archive (the spectrometer may have moved since), pixels without one
+        """
+        archive = FrameArchive.open(path)
+        stored = archive.meta.get("axis", {}).get(axis) if axis is not None else None
+        values = None
+        if stored is not None and len(stored) == archive.shape[-1]:
+            values = np.asarray(stored)
+        elif axis is not None:
+            print(f"Archive {path} has no stored {axis} axis, peaks are in pixels")
+        results = []
+        for start in range(0, len(archive), chunk):
+            frames = archive[start:start + chunk]
+            spectra = frames.reshape(len(frames), -1, frames.shape[-1]).sum(axis=1, dtype=np.float64)
+            if self.baseline_removal:
+                spectra = self.baseline.correct(spectra)
+            peaks = self.peaks.analyze(spectra, values)
+            peaks["spectrum"] += start
+            results.append(peaks)
+        archive.close()
+        return np.concatenate(results) if results else np.zeros(0, dtype=PEAK_DTYPE)
+
+    def remove_cosmics(self,frames):
+        return self.camera.remove_cosmics(frames)
+
 
     # def test(self,raw_params):
     #     try:
@@ -155,30 +362,144 @@ class RamanCameraController:
 
     # acquisition
     def acquire_data(self,params):
+        frame, spectrum = self.process_data(self.read_data(params))
+        return frame,spectrum
+
+    def read_data(self,params):
+        """
+        Readout only (no cosmic / dark / intensity correction), finish it with process_data
+        """
+        # acquisitions that tolerate it start as soon as the temperature is near the setpoint
+        self.wait_cold(near=params.get("near_setpoint", True), timeout=params.get("cool_timeout"))
+
+        if params.get("archive", False):
+            self.camera.archive_meta = self._archive_meta()
+
         # run acquisition
         acq_mode = params["acq_mode"]
         if acq_mode == "single":
-            frame, spectrum = self.camera.acquire_single()
+            return self.camera.acquire_single(process=False)
         elif acq_mode == "accumulate":
-            frame, spectrum = self.camera.acquire_accumulate(params["accum_n"])
+            return self.camera.acquire_accumulate(params["accum_n"], hardware=params.get("accum_hw", True), process=False)
+        elif acq_mode == "kinetic":
+            return self.camera.acquire_kinetic(params["accum_n"], cycle_time=params.get("cycle_time", 0.0),
+                                               archive=params.get("archive", False), process=False)
         elif acq_mode == "run_till_abort":
-            frame, spectrum = self.camera.acquire_rta()
+            return self.camera.acquire_rta(params.get("max_frames"), archive=params.get("archive", False), process=False)
+        raise ValueError(f"Unknown acquisition mode: {acq_mode}")
+
+    def _archive_meta(self):
+        """
+        Spectrometer position and spectral axis for archive headers, analyze_archive labels the frames with it
+        """
+        axis = self.get_spectral_axis()
+        if axis is None:
+            return {}
+        return {"spectrometer": self.get_spec_meta(), "axis": {name: np.asarray(values).tolist() for name, values in axis.items()}}
+
+    def process_data(self,raw,maps=None):
+        """
+        Cosmic removal, dark subtraction and intensity correction of a read_data result
+        maps: correction maps captured at readout (_correction_maps), looked up now if None
+        """
+        frame, spectrum = self.camera.finish_acquisition(raw)
+        if frame is not None and self._correcting():
+            frame, spectrum = self.correct_intensity(frame, spectrum, maps)
         return frame,spectrum
 
-    # save data
-    def save_results(self,params,frame,spectrum):
+    # intensity correction
+    def _correcting(self):
+        return self.intensity_correction and self.correction.is_set()
+
+    def _correction_maps(self):
+        read_mode, window = self.camera.get_readout_window()
+        key = (self.spec.grating, self.spec.wavelength, read_mode, window)
+        return self.correction.get_maps(key, read_mode, window, self.camera.cam.get_data_dimensions(), self.get_spectral_axis())
+
+    def correct_intensity(self,frame,spectrum,maps=None):
+        """
+        Flat field + response correction of an acquired frame and its spectrum (or (n, width) spectra)
+        maps: (frame map, spectrum map) for the position the frame was taken at, current position if None
+        """
+        frame_map, spectrum_map = maps or self._correction_maps()
+        corrected = self.correction.apply(frame, frame_map)
+        if corrected is not frame:
+            self.camera.release_frame(frame)    # pooled frame, the corrected copy replaces it
+        if spectrum is not None and spectrum.ndim == 2:
+            spectrum = self.correction.apply(spectrum, spectrum_map)    # kinetic spectra of the raw frames
+        else:
+            spectrum = self.camera.frame_to_spectrum(corrected)
+        return corrected, spectrum
+
+    def set_intensity_correction(self,enabled,flat_path=None,response_path=None):
+        """
+        flat_path: .npy full chip flat, response_path: text file (wavelength nm, relative response)
+        """
+        if flat_path:
+            self.correction.load_flat(flat_path)
+        if response_path:
+            self.correction.load_response(response_path)
+        self.intensity_correction = enabled
+
+    def stop_acquiring(self):
+        self.camera.stop_acquiring()
+
+    def get_acq_stats(self):
+        return self.camera.acq_stats
+
+    def get_settings_stats(self):
+        return self.camera.get_settings_stats()
 
+    # save data
+    def save_results(self,params,frame,spectrum,axis=None,spec_meta=None):
+        """
+        Queue the frame for saving and return immediately (blocks only when the writer queue is full)
+        The frame is released back to the pool once written, the caller must not release it
+        axis / spec_meta default to the current spectrometer position
+        """
         ts = int(time.time())
-        self.camera.save_data(frame, spectrum, ts)
-        self.camera.save_meta(
-            frame=frame,
-            exposure=params["exposure"],
-            hbin=params["hbin"],
-            vbin=params["vbin"],
-            roi=params["roi"],
-            temp=params["temp"],
-            timestamp=ts
-        )
+        if axis is None:
+            axis = self.get_spectral_axis()     # looked up now, the spectrometer may move before the write
+        if spec_meta is None:
+            spec_meta = self.get_spec_meta()
+        self.writer.submit(self._write_results, params, frame, spectrum, ts, axis, spec_meta)
+
+    def _write_results(self,params,frame,spectrum,ts,axis=None,spec_meta=None):
+        # runs on the writer thread
+        try:
+            self.camera.save_data(frame, spectrum, ts, axis)
+            self.camera.save_meta(
+                frame=frame,
+                exposure=params["exposure"],
+                hbin=params["hbin"],
+                vbin=params["vbin"],
+                roi=params["roi"],
+                temp=params["temp"],
+                timestamp=ts,
+                extra=spec_meta
+            )
+            self.camera.flush_session()     # on disk now, a crash later in the run doesn't lose it
+        finally:
+            self.camera.release_frame(frame)
+
+    def on_write_error(self,error):
+        print(f"Saving failed: {error}")
+        self.write_errors.append(error)
+
+    def pop_write_errors(self):
+        errors, self.write_errors = self.write_errors, []
+        return errors
+
+    def flush_writer(self):
+        self.writer.flush()
+
+    def close_writer(self):
+        self.writer.close()
+        self.camera.close_session()
+        self.camera.close_archive()
+
+    def get_writer_metrics(self):
+        return self.writer.metrics()
 
 
 
@@ -218,7 +539,125 @@ class RamanCameraController:
             return
         self.spec.set_slit_width(slit,width)
         return
+
+    def apply_spec_settings(self,wavelength=None,grating=None,slits=None):
+        """
+        Set everything in one go, only settings that differ from the current state are moved
+        Returns the list of moved settings
+        """
+        return self.spec.apply(wavelength=wavelength, grating=grating, slits=slits)
+
+    def apply_spec_settings_async(self,wavelength=None,grating=None,slits=None):
+        """
+        Like apply_spec_settings but runs on the spectrometer thread, returns a Future with the moved settings
+        """
+        return self.spec.apply_async(wavelength=wavelength, grating=grating, slits=slits)
+
+    def acquire_at(self,params,wavelength=None,grating=None,slits=None,prepare=None):
+        """
+        Move the spectrometer and acquire as soon as it is in place
+        prepare(): camera work that doesn't need the light path (settings push, darks), runs while the spectrometer moves
+        """
+        move = self.spec.apply_async(wavelength=wavelength, grating=grating, slits=slits)
+        if prepare is not None:
+            prepare()
+        move.result()   # re-raises a failed move
+        return self.acquire_data(params)
+
+    def acquire_stitched(self,params,start,stop,overlap=0.15,save=True,match=True):
+        """
+        Spectrum over start..stop (m) glued from several spectrometer windows
+        The move to window k+1 starts right after window k is read out, cosmic removal, dark subtraction,
+        intensity correction and saving of window k run while the grating moves (with the axis and
+        correction maps captured before the move).
+        Kinetic series are glued as their mean spectrum.
+        Returns {"wavelength_nm", "raman_shift_cm1", "spectrum", "centers", "scales"}
+        """
+        axis = self.get_spectral_axis()
+        if axis is None:
+            raise RuntimeError("Stitched acquisition needs the camera and the spectrometer connected")
+        span = abs(axis["wavelength_nm"][-1] - axis["wavelength_nm"][0]) * 1e-9     # calibration may decrease along the chip
+        centers = plan_windows(start, stop, span, overlap)
+        print(f"Stitched scan: {len(centers)} windows of {span * 1e9:.1f} nm")
+
+        windows = []
+        move = self.spec.set_wavelength_async(centers[0])
+        for k in range(len(centers)):
+            move.result()
+            raw = self.read_data(params)
+            # everything that depends on the spectrometer position, before it moves on
+            axis = self.get_spectral_axis()
+            spec_meta = self.get_spec_meta()
+            maps = self._correction_maps() if self._correcting() else None
+            if k + 1 < len(centers):
+                move = self.spec.set_wavelength_async(centers[k + 1])
+
+            # processing / saving of window k, overlaps with the move
+            frame, spectrum = self.process_data(raw, maps)
+            if frame is None:
+                move.result()
+                raise RuntimeError(f"No frame acquired for stitched window {k + 1} of {len(centers)}")
+            line = np.asarray(spectrum, dtype=np.float64)
+            if line.ndim == 2:
+                line = line.mean(axis=0)
+            wavelength = axis["wavelength_nm"]
+            if wavelength[-1] < wavelength[0]:
+                wavelength, line = wavelength[::-1], line[::-1]     # glue needs increasing axes
+            windows.append((wavelength, line))
+            if save:
+                self.save_results(params, frame, spectrum, axis, spec_meta)
+            else:
+                self.camera.release_frame(frame)
+
+        wavelength, spectrum, scales = glue(windows, match=match)
+        laser = self.spec.calibration.laser_wavelength * 1e9
+        result = {
+            "wavelength_nm": wavelength,
+            "raman_shift_cm1": 1e7 / laser - 1e7 / wavelength,
+            "spectrum": spectrum,
+            "centers": centers,
+            "scales": scales,
+        }
+        if save:
+            self.writer.submit(self.camera.save_data, None, spectrum, int(time.time()),
+                               {"wavelength_nm": wavelength, "raman_shift_cm1": result["raman_shift_cm1"]})
+            self.writer.submit(self.camera.flush_session)
+        return result
+
+    def get_spec_state(self):
+        return self.spec.get_state()
+
+    def get_spec_stats(self):
+        return {"skipped_moves": self.spec.skipped_moves, "saved_time_s": self.spec.saved_time}
     
+    def get_spectral_axis(self):
+        """
+        Cached wavelength / Raman shift axis for the current camera window and spectrometer position
+        None if the spectrometer is not connected or is moving
+        """
+        if not self.spec.spec or not self.camera.cam:
+            return None
+        hstart, hend, hbin = self.camera.get_spectral_window()
+        n_pixels, _ = self.camera.detect_cam_size()
+        pixel_width, _ = self.camera.get_pixel_size()
+        return self.spec.get_axis(hstart, hend, hbin, n_pixels, pixel_width)
+
+    def get_spec_meta(self):
+        if not self.spec.spec:
+            return None
+        state = self.spec.get_state()   # one consistent snapshot, a move may be running on the spectrometer thread
+        return {
+            "grating": state["grating"],
+            "center_wavelength_m": state["wavelength"],
+            "laser_wavelength_m": self.spec.calibration.laser_wavelength,
+        }
+
+    def set_laser_wavelength(self,wavelength):
+        """
+        Laser line in m for the Raman shift axis
+        """
+        self.spec.calibration.set_laser_wavelength(wavelength)
+
     def get_default_settings_spec(self):
 
         self.spec.get_default_settings()
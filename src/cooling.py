@@ -0,0 +1,182 @@
+import threading
+import time
+import numpy as np
+from collections import deque
+
+
+def predict_eta(times, temps, target, band=0.0):
+    """
+    Seconds until the temperature is within band of target, from the recent trajectory.
+    Returns (eta, rate C/s, asymptote C): eta is inf if the trajectory does not get there, None without enough samples.
+
+    A TEC approaches its final temperature exponentially, dT/dt = (T_inf - T) / tau, so dT/dt is fitted
+    as a straight line in T; while the cooler still runs at full power (constant rate) tau is very long
+    and the result is the same as a linear extrapolation.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    temps = np.asarray(temps, dtype=np.float64)
+    if len(times) < 5 or times[-1] - times[0] <= 0:
+        return None, None, None
+
+    rate = np.polyfit(times - times[-1], temps, 1)[0]
+    temp = temps[-1]
+    goal = target + band if temp > target else target - band    # edge of the band on our side
+    if (temp - goal) * (temp - target) <= 0:
+        return 0.0, rate, None
+
+    slope, intercept = np.polyfit((temps[1:] + temps[:-1]) / 2, np.diff(temps) / np.diff(times), 1)
+    if slope < 0:
+        asymptote, tau = -intercept / slope, -1 / slope
+        gap_now, gap_goal = temp - asymptote, goal - asymptote
+        if gap_now * gap_goal > 0 and abs(gap_goal) < abs(gap_now):
+            return tau * np.log(gap_now / gap_goal), rate, asymptote
+        return np.inf, rate, asymptote      # levels off before the band (cooler at its limit)
+
+    if rate * (goal - temp) > 0:
+        return (goal - temp) / rate, rate, None
+    return np.inf, rate, None
+
+
+class ThermalController:
+    """
+    Cooling / warm-up state machine of a RamanCameraModel, following its telemetry samples.
+
+    cooling -> near (within near_band of the setpoint, acquisitions that tolerate it may start)
+            -> stable (SDK reports "stabilized", or within tolerance and the rate stays below stable_rate for stable_window)
+    warming -> warm (at or above the safe temperature)
+    Every run ends in stable / warm / cancelled / timeout. Starting a run cancels the one in progress.
+    on_progress(progress) is called with every sample: state, temperature, target, rate, eta, status, elapsed.
+    """
+
+    def __init__(self, camera, near_band=3.0, tolerance=0.5, stable_rate=0.5, stable_window=20.0, fit_window=60.0):
+        self.camera = camera
+        self.near_band = near_band          # C
+        self.tolerance = tolerance          # C
+        self.stable_rate = stable_rate      # C/min
+        self.stable_window = stable_window  # s
+        self.fit_window = fit_window        # s of trajectory used for the rate / ETA fit
+
+        self.state = "idle"
+        self.target = None
+        self.progress = {}
+
+        self._samples = deque()     # (time, temperature) of the current run
+        self._cancel = threading.Event()
+        self._changed = threading.Condition()
+        self._run_lock = threading.RLock()     # cancel() from a progress callback must not deadlock
+        self._running = False
+
+    # ===== STATE =====
+
+    def _set_state(self, state):
+        with self._changed:
+            self.state = state
+            self._changed.notify_all()
+
+    def is_running(self):
+        return self._running
+
+    def is_ready(self, near=True):
+        """
+        Cold enough to acquire: stable, or near the setpoint if near is True (idle counts as ready, nothing to wait for)
+        """
+        return self.state in (["stable", "near"] if near else ["stable"]) or not self._running
+
+    def wait_ready(self, near=True, timeout=None):
+        with self._changed:
+            return self._changed.wait_for(lambda: self.is_ready(near), timeout)
+
+    def cancel(self):
+        """
+        Stop the run in progress (cooler settings stay as they are) and wait until it has returned
+        """
+        self._cancel.set()
+        with self._run_lock:
+            pass
+
+    # ===== RUNS =====
+
+    def cool(self, target, timeout=None, on_progress=None):
+        """
+        Set the setpoint, follow the temperature until it is stable; returns the final state
+        """
+        return self._run("cooling", target, timeout, on_progress)
+
+    def warm(self, safe_temp=-20, timeout=None, on_progress=None):
+        """
+        Cooler off, follow the temperature until it is at least safe_temp; returns the final state
+        """
+        return self._run("warming", safe_temp, timeout, on_progress)
+
+    def _run(self, kind, target, timeout, on_progress):
+        self.cancel()
+        with self._run_lock:
+            self._cancel.clear()
+            self._running = True
+            self._samples.clear()
+            self.target = target
+            self._set_state(kind)
+            try:
+                if kind == "cooling":
+                    self.camera.cam.set_temperature(target, enable_cooler=True)
+                else:
+                    self.camera.cam.set_cooler(on=False)
+                self.camera.telemetry.request()
+                state = self._follow(kind, target, timeout, on_progress)
+            except Exception:
+                self._running = False
+                self._set_state("idle")
+                raise
+            finally:
+                self._running = False
+            self._set_state(state)
+            if self.progress.get("state") != state:
+                self._report(state, on_progress)    # cancelled / timeout, the last sample was reported already
+            return state
+
+    def _follow(self, kind, target, timeout, on_progress):
+        t0 = time.time()
+        while True:
+            if self._cancel.is_set():
+                return "cancelled"
+            temp, status = self.camera.next_temp()
+            now = time.time()
+            self._samples.append((now, temp))
+            while now - self._samples[0][0] > max(self.fit_window, self.stable_window):
+                self._samples.popleft()
+
+            state = self._cooling_state(temp, status, target, now) if kind == "cooling" else \
+                ("warm" if temp >= target else "warming")
+            if state != self.state:
+                self._set_state(state)
+            self._report(state, on_progress, temp, status, now - t0)
+            if state in ("stable", "warm"):
+                return state
+            if timeout is not None and now - t0 > timeout:
+                return "timeout"
+
+    def _cooling_state(self, temp, status, target, now):
+        if status == "stabilized" and abs(temp - target) <= self.near_band:
+            return "stable"
+        if abs(temp - target) <= self.tolerance and status != "drifted":
+            recent = np.array([s for s in self._samples if now - s[0] <= self.stable_window])
+            covered = len(recent) >= 3 and recent[-1, 0] - recent[0, 0] >= 0.9 * self.stable_window
+            if covered and abs(np.polyfit(recent[:, 0] - now, recent[:, 1], 1)[0]) * 60 < self.stable_rate:
+                return "stable"
+        return "near" if abs(temp - target) <= self.near_band else "cooling"
+
+    def _report(self, state, on_progress, temp=None, status=None, elapsed=None):
+        if temp is not None:
+            recent = [s for s in self._samples if s[0] >= self._samples[-1][0] - self.fit_window]
+            times, temps = zip(*recent)
+            band = 0.0 if state in ("warming", "warm") else self.tolerance
+            eta, rate, asymptote = predict_eta(times, temps, self.target, band)
+            if state in ("stable", "warm"):
+                eta = 0.0
+            self.progress = {"state": state, "temperature": temp, "target": self.target, "status": status,
+                             "rate_C_per_min": None if rate is None else rate * 60, "eta_s": eta,
+                             "asymptote": asymptote, "elapsed_s": elapsed}
+        else:
+            self.progress = dict(self.progress, state=state)
+        if on_progress:
+            on_progress(self.progress)
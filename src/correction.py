@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class ResponseCorrection:
+    """
+    Flat field (pixel-to-pixel gain) and spectral response (grating efficiency x detector QE) correction.
+
+    The full-chip flat and the response curve are set once. For every readout configuration
+    (grating, centre wavelength, read mode, ROI / track, binning) they are combined into contiguous float32
+    reciprocal maps, so correcting a frame or a spectrum is a single multiply.
+    """
+
+    def __init__(self, max_entries=16):
+        self.flat = None            # full chip gain, mean 1, (rows, cols)
+        self.response = None        # (wavelength_nm, relative response), response peaks at 1
+        self.max_entries = max_entries
+        self._maps = {}
+
+    def invalidate(self):
+        self._maps.clear()
+
+    # ===== SOURCES =====
+
+    def set_flat(self, flat):
+        flat = np.asarray(flat, dtype=np.float64)
+        self.flat = flat / flat.mean()
+        self.invalidate()
+
+    def load_flat(self, path):
+        self.set_flat(np.load(path))
+
+    def derive_flat(self, lamp_frame, smooth=31):
+        """
+        Pixel gain from a full-chip frame of a smooth (white light / LED) source:
+        the frame divided by itself smoothed along the spectral axis (moving average of smooth columns)
+        """
+        lamp = np.asarray(lamp_frame, dtype=np.float64)
+        half = smooth // 2
+        padded = np.pad(lamp, ((0, 0), (half, half)), mode="reflect")
+        csum = np.cumsum(padded, axis=1)
+        csum = np.concatenate([np.zeros((lamp.shape[0], 1)), csum], axis=1)
+        smoothed = (csum[:, smooth:] - csum[:, :-smooth]) / smooth
+        self.set_flat(np.divide(lamp, smoothed, out=np.ones_like(lamp), where=smoothed > 0))
+        return self.flat
+
+    def set_response(self, wavelength_nm, response):
+        wavelength_nm = np.asarray(wavelength_nm, dtype=np.float64)
+        response = np.asarray(response, dtype=np.float64)
+        order = np.argsort(wavelength_nm)
+        self.response = (wavelength_nm[order], response[order] / response.max())
+        self.invalidate()
+
+    def load_response(self, path):
+        """
+        Text file with two columns: wavelength (nm), relative response
+        """
+        data = np.loadtxt(path)
+        self.set_response(data[:, 0], data[:, 1])
+
+    def is_set(self):
+        return self.flat is not None or self.response is not None
+
+    # ===== MAPS =====
+
+    def _gain(self, read_mode, window, shape):
+        """
+        Flat binned the same way as the chip is read out
+        """
+        if self.flat is None:
+            return np.ones(shape)
+        if read_mode == "image":
+            hstart, hend, vstart, vend, hbin, vbin = window
+            rows, cols = (vend - vstart) // vbin, (hend - hstart) // hbin
+            roi = self.flat[vstart:vstart + rows * vbin, hstart:hstart + cols * hbin]
+            return roi.reshape(rows, vbin, cols, hbin).mean(axis=(1, 3))
+        if read_mode == "single_track":
+            center, width = window
+            start = max(0, center - width // 2)
+            return self.flat[start:start + width].mean(axis=0, keepdims=True)
+        return self.flat.mean(axis=0, keepdims=True)     # fvb
+
+    def get_maps(self, key, read_mode, window, shape, axis=None):
+        """
+        key: hashable configuration, e.g. (grating, centre wavelength, read mode, window)
+        window: camera ROI (hstart, hend, vstart, vend, hbin, vbin) / track (center, width) / () for fvb
+        shape: frame shape of this configuration, axis: calibration axis of its columns (None: no response correction)
+        Returns (frame map (rows, cols), spectrum map (cols,)), float32 reciprocals
+        """
+        maps = self._maps.get(key)
+        if maps is not None:
+            return maps
+
+        gain = self._gain(read_mode, window, shape)
+        if self.response is not None and axis is not None:
+            wavelength, response = self.response
+            gain = gain * np.interp(axis["wavelength_nm"], wavelength, response)[None, :]
+
+        frame_map = np.ascontiguousarray(np.divide(1.0, gain, out=np.zeros_like(gain), where=gain > 0), dtype=np.float32)
+        column_gain = gain.mean(axis=0)     # for spectra already summed over the rows
+        spectrum_map = np.ascontiguousarray(np.divide(1.0, column_gain, out=np.zeros_like(column_gain), where=column_gain > 0),
+                                            dtype=np.float32)
+        frame_map.flags.writeable = False
+        spectrum_map.flags.writeable = False
+
+        if len(self._maps) >= self.max_entries:
+            self._maps.pop(next(iter(self._maps)))
+        self._maps[key] = (frame_map, spectrum_map)
+        return frame_map, spectrum_map
+
+    @staticmethod
+    def apply(data, correction_map):
+        """
+        data * map, in place for writable float data, otherwise into a new float32 array
+        """
+        out = data if data.dtype.kind == "f" and data.flags.writeable else None
+        return np.multiply(data, correction_map, out=out)
@@ -0,0 +1,126 @@
+import json
+import time
+import hashlib
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+
+
+class DarkLibrary:
+    """
+    Master dark (bias + dark current) frames, reused for every acquisition with the same settings.
+
+    Darks are keyed by everything that changes them: exposure, temperature band, horizontal / vertical
+    shift speed, preamp gain, read mode + ROI / track and binning (see RamanCameraModel.dark_key).
+    The newest max_entries are kept in memory (least recently used dropped first), the newest max_files
+    as .npy files in directory, so they survive restarts. Darks older than max_age_s are not used
+    and their files are removed when a new dark is stored.
+    """
+
+    def __init__(self, directory, max_entries=16, max_age_s=6 * 3600, temp_band=2.0, max_files=64):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_files = max_files
+        self.max_age_s = max_age_s
+        self.temp_band = temp_band      # C, darks within one band are interchangeable
+        self._cache = OrderedDict()     # key -> (dark, created)
+        self.hits = 0
+        self.misses = 0
+
+    def band(self, temperature):
+        return int(round(temperature / self.temp_band))
+
+    def _file(self, key):
+        digest = hashlib.sha1(json.dumps(key).encode()).hexdigest()[:16]
+        return self.directory / f"dark_{digest}.npy"
+
+    def _expired(self, created):
+        return self.max_age_s is not None and time.time() - created > self.max_age_s
+
+    def get(self, key):
+        """
+        Master dark for key (read-only float32 array) or None if there is no valid one
+        """
+        entry = self._cache.get(key)
+        if entry is None:
+            entry = self._load(key)
+        if entry is None or self._expired(entry[1]):
+            self._cache.pop(key, None)
+            self.misses += 1
+            return None
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        self._evict()
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, dark, frames=None):
+        """
+        Store a new master dark (memory + disk)
+        """
+        dark = np.array(dark, dtype=np.float32)
+        dark.flags.writeable = False
+        created = time.time()
+        self._cache[key] = (dark, created)
+        self._cache.move_to_end(key)
+        self._evict()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._file(key)
+        np.save(path, dark)
+        path.with_suffix(".json").write_text(json.dumps({"key": key, "created": created, "frames": frames}))
+        self._prune()
+        return dark
+
+    def _load(self, key):
+        path = self._file(key)
+        meta = path.with_suffix(".json")
+        if not path.exists() or not meta.exists():
+            return None
+        created = json.loads(meta.read_text())["created"]
+        if self._expired(created):
+            return None
+        dark = np.load(path)
+        dark.flags.writeable = False
+        return dark, created
+
+    def _evict(self):
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _prune(self):
+        """
+        Remove expired dark files and the oldest ones beyond max_files
+        """
+        files = []
+        for meta in self.directory.glob("dark_*.json"):
+            try:
+                created = json.loads(meta.read_text())["created"]
+            except (ValueError, KeyError, OSError):     # damaged entry
+                created = 0.0
+            files.append((created, meta))
+        files.sort(reverse=True)
+        for i, (created, meta) in enumerate(files):
+            if i >= self.max_files or self._expired(created):
+                meta.with_suffix(".npy").unlink(missing_ok=True)
+                meta.unlink(missing_ok=True)
+
+    def clear(self, disk=False):
+        self._cache.clear()
+        if disk and self.directory.exists():
+            for path in self.directory.glob("dark_*"):
+                path.unlink()
+
+    @staticmethod
+    def subtract(frame, dark, scale=1):
+        """
+        frame - scale * dark in one vectorized pass
+        Float frames that are writable (accumulated means / sums) are corrected in place,
+        integer or read-only (pooled) frames give a new float array
+        """
+        if dark.shape != frame.shape:
+            raise ValueError(f"Dark of shape {dark.shape} does not match the frame {frame.shape}")
+        out = frame if frame.dtype.kind == "f" and frame.flags.writeable else None
+        if scale == 1:
+            return np.subtract(frame, dark, out=out)
+        return np.subtract(frame, np.multiply(dark, scale, dtype=np.float32), out=out)
@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class DisplayMapper:
+    """
+    Maps 16-bit camera frames to 8-bit preview images through a 65536-entry lookup table.
+
+    mode="percentile": limits are percentiles (lo, hi) of a subsampled frame
+    mode="window":     limits are fixed counts (lo, hi)
+    mode="max":        0 .. frame max (old adjust_frame behaviour)
+
+    Limits are recomputed only every `update_every` frames and the LUT is rebuilt only when they change,
+    so a normal frame costs one indexing pass into a preallocated output buffer.
+    gamma < 1 brightens faint signal, log=True compresses bright peaks.
+    """
+
+    def __init__(self, mode="percentile", limits=(0.5, 99.5), update_every=10, gamma=1.0, log=False, sample_step=4):
+        self.mode = mode
+        self.limits = limits
+        self.update_every = update_every
+        self.gamma = gamma
+        self.log = log
+        self.sample_step = sample_step
+
+        self.lut = np.zeros(65536, dtype=np.uint8)
+        self._levels = np.arange(65536, dtype=np.float32)
+        self._out = None        # uint8 output, reused between frames
+        self._in16 = None       # uint16 buffer for non-uint16 input
+        self._window = None     # (lo, hi) the LUT was built for
+        self._count = 0
+
+    # ===== SETTINGS =====
+
+    def set_mode(self, mode, limits):
+        self.mode = mode
+        self.limits = limits
+        self.invalidate()
+
+    def set_gamma(self, gamma):
+        self.gamma = gamma
+        self.invalidate()
+
+    def set_log(self, log):
+        self.log = log
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Force limits and LUT to be recomputed on the next frame
+        """
+        self._window = None
+        self._count = 0
+
+    # ===== MAPPING =====
+
+    def _compute_window(self, frame):
+        if self.mode == "window":
+            lo, hi = self.limits
+        elif self.mode == "max":
+            lo, hi = 0, int(frame.max())
+        else:
+            sample = frame[::self.sample_step, ::self.sample_step]
+            lo, hi = np.percentile(sample, self.limits)
+        lo = int(lo)
+        hi = max(int(hi), lo + 1)   # blank frame -> no division by zero
+        return lo, hi
+
+    def _build_lut(self, lo, hi):
+        t = np.clip((self._levels - lo) / (hi - lo), 0, 1)
+        if self.log:
+            t = np.log1p(t * 1000) / np.log1p(1000)
+        if self.gamma != 1.0:
+            t **= self.gamma
+        self.lut[:] = t * 255 + 0.5
+
+    def _as_uint16(self, frame):
+        """
+        Counts as uint16 on the same absolute scale for every dtype (dark subtracted / corrected float frames
+        included, so "window" limits keep their meaning), clipped to 0..65535
+        """
+        if self._in16 is None or self._in16.shape != frame.shape:
+            self._in16 = np.empty(frame.shape, dtype=np.uint16)
+        np.clip(frame, 0, 65535, out=self._in16, casting="unsafe")
+        return self._in16
+
+    def map(self, frame):
+        """
+        Return the 8-bit image (the buffer is reused, copy it if it has to outlive the next call)
+        """
+        frame = np.atleast_2d(frame)
+        if frame.dtype != np.uint16:
+            frame = self._as_uint16(frame)
+        if self._out is None or self._out.shape != frame.shape:
+            self._out = np.empty(frame.shape, dtype=np.uint8)
+
+        if self._window is None or self._count % self.update_every == 0:
+            window = self._compute_window(frame)
+            if window != self._window:
+                self._build_lut(*window)
+                self._window = window
+        self._count += 1
+
+        np.take(self.lut, frame, out=self._out)
+        return self._out
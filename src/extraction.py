@@ -0,0 +1,143 @@
+import numpy as np
+
+
+class SpectrumExtractor:
+    """
+    Row-summed spectrum with slit curvature ("smile") correction.
+
+    The curvature model gives the horizontal offset (in unbinned pixels) of a spectral line on chip row y:
+        shift(y) = c1 * (y - center_row) + c2 * (y - center_row)^2 + ...
+    Every row is resampled at x + shift(y) by linear interpolation before summing, so a curved line
+    ends up in one column. Gather indices and weights are computed once per ROI / binning,
+    after that a spectrum is one gather, one multiply and one sum (float64).
+    Without a curvature model spectra are plain int64 row sums (float64 for float frames).
+    """
+
+    def __init__(self, coeffs=None, center_row=128, max_entries=8):
+        self.coeffs = None
+        self.center_row = center_row
+        self.max_entries = max_entries
+        self._maps = {}
+        self._buffers = {}
+        if coeffs is not None:
+            self.set_curvature(coeffs, center_row)
+
+    def set_curvature(self, coeffs, center_row=None):
+        """
+        coeffs: (c1, c2, ...) of shift(y), in unbinned pixels (None / all zero: no correction)
+        """
+        self.coeffs = None if coeffs is None or not np.any(coeffs) else np.asarray(coeffs, dtype=np.float64)
+        if center_row is not None:
+            self.center_row = center_row
+        self._maps.clear()
+        self._buffers.clear()
+
+    def curved(self):
+        return self.coeffs is not None
+
+    def shift(self, rows):
+        d = np.asarray(rows, dtype=np.float64) - self.center_row
+        return sum(c * d ** (k + 1) for k, c in enumerate(self.coeffs))
+
+    def calibrate(self, frame, columns, half_width=6, order=2, window=None):
+        """
+        Fit the curvature model from an image of narrow lines (lamp / neon) at the given approximate columns.
+        The line centre is found on every row (centroid around the row maximum), the row offsets
+        relative to the centre row are fitted with a polynomial without constant term.
+        window: (hstart, hend, vstart, vend, hbin, vbin) of the frame, None for a full unbinned chip
+        """
+        frame = np.asarray(frame, dtype=np.float64)
+        hstart, _, vstart, _, hbin, vbin = window or (0, frame.shape[1], 0, frame.shape[0], 1, 1)
+        rows = np.arange(frame.shape[0])
+        offsets = np.arange(-half_width, half_width + 1)
+        search = np.arange(-4 * half_width, 4 * half_width + 1)
+
+        y_all, dx_all = [], []
+        for column in columns:
+            # line maximum on every row (the line can be curved out of a narrow window), then a centroid around it
+            cols = np.clip(column + search, 0, frame.shape[1] - 1)
+            peak = cols[frame[:, cols].argmax(axis=1)]
+            cols = np.clip(peak[:, None] + offsets[None, :], 0, frame.shape[1] - 1)     # (rows, 2 * half_width + 1)
+            patch = np.take_along_axis(frame, cols, axis=1)
+            patch = patch - patch.min(axis=1, keepdims=True)
+            weight = patch.sum(axis=1)
+            centre = (patch * cols).sum(axis=1) / np.where(weight > 0, weight, 1)
+            good = weight > 0.2 * weight.max()                     # rows with enough light
+            y = vstart + (rows[good] + 0.5) * vbin - 0.5            # unbinned row centres
+            x = hstart + (centre[good] + 0.5) * hbin - 0.5
+            ref = np.interp(self.center_row, y, x)
+            y_all.append(y)
+            dx_all.append(x - ref)
+
+        y = np.concatenate(y_all) - self.center_row
+        dx = np.concatenate(dx_all)
+        design = np.stack([y ** (k + 1) for k in range(order)], axis=1)
+        coeffs, *_ = np.linalg.lstsq(design, dx, rcond=None)
+        self.set_curvature(coeffs)
+        return self.coeffs
+
+    def _map(self, shape, window):
+        key = (shape, window)
+        maps = self._maps.get(key)
+        if maps is not None:
+            return maps
+
+        rows, cols = shape
+        hstart, _, vstart, _, hbin, vbin = window
+        y = vstart + (np.arange(rows) + 0.5) * vbin - 0.5          # unbinned centre of every (binned) row
+        shift = self.shift(y) / hbin                                # in (binned) columns
+        x = np.arange(cols)[None, :] + shift[:, None]
+        x = np.clip(x, 0, cols - 1)
+        i0 = np.minimum(np.floor(x).astype(np.intp), cols - 2) if cols > 1 else np.zeros_like(x, dtype=np.intp)
+        frac = x - i0
+
+        base = (np.arange(rows) * cols)[:, None]
+        index = np.stack([base + i0, base + np.minimum(i0 + 1, cols - 1)])     # (2, rows, cols) flat indices
+        weight = np.stack([1 - frac, frac]).astype(np.float32)
+
+        if len(self._maps) >= self.max_entries:
+            self._maps.pop(next(iter(self._maps)))
+        self._maps[key] = (index, weight)
+        return index, weight
+
+    def resample(self, frame, window=None):
+        """
+        Curvature corrected (rows, cols) image in a reused buffer (valid until the next call),
+        float32 for 16 bit frames, float64 for wider ones (accumulated sums)
+        """
+        rows, cols = frame.shape
+        window = window or (0, cols, 0, rows, 1, 1)
+        index, weight = self._map(frame.shape, window)
+        key = (index.shape, frame.dtype)
+        if key not in self._buffers:
+            wide = np.float32 if frame.dtype.itemsize <= 2 else np.float64
+            self._buffers[key] = (np.empty(index.shape, dtype=frame.dtype), np.empty(index.shape, dtype=wide))
+        gathered, buf = self._buffers[key]
+        np.take(frame.reshape(-1), index, out=gathered)
+        np.multiply(gathered, weight, out=buf)
+        return np.add(buf[0], buf[1], out=buf[0])
+
+    def extract(self, frame, window=None, tracks=None):
+        """
+        1-D spectrum of an image frame, or (n_tracks, cols) spectra for tracks = [(first row, end row), ...]
+        window: (hstart, hend, vstart, vend, hbin, vbin) the frame was read with
+        """
+        frame = np.asarray(frame)
+        if frame.ndim != 2:
+            raise ValueError("Spectrum extraction needs a 2-D frame")
+        wide = np.float64 if frame.dtype.kind == "f" or self.curved() else np.int64
+        data = self.resample(frame, window) if self.curved() else frame
+
+        if tracks is None:
+            return data.sum(axis=0, dtype=wide)
+
+        # every track as one reduceat segment, the segments between tracks are dropped
+        bounds = np.asarray(tracks, dtype=np.intp).reshape(-1)
+        if np.any(np.diff(bounds) < 0) or bounds[0] < 0 or bounds[-1] > data.shape[0]:
+            raise ValueError("Tracks must be sorted, non overlapping (first row, end row) pairs inside the frame")
+        padded = np.concatenate([data, np.zeros((1, data.shape[1]), dtype=data.dtype)])  # so end row may equal the frame height
+        sums = np.add.reduceat(padded, bounds, axis=0, dtype=wide)
+        spectra = sums[::2]
+        empty = bounds[0::2] == bounds[1::2]
+        spectra[empty] = 0      # reduceat returns the row itself for empty segments
+        return spectra
@@ -0,0 +1,124 @@
+import threading
+import numpy as np
+from collections import deque
+
+
+class FrameRing:
+    """
+    Fixed-size ring of frames between the live thread (push) and the GUI (pop).
+
+    policy="latest": pop() returns the newest frame and drops everything older (smooth preview, frames skipped)
+    policy="queue":  pop() returns frames in order, when the ring is full the oldest one is dropped
+    on_drop(frame) is called for every frame that leaves the ring without being shown.
+    """
+
+    def __init__(self, size=4, policy="latest", on_drop=None):
+        if policy not in ("latest", "queue"):
+            raise ValueError(f"Unknown ring policy: {policy}")
+        self.size = size
+        self.policy = policy
+        self.on_drop = on_drop
+
+        self._frames = deque()
+        self._lock = threading.Lock()
+
+        # counters
+        self.pushed = 0
+        self.popped = 0
+        self.dropped = 0
+
+    def _drop(self, frame):
+        self.dropped += 1
+        if self.on_drop:
+            self.on_drop(frame)
+
+    def push(self, frame):
+        with self._lock:
+            self._frames.append(frame)
+            self.pushed += 1
+            if len(self._frames) > self.size:
+                self._drop(self._frames.popleft())
+
+    def pop(self):
+        """
+        Next frame to render or None if nothing new arrived
+        """
+        with self._lock:
+            if not self._frames:
+                return None
+            if self.policy == "latest":
+                frame = self._frames.pop()
+                while self._frames:
+                    self._drop(self._frames.popleft())
+            else:
+                frame = self._frames.popleft()
+            self.popped += 1
+            return frame
+
+    def clear(self):
+        with self._lock:
+            while self._frames:
+                self._drop(self._frames.popleft())
+
+    def __len__(self):
+        return len(self._frames)
+
+
+class FramePool:
+    """
+    Preallocated, reusable buffers for incoming camera frames.
+
+    put(frame) copies the frame into a free contiguous buffer and returns a read-only view of it,
+    release(view) gives the buffer back. Up to `capacity` buffers are kept per frame shape;
+    when all of them are handed out put() falls back to a plain copy (counted in `misses`).
+    """
+
+    def __init__(self, capacity=8, dtype=np.uint16):
+        self.capacity = capacity
+        self.dtype = dtype
+
+        self._free = {}     # shape -> [buffers]
+        self._allocated = {}    # shape -> number of buffers
+        self._out = {}      # id(buffer) -> buffer, currently handed out
+        self._lock = threading.Lock()
+        self.misses = 0
+
+    def _take(self, shape):
+        with self._lock:
+            free = self._free.setdefault(shape, [])
+            if free:
+                buf = free.pop()
+            elif self._allocated.get(shape, 0) < self.capacity:
+                buf = np.empty(shape, dtype=self.dtype)
+                self._allocated[shape] = self._allocated.get(shape, 0) + 1
+            else:
+                self.misses += 1
+                return None
+            self._out[id(buf)] = buf
+            return buf
+
+    def put(self, frame):
+        if frame is None:
+            return None
+        frame = np.asarray(frame)
+        buf = self._take(frame.shape)
+        if buf is None:
+            buf = np.empty(frame.shape, dtype=self.dtype)   # pool exhausted, not recycled
+        np.copyto(buf, frame, casting="unsafe")
+        view = buf.view()
+        view.flags.writeable = False
+        return view
+
+    def release(self, frame):
+        """
+        Return a frame obtained from put() to the pool (other arrays are ignored)
+        """
+        if frame is None or frame.base is None:
+            return
+        with self._lock:
+            buf = self._out.pop(id(frame.base), None)
+            if buf is not None:
+                self._free[buf.shape].append(buf)
+
+    def outstanding(self):
+        return len(self._out)
@@ -2,9 +2,11 @@ import atexit
 import sys
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QStackedWidget, QLineEdit, QPushButton, QFileDialog, QLabel, QComboBox, QMessageBox
 from PyQt5.QtGui import QIntValidator, QDoubleValidator, QImage, QPixmap
-from PyQt5.QtCore import pyqtSignal, QTimer, QThread
+from PyQt5.QtCore import pyqtSignal, QTimer, QThread, QObject
 import os
+import time
 from controller import RamanCameraController
+from framebuf import FrameRing
 
 def _safe_exit_close():
     """Extra safety: runs even if an exception kills the app."""
@@ -38,6 +40,12 @@ def _safe_exit_close():
         except:
             pass
 
+        # Finish pending writes
+        try:
+            ctrl.close_writer()
+        except:
+            pass
+
     except Exception as e:
         print("[EXIT] Error in atexit shutdown:", e)
 
@@ -64,6 +72,7 @@ class MainWindow(QWidget):
         self.btn_acquire = QPushButton("Acquire")
         self.btn_disconnect_cam = QPushButton("Disconnect Camera")
         self.temp = QLabel("Temp: -- °C")
+        self.peak_readout = QLabel("Peaks: --")
 
         # Spectrometer controls
         self.btn_connect_spec = QPushButton("Connect Spectrometer")
@@ -122,6 +131,7 @@ class MainWindow(QWidget):
         layout = QVBoxLayout()
         layout.addWidget(self.preview)
         layout.addWidget(self.temp)
+        layout.addWidget(self.peak_readout)
         hl = QHBoxLayout()
         hl.addWidget(self.btn_connect_cam)
         hl.addWidget(self.btn_live)
@@ -166,13 +176,28 @@ class MainWindow(QWidget):
         self.btn_disconnect_spec.clicked.connect(self.disconnect_spec)
         self.btn_update_spec.clicked.connect(self.update_spec_settings)
 
-        # Live preview updates
+        # spectrometer moves run in the background, completion comes back as signals
+        self.spec_moves = FutureSignals()
+        self.spec_moves.done.connect(self.on_spec_moved)
+        self.spec_moves.failed.connect(self.on_spec_move_failed)
+
+        # Live preview: LiveWorker reads the camera into the ring, the timer renders at the screen refresh rate
+        self.live_policy = "latest"     # "latest" (drop old frames) | "queue" (show every frame, drop when ring is full)
+        self.ring = FrameRing(size=4, policy=self.live_policy, on_drop=self.controller.release_frame)
+        self.live_worker = None
+        refresh = QApplication.primaryScreen().refreshRate() or 60
+        self.display_interval_ms = max(1, int(1000 / refresh))
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_preview)
+        self.peak_interval = 0.5        # s between peak readout updates (fitted on the LiveWorker), every frame is not needed
 
-        # Display temperature
+        # Display temperature, cooling / warm-up progress comes from the worker threads
+        self.cooling_worker = None
+        self.warm_worker = None
+        self.cooling_progress = None
         self.timer_temp = QTimer()
         self.timer_temp.timeout.connect(self.display_temp)
+        self.timer_temp.timeout.connect(self.check_write_errors)
         self.timer_temp.start(1000)
 
     def closeEvent(self, event):
@@ -185,11 +210,7 @@ class MainWindow(QWidget):
         try:
             # Stop live preview if running
             try:
-                self.timer.stop()
-            except:
-                pass
-            try:
-                self.controller.stop_live()
+                self.stop_live()
             except:
                 pass
 
@@ -213,6 +234,12 @@ class MainWindow(QWidget):
             except Exception as e:
                 print("Spectrometer disconnect failed:", e)
 
+            # Wait for queued saves and close the session file
+            try:
+                self.controller.close_writer()
+            except Exception as e:
+                print("Closing writer failed:", e)
+
         except Exception as e:
             print("[GUI] Unexpected error during closeEvent:", e)
 
@@ -224,17 +251,26 @@ class MainWindow(QWidget):
     # ==== Camera methods =====
 
     def connect_cam(self):
+        if self.cooling_worker is not None and self.cooling_worker.isRunning():
+            return
         self.controller.connect_cam()
         self.disable_buttons()
-        self.worker = CoolingWorker(self.controller,target_temp=-80)
-        self.worker.finished.connect(self.enable_buttons)
-        self.worker.start()
+        # own attribute: the running thread must stay referenced, Connect stays disabled until cooling has finished
+        self.cooling_worker = CoolingWorker(self.controller,target_temp=-80)
+        self.cooling_worker.ready.connect(self.enable_acquisition_buttons)      # usable near the setpoint, cooling goes on
+        self.cooling_worker.progress.connect(self.on_cooling_progress)
+        self.cooling_worker.finished.connect(self.enable_buttons)
+        self.cooling_worker.start()
 
     def disconnect_cam(self):
+        self.stop_live()
         self.disable_buttons()
-        self.worker = WarmUpCloseWorker(self.controller)
-        self.worker.finished.connect(self.enable_buttons)
-        self.worker.start()
+        if self.cooling_worker is not None and self.cooling_worker.isRunning():
+            self.cooling_worker.finished.disconnect(self.enable_buttons)     # cancelled by the warm-up, buttons wait for it
+        self.warm_worker = WarmUpCloseWorker(self.controller)
+        self.warm_worker.progress.connect(self.on_cooling_progress)
+        self.warm_worker.finished.connect(self.enable_buttons)
+        self.warm_worker.start()
 
     def disable_buttons(self):
         for b in [self.btn_connect_cam, self.btn_live, self.btn_stop, self.btn_acquire]:
@@ -244,23 +280,59 @@ class MainWindow(QWidget):
         for b in [self.btn_connect_cam, self.btn_live, self.btn_stop, self.btn_acquire]:
             b.setEnabled(True)
 
+    def enable_acquisition_buttons(self):
+        for b in [self.btn_live, self.btn_stop, self.btn_acquire]:
+            b.setEnabled(True)
+
     def display_temp(self):
         temp,status = self.controller.get_temp()
-        self.temp.setText(f"Temp: {temp} °C | {status}")
+        text = f"Temp: {temp} °C | {status}"
+        if self.cooling_progress and self.cooling_progress["state"] in ("cooling", "near", "warming"):
+            eta = self.cooling_progress["eta_s"]
+            if eta is not None:
+                eta = "setpoint not reachable" if eta == float("inf") else f"ETA {eta:.0f} s"
+                text += f" | {self.cooling_progress['state']}, {eta}"
+        self.temp.setText(text)
+
+    def on_cooling_progress(self,progress):
+        self.cooling_progress = progress
+
+    def check_write_errors(self):
+        errors = self.controller.pop_write_errors()
+        if errors:
+            self.show_error(f"Saving failed: {errors[-1]}")
 
     def start_live(self):
+        if self.live_worker is not None:
+            return
         self.controller.start_live()
-        self.timer.start(30)    # 30 is FPS, we might change it
+        self.ring.clear()
+        self.live_worker = LiveWorker(self.controller, self.ring, peak_interval=self.peak_interval)
+        self.live_worker.peaks.connect(self.display_peaks)
+        self.live_worker.start()
+        self.timer.start(self.display_interval_ms)
 
     def stop_live(self):
         self.timer.stop()
+        if self.live_worker is not None:
+            self.live_worker.stop()     # must stop reading before the acquisition is stopped
+            self.live_worker = None
         self.controller.stop_live()
+        self.ring.clear()
 
     def update_preview(self):
-        frame = self.controller.get_live_frame()
+        frame = self.ring.pop()
         if frame is None:
             return
         self.display_image(frame)
+        self.controller.release_frame(frame)
+
+    def display_peaks(self,peaks,unit):
+        if len(peaks) == 0:
+            self.peak_readout.setText("Peaks: --")
+            return
+        text = " | ".join(f"{p['position']:.1f} {unit} (FWHM {p['fwhm']:.1f}, h {p['height']:.0f})" for p in peaks)
+        self.peak_readout.setText(f"Peaks: {text}")
 
     def display_image(self,frame):
         # !!! this needs to be fixed
@@ -275,10 +347,13 @@ class MainWindow(QWidget):
         ))
     
     def acquire_frame(self):
+        if self.live_worker is not None:
+            self.stop_live()
         frame = self.controller.acquire_single()
         if frame is None:
             return
         self.display_image(frame)
+        self.controller.release_frame(frame)
 
     def toggle_accum_input(self, mode):
         if mode == "accumulate":
@@ -336,49 +411,126 @@ class MainWindow(QWidget):
         grating_text = self.grating_input.text()
         slit_width_text = self.slit_width_input.text()
 
-        if wavelength_text:
-            try:
+        wavelength = grating = None
+        slits = {}
+        try:
+            if wavelength_text:
                 wavelength = float(wavelength_text)
-                self.controller.set_wavelength_spec(wavelength)
-            except ValueError:
-                self.show_error("Invalid wavelength value")
+        except ValueError:
+            self.show_error("Invalid wavelength value")
+            return
 
-        if grating_text:
-            try:
+        try:
+            if grating_text:
                 grating = int(grating_text)
-                self.controller.set_grating_spec(grating)
-            except ValueError:
-                self.show_error("Invalid grating value")
+        except ValueError:
+            self.show_error("Invalid grating value")
+            return
+
+        try:
+            if slit_width_text:
+                slits["input_side"] = float(slit_width_text)  # Example for input_side
+        except ValueError:
+            self.show_error("Invalid slit width value")
+            return
+
+        # unchanged values are not sent to the spectrometer (no grating swap if the grating is already in place)
+        # the move runs on the spectrometer thread, the button is enabled again when it is done
+        self.btn_update_spec.setEnabled(False)
+        future = self.controller.apply_spec_settings_async(wavelength=wavelength, grating=grating, slits=slits)
+        self.spec_moves.watch(future)
+
+    def on_spec_moved(self, moved):
+        self.btn_update_spec.setEnabled(True)
+        if moved:
+            print(f"Spectrometer moved: {', '.join(moved)}")
+
+    def on_spec_move_failed(self, message):
+        self.btn_update_spec.setEnabled(True)
+        self.show_error(f"Spectrometer move failed: {message}")
+
+
+class FutureSignals(QObject):
+    """
+    Turns concurrent.futures results into Qt signals, delivered on the GUI thread
+    """
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def watch(self, future):
+        future.add_done_callback(self._emit)
+
+    def _emit(self, future):
+        # runs on the thread that completed the future
+        error = future.exception()
+        if error is not None:
+            self.failed.emit(str(error))
+        else:
+            self.done.emit(future.result())
 
-        if slit_width_text:
-            try:
-                slit_width = float(slit_width_text)
-                self.controller.set_slit_width_spec("input_side", slit_width)  # Example for input_side
-            except ValueError:
-                self.show_error("Invalid slit width value")
-        
 
 class CoolingWorker(QThread):
     finished = pyqtSignal()
+    progress = pyqtSignal(dict)
+    ready = pyqtSignal()        # near the setpoint, acquisitions may start
 
     def __init__(self, controller, target_temp):
         super().__init__()
         self.controller = controller
         self.target_temp = target_temp
+        self.ready_sent = False
+
+    def report(self, progress):
+        self.progress.emit(dict(progress))
+        if not self.ready_sent and progress["state"] in ("near", "stable"):
+            self.ready_sent = True
+            self.ready.emit()
 
     def run(self):
-        self.controller.cool_cam(self.target_temp)
+        self.controller.cool_cam(self.target_temp, on_progress=self.report)
         self.finished.emit()    # unlock buttons
 
+class LiveWorker(QThread):
+    """
+    Owns the camera read loop during live mode, so SDK waits never block the GUI
+    Every peak_interval s the peaks of a frame are fitted here too and sent with the peaks signal
+    """
+    peaks = pyqtSignal(object, str)     # PEAK_DTYPE array, unit
+
+    def __init__(self, controller, ring, peak_interval=0.5):
+        super().__init__()
+        self.controller = controller
+        self.ring = ring
+        self.peak_interval = peak_interval
+        self.running = False
+
+    def run(self):
+        self.running = True
+        last_peaks = 0.0
+        while self.running:
+            frame = self.controller.wait_live_frame(timeout=0.2)
+            if frame is None:
+                continue
+            now = time.monotonic()
+            if now - last_peaks >= self.peak_interval:     # before push, the GUI releases the frame after showing it
+                last_peaks = now
+                self.peaks.emit(*self.controller.live_peaks(frame))
+            self.ring.push(frame)
+
+    def stop(self):
+        self.running = False
+        self.wait()
+
 class WarmUpCloseWorker(QThread):
     finished = pyqtSignal()
+    progress = pyqtSignal(dict)
 
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
 
     def run(self):
-        self.controller.warm_cam()
+        self.controller.warm_cam(on_progress=lambda progress: self.progress.emit(dict(progress)))
         self.controller.disconnect_cam()
         self.finished.emit()
 
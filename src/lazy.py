@@ -0,0 +1,18 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Module that is imported on first attribute access.
+    Device SDK wrappers (pylablib loads its Andor libraries and pandas, about a second) are only needed
+    once a device is connected, so importing them must not delay the window.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
@@ -0,0 +1,239 @@
+import numpy as np
+
+
+PEAK_DTYPE = np.dtype([
+    ("spectrum", "u4"),         # row of the stack the peak belongs to
+    ("column", "f4"),           # fitted centre in (binned) pixels
+    ("position", "f8"),         # fitted centre in axis units (pixels without an axis)
+    ("height", "f4"),           # counts above the local offset
+    ("fwhm", "f4"),             # axis units
+    ("area", "f4"),             # counts * axis units
+    ("offset", "f4"),           # local constant background
+    ("eta", "f4"),              # Lorentzian fraction (1 for pure Lorentzians)
+    ("rms", "f4"),              # fit residual
+    ("converged", "?"),
+])
+PROFILES = ["lorentzian", "pseudo_voigt"]
+LN2 = np.log(2)
+
+
+class PeakAnalyzer:
+    """
+    Peak detection and profile fitting for one spectrum (n,) or a stack (N, n), e.g. kinetic / stitched runs.
+
+    Detection is vectorized over the whole stack: local maxima that are the highest point within
+    min_distance pixels and rise nsigma noise levels above the lower of their two flanks.
+    Every peak is then fitted on the 2 * half_window + 1 pixels around it (cut half way to a closer neighbour)
+    with height * profile + offset.
+    All peaks are fitted together by one batched Levenberg-Marquardt: analytic Jacobians for all windows,
+    the (M, k, k) normal equations solved with one np.linalg.solve per iteration and damping per peak.
+    "pseudo_voigt" is eta * Lorentzian + (1 - eta) * Gaussian of the same width, the usual Voigt approximation.
+    """
+
+    def __init__(self, profile="lorentzian", nsigma=5, min_distance=5, half_window=8, max_peaks=None,
+                 max_iter=30, tol=1e-4, max_batch=20000):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown peak profile: {profile}")
+        self.profile = profile
+        self.nsigma = nsigma
+        self.min_distance = min_distance
+        self.half_window = half_window
+        self.max_peaks = max_peaks      # strongest peaks kept per spectrum, None for all
+        self.max_iter = max_iter
+        self.tol = tol
+        self.max_batch = max_batch      # peaks per fit batch, bounds the Jacobian memory
+
+    @staticmethod
+    def _as_stack(spectra):
+        return np.atleast_2d(np.asarray(spectra, dtype=np.float64))
+
+    @staticmethod
+    def _running(y, before, after, func):
+        """
+        func (np.maximum / np.minimum) over y[i - before .. i + after] for every i (truncated at the edges),
+        one pass per shift
+        """
+        n = y.shape[1]
+        out = y.copy()
+        for shift in range(1, before + 1):
+            func(out[:, shift:], y[:, :n - shift], out=out[:, shift:])
+        for shift in range(1, after + 1):
+            func(out[:, :n - shift], y[:, shift:], out=out[:, :n - shift])
+        return out
+
+    @staticmethod
+    def noise(y):
+        """
+        Per spectrum noise sigma from the median absolute first difference (insensitive to peaks and slow background)
+        """
+        diff = np.abs(np.diff(y, axis=1))
+        return np.median(diff, axis=1) / (0.6745 * np.sqrt(2))
+
+    # ===== DETECTION =====
+
+    def find(self, spectra):
+        """
+        (spectrum index, column) of all detected peaks, sorted by spectrum then column
+        """
+        y = self._as_stack(spectra)
+        d, hw = self.min_distance, self.half_window
+
+        # highest point within +-min_distance, first pixel of a flat top only
+        is_max = y == self._running(y, d, d, np.maximum)
+        is_max[:, 1:] &= y[:, 1:] > y[:, :-1]
+        is_max[:, [0, -1]] = False
+
+        # prominence against the lower flank minimum within half_window on both sides 
+        left = self._running(y, hw, 0, np.minimum)
+        right = self._running(y, 0, hw, np.minimum)
+        prominence = y - np.maximum(left, right)
+        is_peak = is_max & (prominence > self.nsigma * self.noise(y)[:, None])
+
+        spectrum, column = np.nonzero(is_peak)
+        if self.max_peaks is not None and len(spectrum):
+            order = np.lexsort((-prominence[spectrum, column], spectrum))
+            spectrum, column = spectrum[order], column[order]
+            first = np.searchsorted(spectrum, spectrum)     # start of every spectrum's group
+            keep = np.arange(len(spectrum)) - first < self.max_peaks
+            order = np.lexsort((column[keep], spectrum[keep]))
+            spectrum, column = spectrum[keep][order], column[keep][order]
+        return spectrum, column
+
+    # ===== FITTING =====
+
+    def _model(self, x, p):
+        """
+        Model and Jacobian (M, w, k) of all windows, p = (height, centre, hwhm, offset[, eta]) per peak
+        """
+        height, centre, hwhm, offset = p[:, 0:1], p[:, 1:2], p[:, 2:3], p[:, 3:4]
+        u = (x - centre) / hwhm
+        lorentz = 1 / (1 + u * u)
+        d_centre = 2 * u * lorentz * lorentz / hwhm     # d/dcentre, d/dhwhm is d_centre * u
+        if self.profile == "lorentzian":
+            shape = lorentz
+            columns = [shape, height * d_centre, height * d_centre * u, np.ones_like(u)]
+        else:
+            eta = p[:, 4:5]
+            gauss = np.exp(-LN2 * u * u)
+            shape = eta * lorentz + (1 - eta) * gauss
+            d_centre = eta * d_centre + (1 - eta) * 2 * LN2 * u * gauss / hwhm
+            columns = [shape, height * d_centre, height * d_centre * u, np.ones_like(u), height * (lorentz - gauss)]
+        return height * shape + offset, np.stack(columns, axis=2)
+
+    def _bounds(self, column, k):
+        """
+        (lower, upper) limits of every parameter: centre within the window, sensible width, 0 <= eta <= 1
+        """
+        hw = self.half_window
+        lower = np.full((len(column), k), -np.inf)
+        upper = np.full((len(column), k), np.inf)
+        lower[:, 1], upper[:, 1] = column - hw, column + hw
+        lower[:, 2], upper[:, 2] = 0.3, 4 * hw
+        if k > 4:
+            lower[:, 4], upper[:, 4] = 0, 1
+        return lower, upper
+
+    def _fit_batch(self, x, y, mask, column):
+        # starting values: window minimum as offset, half maximum width
+        offset = np.where(mask, y, np.inf).min(axis=1)
+        height = y[:, self.half_window] - offset
+        hwhm = np.maximum((mask & (y - offset[:, None] > height[:, None] / 2)).sum(axis=1) / 2, 0.5)
+        weight = mask.astype(np.float64)
+        p = [height, column.astype(np.float64), hwhm, offset]
+        if self.profile == "pseudo_voigt":
+            p.append(np.full_like(offset, 0.5))
+        p = np.stack(p, axis=1)
+
+        model, jac = self._model(x, p)
+        r = (y - model) * weight
+        jac *= weight[:, :, None]
+        cost = (r * r).sum(axis=1)
+        damping = np.full(len(p), 1e-3)
+        converged = np.zeros(len(p), dtype=bool)
+        eye = np.eye(p.shape[1])
+        lower, upper = self._bounds(column, p.shape[1])
+
+        for _ in range(self.max_iter):
+            jac_t = jac.transpose(0, 2, 1)
+            jtj = jac_t @ jac
+            grad = (jac_t @ r[:, :, None])[:, :, 0]
+            # parameters at a limit that the gradient pushes outwards are held for this step
+            held = ((p <= lower) & (grad < 0)) | ((p >= upper) & (grad > 0))
+            free = ~held
+            jtj *= free[:, :, None] & free[:, None, :]
+            grad[held] = 0
+            diag = np.einsum("mkk->mk", jtj) + held
+            lhs = jtj + (damping[:, None] * diag + 1e-12)[:, :, None] * eye
+            step = np.linalg.solve(lhs, grad[:, :, None])[:, :, 0]
+
+            trial = np.clip(p + step, lower, upper)
+            trial_model, trial_jac = self._model(x, trial)
+            trial_r = (y - trial_model) * weight
+            trial_jac *= weight[:, :, None]
+            trial_cost = (trial_r * trial_r).sum(axis=1)
+
+            better = (trial_cost < cost) & ~converged
+            converged |= better & (cost - trial_cost <= self.tol * cost)
+            p[better], jac[better], r[better], cost[better] = trial[better], trial_jac[better], trial_r[better], trial_cost[better]
+            damping = np.where(better, damping * 0.1, damping * 10)
+            converged |= damping > 1e10     # no step reduces the cost any more: at the minimum
+            if converged.all():
+                break
+        return p, np.sqrt(cost / mask.sum(axis=1)), converged
+
+    def fit(self, spectra, spectrum, column, axis=None):
+        """
+        Fit the given peaks (from find), returns a PEAK_DTYPE array
+        axis: (n,) calibration of the columns (wavelength / Raman shift), None for pixels
+        """
+        y = self._as_stack(spectra)
+        n = y.shape[1]
+        result = np.zeros(len(spectrum), dtype=PEAK_DTYPE)
+        if not len(spectrum):
+            return result
+
+        # each window ends half way to the neighbouring peaks, so close peaks do not pull each other
+        same = spectrum[1:] == spectrum[:-1]
+        left = np.concatenate([[-np.inf], np.where(same, (column[1:] + column[:-1]) / 2, -np.inf)])
+        right = np.concatenate([np.where(same, (column[1:] + column[:-1]) / 2, np.inf), [np.inf]])
+
+        window = np.arange(-self.half_window, self.half_window + 1)
+        for start in range(0, len(spectrum), self.max_batch):
+            part = slice(start, start + self.max_batch)
+            cols = column[part, None] + window
+            mask = (cols >= 0) & (cols < n) & (cols > left[part, None]) & (cols < right[part, None])
+            cols = np.clip(cols, 0, n - 1)
+            p, rms, converged = self._fit_batch(cols.astype(np.float64), y[spectrum[part, None], cols], mask, column[part])
+
+            height, centre, hwhm = p[:, 0], p[:, 1], p[:, 2]
+            eta = p[:, 4] if p.shape[1] > 4 else np.ones_like(height)
+            area = height * hwhm * (eta * np.pi + (1 - eta) * np.sqrt(np.pi / LN2))
+            out = result[part]
+            out["spectrum"] = spectrum[part]
+            out["column"] = centre
+            out["height"] = height
+            out["fwhm"] = 2 * hwhm
+            out["area"] = area
+            out["offset"] = p[:, 3]
+            out["eta"] = eta
+            out["rms"] = rms
+            out["converged"] = converged
+
+        if axis is None:
+            result["position"] = result["column"]
+        else:
+            axis = np.asarray(axis, dtype=np.float64)
+            pixels = np.arange(n)
+            dispersion = np.abs(np.interp(result["column"], pixels, np.gradient(axis)))     # axis units per pixel
+            result["position"] = np.interp(result["column"], pixels, axis)
+            result["fwhm"] *= dispersion
+            result["area"] *= dispersion
+        return result
+
+    def analyze(self, spectra, axis=None):
+        """
+        find + fit, PEAK_DTYPE array of all peaks of all spectra
+        """
+        y = self._as_stack(spectra)
+        spectrum, column = self.find(y)
+        return self.fit(y, spectrum, column, axis)
@@ -0,0 +1,155 @@
+import time
+import numpy as np
+from collections import deque
+
+
+# pushed in this order: shutter and amplifier first, then the readout geometry the SDK computes
+# its timings from, exposure last (the camera rounds it to what the final readout allows)
+ORDER = ["shutter", "amp_mode", "vsspeed", "readout", "acq_mode", "exposure"]
+SHUTTER_MODES = ["auto", "open", "closed"]
+ACQ_MODES = ["single", "accum", "kinetic", "cont"]
+ACQ_MODE_ALIASES = {"accumulate": "accum", "run_till_abort": "cont"}     # names used by the controller / GUI
+
+
+def _same(a, b):
+    if isinstance(a, float) or isinstance(b, float):
+        return a is not None and b is not None and bool(np.isclose(a, b, rtol=1e-6, atol=1e-9))
+    return a == b
+
+
+class CameraSettings:
+    """
+    Desired and applied state of the camera settings in ORDER, apply() pushes only the parameters that differ.
+
+    Values: shutter "auto" | "open" | "closed", amp_mode (hsspeed, preamp), vsspeed index,
+    readout ("image", (hstart, hend, vstart, vend, hbin, vbin)) | ("single_track", (center, width)) | ("fvb", ()),
+    acq_mode "single" | "accum" | "kinetic" | "cont" (controller names "accumulate" / "run_till_abort" are mapped), exposure s.
+    Code that changes a setting on the camera directly reports it with mark() (or invalidate() if the value is unknown),
+    otherwise the applied state would be stale and the next apply() could skip a needed push.
+    """
+
+    def __init__(self, history=100):
+        self.cam = None
+        self.desired = {}
+        self.applied = {}       # name missing = unknown, pushed on the next apply
+        self.timings = {name: deque(maxlen=history) for name in ORDER}     # s per push
+        self.pushed = 0
+        self.skipped = 0
+
+    def bind(self, cam):
+        """
+        Start from what the camera has set now (one getter per parameter, once per connection)
+        """
+        self.cam = cam
+        self.desired = {}
+        self.applied = self.read() if cam is not None else {}
+
+    def read(self):
+        amp = self.cam.get_amp_mode()
+        read_mode = self.cam.get_read_mode()
+        if read_mode == "image":
+            window = tuple(self.cam.get_roi())
+        elif read_mode == "single_track":
+            window = tuple(self.cam.get_single_track_mode_parameters())
+        else:
+            window = ()
+        return {"shutter": self.cam.get_shutter(),
+                "amp_mode": (amp.hsspeed, amp.preamp),
+                "vsspeed": self.cam.get_vsspeed(),
+                "readout": (read_mode, window),
+                "acq_mode": self.cam.get_acquisition_mode(),
+                "exposure": self.cam.get_exposure()}
+
+    # ===== STATE =====
+
+    def _check(self, params):
+        """
+        Validated copy of params (acq_mode aliases mapped to the SDK names), raises before anything is pushed
+        """
+        unknown = set(params) - set(ORDER)
+        if unknown:
+            raise ValueError(f"Unknown camera settings: {sorted(unknown)}")
+        params = dict(params)
+        if "acq_mode" in params:
+            params["acq_mode"] = ACQ_MODE_ALIASES.get(params["acq_mode"], params["acq_mode"])
+            if params["acq_mode"] not in ACQ_MODES:
+                raise ValueError(f"Unknown acquisition mode: {params['acq_mode']}")
+        if "shutter" in params and params["shutter"] not in SHUTTER_MODES:
+            raise ValueError(f"Unknown shutter mode: {params['shutter']}")
+        return params
+
+    def set(self, **params):
+        self.desired.update(self._check(params))
+
+    def mark(self, **params):
+        """
+        Record settings already changed on the camera by other calls (e.g. setup_kinetic_mode sets acq_mode)
+        """
+        self.applied.update(self._check(params))
+
+    def invalidate(self, *names):
+        """
+        Forget the applied value of names (all if none given), they are pushed again on the next apply
+        """
+        for name in names or ORDER:
+            self.applied.pop(name, None)
+
+    def diff(self):
+        return {name: self.desired[name] for name in ORDER
+                if name in self.desired and not (name in self.applied and _same(self.desired[name], self.applied[name]))}
+
+    # ===== APPLY =====
+
+    def apply(self, **params):
+        """
+        Update the desired settings with params and push what differs from the applied state, in ORDER
+        (desired settings that were changed by other calls in between are restored too).
+        Returns the names of the pushed parameters.
+        """
+        self.set(**params)
+        changes = self.diff()
+        self.skipped += len(self.desired) - len(changes)
+        for name, value in changes.items():
+            t0 = time.perf_counter()
+            getattr(self, "_push_" + name)(value)
+            self.timings[name].append(time.perf_counter() - t0)
+            self.applied[name] = value
+            self.pushed += 1
+        return list(changes)
+
+    def _push_shutter(self, mode):
+        self.cam.setup_shutter(mode)
+
+    def _push_amp_mode(self, value):
+        hsspeed, preamp = value
+        self.cam.set_amp_mode(hsspeed=hsspeed, preamp=preamp)
+
+    def _push_vsspeed(self, index):
+        self.cam.set_vsspeed(index)
+
+    def _push_readout(self, value):
+        read_mode, window = value
+        if read_mode == "image":
+            hstart, hend, vstart, vend, hbin, vbin = window
+            self.cam.setup_image_mode(hstart=hstart, hend=hend, vstart=vstart, vend=vend, hbin=hbin, vbin=vbin)
+        elif read_mode == "single_track":
+            center, width = window
+            self.cam.setup_single_track_mode(center=center, width=width)
+        else:
+            self.cam.set_read_mode(read_mode)
+
+    def _push_acq_mode(self, mode):
+        self.cam.set_acquisition_mode(mode)
+
+    def _push_exposure(self, exposure):
+        self.cam.set_exposure(exposure)
+
+    def stats(self):
+        """
+        Pushed / skipped parameter counts and per-parameter push times (ms)
+        """
+        params = {}
+        for name, times in self.timings.items():
+            if times:
+                params[name] = {"count": len(times), "mean_ms": 1e3 * float(np.mean(times)), "last_ms": 1e3 * times[-1]}
+        return {"pushed": self.pushed, "skipped": self.skipped, "params": params}
@@ -0,0 +1,631 @@
+import time
+import collections
+import numpy as np
+from lazy import LazyModule
+
+Andor = LazyModule("pylablib.devices.Andor")     # only its error classes are used
+
+
+TDeviceInfo = collections.namedtuple("TDeviceInfo", ["controller_model", "head_model", "serial_number"])
+TAmpModeFull = collections.namedtuple("TAmpModeFull", ["channel", "channel_bitdepth", "oamp", "oamp_kind", "hsspeed", "hsspeed_MHz", "preamp", "preamp_gain"])
+TCycleTimings = collections.namedtuple("TCycleTimings", ["exposure", "accum_cycle_time", "kinetic_cycle_time"])
+TAcqTimings = collections.namedtuple("TAcqTimings", ["exposure", "frame_period"])
+TAxisROILimit = collections.namedtuple("TAxisROILimit", ["min", "max", "pstep", "sstep", "maxbin"])
+
+
+class SimulatedNewton:
+    """
+    Stand-in for pylablib's AndorSDK2Camera with the geometry of our Newton (DU920P, 1024x256, 16 bit).
+
+    Exposure, ROI, binning, read mode (image / fvb / single_track) and acquisition mode are honoured.
+    Frames contain a slit image with Raman peaks on a fluorescence background, temperature dependent
+    dark current, shot and read noise and cosmic rays. Frame timing follows exposure + readout time,
+    where readout is modelled from the horizontal / vertical shift speeds.
+
+    The noiseless frame is cached per configuration and noise is taken from a pregenerated bank,
+    so a frame costs a couple of vectorized passes. realtime=False makes every frame available
+    as soon as it is waited for (throughput tests without waiting for exposures).
+    """
+
+    width, height = 1024, 256
+    hsspeeds_MHz = [3.0, 1.0, 0.05]
+    vsspeeds_us = [1.7, 3.3, 6.5, 12.9, 25.7, 51.3, 76.9, 102.5, 128.1, 153.7, 179.3]
+    preamp_gains = [1.0, 2.0, 4.0]
+    # like pylablib: frames are read with GetImages16 (clipped to 16 bit) unless this is set wider ("<u4": GetImages)
+    _default_image_dtype = "<u2"
+
+    def __init__(self, realtime=True, seed=None, cosmic_rate=2.0):
+        self.realtime = realtime
+        self.rng = np.random.default_rng(seed)
+
+        # detector model
+        self.bias = 500.0           # counts
+        self.read_noise_e = 6.0
+        self.e_per_count = 4.0      # at preamp gain 1x
+        self.dark_e_20C = 500.0     # e/pixel/s at 20 C, halves every 6.3 C
+        self.cosmic_rate = cosmic_rate  # hits per second on the whole chip
+        self.signal = self._make_scene()    # e/pixel/s, (height, width)
+
+        # camera state (defaults as after connecting, see cam_params.txt)
+        self.exposure = 1e-5
+        self.read_mode = "image"
+        self.image_params = (0, self.width, 0, self.height, 1, 1)
+        self.single_track_params = (self.height // 2, 1)
+        self.acq_mode = "cont"
+        self.accum_params = (1, 0)
+        self.kinetic_params = (1, 0.0, 1, 0, 0)
+        self.cont_params = 0
+        self.hsspeed = 0
+        self.vsspeed = 3
+        self.preamp = 0
+        self.shutter = "auto"      # light reaches the chip unless set to "closed" (darks)
+        self.trigger_mode = "int"
+        self.frame_format = "list"
+        self.fan_mode = "off"
+        self.buffer_size = 100
+
+        # cooling model
+        self.temperature = 20.0
+        self.setpoint = -98
+        self.cooler = False
+        self.cool_rate = 20.0       # C/s (fast forwarded)
+        self.warm_rate = 20.0
+        self._temp_time = time.time()
+        self._at_setpoint_since = None
+
+        # acquisition
+        self._running = False
+        self._t_start = 0.0
+        self._vtime = 0.0
+        self._total = None      # frames in this acquisition, None for continuous
+        self._read = 0          # frames marked as read
+        self._templates = {}
+        self._noise = self.rng.standard_normal(1 << 21).astype(np.float32)
+
+    # ===== SCENE =====
+
+    def _make_scene(self):
+        x = np.arange(self.width, dtype=np.float32)
+        y = np.arange(self.height, dtype=np.float32)
+
+        spectrum = 800 * np.exp(-((x - 600) / 450) ** 2)    # fluorescence background
+        for pos, fwhm, amp in [(180, 6, 3000), (312, 4, 9000), (515, 5, 5000), (640, 8, 2500), (805, 3, 12000)]:
+            spectrum += amp / (1 + ((x - pos) / (fwhm / 2)) ** 2)   # Raman lines
+        slit = np.exp(-0.5 * ((y - self.height / 2) / 25) ** 2)  # slit image across the rows
+        return np.outer(slit, spectrum).astype(np.float32)
+
+    # ===== INFO =====
+
+    def get_device_info(self):
+        return TDeviceInfo("USB", "DU920P_BX2DD (simulated)", 0)
+
+    def get_status(self):
+        return "acquiring" if self.acquisition_in_progress() else "idle"
+
+    def get_capabilities(self):
+        return {"cam_type": "AC_CAMERATYPE_NEWTON", "simulated": True,
+                "read_mode": ["AC_READMODE_FULLIMAGE", "AC_READMODE_SUBIMAGE", "AC_READMODE_SINGLETRACK", "AC_READMODE_FVB"],
+                "acq_mode": ["AC_ACQMODE_SINGLE", "AC_ACQMODE_VIDEO", "AC_ACQMODE_ACCUMULATE", "AC_ACQMODE_KINETIC"]}
+
+    def get_pixel_size(self):
+        return (2.6e-05, 2.6e-05)
+
+    def get_detector_size(self):
+        return (self.width, self.height)
+
+    def get_all_amp_modes(self):
+        return [TAmpModeFull(0, 16, 0, "Conventional", hs, mhz, pa, gain)
+                for hs, mhz in enumerate(self.hsspeeds_MHz) for pa, gain in enumerate(self.preamp_gains)]
+
+    def get_amp_mode(self, full=True):
+        return TAmpModeFull(0, 16, 0, "Conventional", self.hsspeed, self.hsspeeds_MHz[self.hsspeed], self.preamp, self.preamp_gains[self.preamp])
+
+    def init_amp_mode(self, mode=None):
+        self.hsspeed, self.preamp, self.vsspeed = 0, 0, self.get_max_vsspeed()
+
+    def set_amp_mode(self, channel=None, oamp=None, hsspeed=None, preamp=None):
+        if hsspeed is not None:
+            self.hsspeed = hsspeed
+        if preamp is not None:
+            self.preamp = preamp
+
+    def get_max_vsspeed(self):
+        return 3
+
+    def get_all_vsspeeds(self):
+        return list(self.vsspeeds_us)
+
+    def set_vsspeed(self, vsspeed):
+        self.vsspeed = vsspeed
+
+    def get_vsspeed(self):
+        return self.vsspeed
+
+    def get_vsspeed_period(self, vsspeed=None):
+        return self.vsspeeds_us[self.vsspeed if vsspeed is None else vsspeed] * 1e-6
+
+    def get_hsspeed(self):
+        return self.hsspeed
+
+    def get_hsspeed_frequency(self, hsspeed=None):
+        return self.hsspeeds_MHz[self.hsspeed if hsspeed is None else hsspeed] * 1e6
+
+    def get_preamp(self):
+        return self.preamp
+
+    def get_preamp_gain(self, preamp=None):
+        return self.preamp_gains[self.preamp if preamp is None else preamp]
+
+    def get_oamp(self):
+        return 0
+
+    def get_oamp_desc(self, oamp=None):
+        return "Conventional"
+
+    def get_channel(self):
+        return 0
+
+    def get_channel_bitdepth(self, channel=None):
+        return 16
+
+    def setup_shutter(self, mode, ttl_mode=0, open_time=None, close_time=None):
+        self.shutter = mode
+
+    def get_shutter(self):
+        return self.shutter
+
+    def set_trigger_mode(self, mode):
+        self.trigger_mode = mode
+
+    def get_trigger_mode(self):
+        return self.trigger_mode
+
+    def set_fan_mode(self, mode):
+        self.fan_mode = mode
+
+    def get_fan_mode(self):
+        return self.fan_mode
+
+    def set_frame_format(self, fmt):
+        self.frame_format = fmt
+
+    def get_frame_format(self):
+        return self.frame_format
+
+    def set_image_indexing(self, indexing):
+        pass    # frames are always (row, column)
+
+    def get_buffer_size(self):
+        return self.buffer_size
+
+    def get_full_info(self, include=0):
+        return {
+            "cls": type(self).__name__,
+            "device_info": self.get_device_info(),
+            "acq_mode": self.acq_mode,
+            "read_mode": self.read_mode,
+            "read_parameters/image": self.image_params,
+            "read_parameters/single_track": self.single_track_params,
+            "exposure": self.exposure,
+            "readout_time": self.get_readout_time(),
+            "amp_mode": self.get_amp_mode(),
+            "vsspeed": self.vsspeed,
+            "temperature": self.get_temperature(),
+            "temperature_status": self.get_temperature_status(),
+        }
+
+    def close(self):
+        self.stop_acquisition()
+
+    # ===== TEMPERATURE =====
+
+    def _update_temperature(self):
+        now = time.time()
+        dt, self._temp_time = now - self._temp_time, now
+        target, rate = (self.setpoint, self.cool_rate) if self.cooler else (20.0, self.warm_rate)
+        step = min(abs(target - self.temperature), rate * dt)
+        self.temperature += step if target > self.temperature else -step
+        if self.cooler and abs(self.temperature - self.setpoint) < 0.5:
+            self._at_setpoint_since = self._at_setpoint_since or now
+        else:
+            self._at_setpoint_since = None
+
+    def get_temperature(self):
+        self._update_temperature()
+        return self.temperature
+
+    def get_temperature_status(self):
+        self._update_temperature()
+        if not self.cooler:
+            return "off"
+        if self._at_setpoint_since is None:
+            return "not_reached"
+        if time.time() - self._at_setpoint_since < 2.0:
+            return "not_stabilized"
+        return "stabilized"
+
+    def set_temperature(self, temperature, enable_cooler=True):
+        self._update_temperature()
+        self.setpoint = int(min(max(temperature, -120), -10))
+        if enable_cooler:
+            self.cooler = True
+        return self.setpoint
+
+    def get_temperature_setpoint(self):
+        return self.setpoint
+
+    def get_temperature_range(self):
+        return (-120, -10)
+
+    def set_cooler(self, on=True):
+        self._update_temperature()
+        self.cooler = on
+
+    def is_cooler_on(self):
+        return self.cooler
+
+    # ===== READOUT =====
+
+    def set_exposure(self, exposure):
+        self.exposure = float(exposure)
+        return self.exposure
+
+    def get_exposure(self):
+        return self.exposure
+
+    def set_read_mode(self, mode):
+        if mode not in ("image", "fvb", "single_track"):
+            raise Andor.AndorNotSupportedError(f"read mode {mode} is not simulated")
+        self.read_mode = mode
+        return mode
+
+    def get_read_mode(self):
+        return self.read_mode
+
+    def setup_image_mode(self, hstart=0, hend=None, vstart=0, vend=None, hbin=1, vbin=1):
+        hend = self.width if hend is None else min(hend, self.width)
+        vend = self.height if vend is None else min(vend, self.height)
+        hbin, vbin = max(1, min(hbin, 32)), max(1, min(vbin, 32))
+        hend -= (hend - hstart) % hbin     # whole superpixels only
+        vend -= (vend - vstart) % vbin
+        self.read_mode = "image"
+        self.image_params = (hstart, hend, vstart, vend, hbin, vbin)
+        return self.image_params
+
+    def get_image_mode_parameters(self):
+        return self.image_params
+
+    def get_roi(self):
+        return self.image_params
+
+    def set_roi(self, hstart=0, hend=None, vstart=0, vend=None, hbin=1, vbin=1):
+        return self.setup_image_mode(hstart, hend, vstart, vend, hbin, vbin)
+
+    def get_roi_limits(self, hbin=1, vbin=1):
+        return (TAxisROILimit(2 * hbin, self.width, 1, hbin, 32), TAxisROILimit(2 * vbin, self.height, 1, vbin, 32))
+
+    def setup_single_track_mode(self, center=0, width=1):
+        self.read_mode = "single_track"
+        self.single_track_params = (center, width)
+        return self.single_track_params
+
+    def get_single_track_mode_parameters(self):
+        return self.single_track_params
+
+    def get_data_dimensions(self):
+        if self.read_mode in ("fvb", "single_track"):
+            return (1, self.width)
+        hstart, hend, vstart, vend, hbin, vbin = self.image_params
+        return ((vend - vstart) // vbin, (hend - hstart) // hbin)
+
+    def get_readout_time(self):
+        """
+        Every row is shifted into the register (vsspeed), every read superpixel is digitized (hsspeed)
+        """
+        rows, cols = self.get_data_dimensions()
+        return 1e-3 + self.height * self.get_vsspeed_period() + rows * cols / self.get_hsspeed_frequency()
+
+    # ===== ACQUISITION MODES =====
+
+    def set_acquisition_mode(self, mode, setup_params=True):
+        self.acq_mode = mode
+        return mode
+
+    def get_acquisition_mode(self):
+        return self.acq_mode
+
+    def setup_accum_mode(self, num_acc, cycle_time_acc=0):
+        self.acq_mode = "accum"
+        self.accum_params = (num_acc, cycle_time_acc)
+        return self.accum_params
+
+    def get_accum_mode_parameters(self):
+        return self.accum_params
+
+    def setup_kinetic_mode(self, num_cycle, cycle_time=0., num_acc=1, cycle_time_acc=0, num_prescan=0):
+        self.acq_mode = "kinetic"
+        self.kinetic_params = (num_cycle, cycle_time, num_acc, cycle_time_acc, num_prescan)
+        return self.kinetic_params
+
+    def get_kinetic_mode_parameters(self):
+        return self.kinetic_params
+
+    def setup_cont_mode(self, cycle_time=0):
+        self.acq_mode = "cont"
+        self.cont_params = cycle_time
+        return cycle_time
+
+    def _accumulations(self):
+        if self.acq_mode == "accum":
+            return self.accum_params[0]
+        if self.acq_mode == "kinetic":
+            return self.kinetic_params[2]
+        return 1
+
+    def get_cycle_timings(self):
+        sub = self.exposure + self.get_readout_time()
+        return TCycleTimings(self.exposure, sub, sub * self._accumulations())
+
+    def get_frame_timings(self):
+        period = self.get_cycle_timings().kinetic_cycle_time
+        if self.acq_mode == "kinetic":
+            period = max(period, self.kinetic_params[1])
+        elif self.acq_mode == "cont":
+            period = max(period, self.cont_params)
+        return TAcqTimings(self.exposure, period)
+
+    # ===== ACQUISITION =====
+
+    def start_acquisition(self, mode=None, nframes=None):
+        mode = {"snap": "kinetic", "sequence": "cont"}.get(mode, mode)
+        if mode == "kinetic" and nframes is not None:
+            self.setup_kinetic_mode(nframes, *self.kinetic_params[1:])
+        elif mode is not None:
+            self.acq_mode = mode
+        self._total = {"single": 1, "accum": 1, "kinetic": self.kinetic_params[0]}.get(self.acq_mode)
+        self._period = self.get_frame_timings().frame_period
+        self._t_start = time.perf_counter()
+        self._vtime = 0.0
+        self._read = 0
+        self._running = True
+
+    def stop_acquisition(self):
+        self._running = False
+
+    def _now(self):
+        return time.perf_counter() - self._t_start if self.realtime else self._vtime
+
+    def _acquired(self):
+        if not self._running:
+            return self._read
+        n = int(self._now() / self._period + 1e-9)
+        return n if self._total is None else min(n, self._total)
+
+    def acquisition_in_progress(self):
+        return self._running and (self._total is None or self._acquired() < self._total)
+
+    def wait_for_frame(self, since="lastread", nframes=1, timeout=20., error_on_stopped=False):
+        if not self._running:
+            return
+        target = self._read + nframes if since == "lastread" else self._acquired() + nframes
+        if self._total is not None and target > self._total:
+            raise Andor.AndorTimeoutError("no more frames in this acquisition")
+        t_needed = target * self._period
+        if not self.realtime:
+            self._vtime = max(self._vtime, t_needed)
+            return
+        wait = t_needed - self._now()
+        if wait > timeout:
+            time.sleep(timeout)
+            raise Andor.AndorTimeoutError("timeout while waiting for a new frame")
+        if wait > 0:
+            time.sleep(wait)
+
+    def _pack(self, frames):
+        return np.stack(frames) if self.frame_format == "array" else frames
+
+    def read_multiple_images(self, rng=None, peek=False, missing_frame="skip", return_info=False, return_rng=False):
+        if not self._running:
+            return None
+        acquired = self._acquired()
+        first = max(self._read, acquired - self.buffer_size)    # older frames are overwritten in the ring buffer
+        if rng is not None:
+            first, acquired = max(first, rng[0]), min(acquired, rng[1])
+        frames = [self.render_frame() for _ in range(first, acquired)]
+        if not peek:
+            self._read = max(self._read, acquired)
+        if not frames:
+            return [] if self.frame_format != "array" else np.zeros((0,) + self.get_data_dimensions(), dtype=self._default_image_dtype)
+        return self._pack(frames)
+
+    def read_oldest_image(self, peek=False, return_info=False):
+        acquired = self._acquired()
+        if acquired <= self._read:
+            return None
+        frames = self.read_multiple_images(rng=(self._read, self._read + 1), peek=peek)
+        return frames[0]
+
+    def read_newest_image(self, peek=False, return_info=False):
+        acquired = self._acquired()
+        if acquired <= self._read:
+            return None
+        frames = self.read_multiple_images(rng=(acquired - 1, acquired), peek=peek)
+        return frames[0]
+
+    def _get_grab_acquisition_parameters(self, nframes, buff_size):
+        return {"mode": "cont"}     # as pylablib's SDK2 camera: grab runs till abort and stops after nframes
+
+    def grab(self, nframes=1, frame_timeout=5., missing_frame="skip", return_info=False, buff_size=None):
+        self.start_acquisition(**self._get_grab_acquisition_parameters(nframes, buff_size))
+        frames = []
+        try:
+            while len(frames) < nframes:
+                self.wait_for_frame(timeout=frame_timeout)
+                frames.extend(self.read_multiple_images())
+        finally:
+            self.stop_acquisition()
+        return self._pack(frames[:nframes])
+
+    def snap(self, timeout=5., return_info=False):
+        return self.grab(1, frame_timeout=timeout)[0]
+
+    # ===== FRAME SYNTHESIS =====
+
+    def _template(self):
+        """
+        Mean frame (counts) and per-pixel noise sigma for the current configuration, cached
+        """
+        n_acc = self._accumulations()
+        key = (self.read_mode, self.image_params, self.single_track_params, self.exposure, self.preamp, n_acc,
+               round(self.temperature / 5), self.shutter)
+        if key in self._templates:
+            return self._templates[key]
+
+        dark = self.dark_e_20C * 2 ** ((self.temperature - 20) / 6.3)
+        electrons = (self.signal + dark) * self.exposure
+        if self.shutter == "closed":
+            electrons = np.full_like(self.signal, dark * self.exposure)
+
+        if self.read_mode == "fvb":
+            electrons = electrons.sum(axis=0, keepdims=True)
+        elif self.read_mode == "single_track":
+            center, width = self.single_track_params
+            start = max(0, center - width // 2)
+            electrons = electrons[start:start + width].sum(axis=0, keepdims=True)
+        else:
+            hstart, hend, vstart, vend, hbin, vbin = self.image_params
+            roi = electrons[vstart:vend, hstart:hend]
+            rows, cols = (vend - vstart) // vbin, (hend - hstart) // hbin
+            electrons = roi.reshape(rows, vbin, cols, hbin).sum(axis=(1, 3))   # on-chip binning
+
+        e_per_count = self.e_per_count / self.preamp_gains[self.preamp]
+        mean = (n_acc * (self.bias + electrons / e_per_count)).astype(np.float32)
+        sigma = (np.sqrt(n_acc * (electrons + self.read_noise_e ** 2)) / e_per_count).astype(np.float32)
+
+        if len(self._templates) > 16:
+            self._templates.clear()
+        self._templates[key] = (mean, sigma)
+        return mean, sigma
+
+    def _add_cosmics(self, frame, n_acc):
+        hits = self.rng.poisson(self.cosmic_rate * self.exposure * n_acc)
+        if not hits:
+            return
+        rows, cols = frame.shape
+        r = self.rng.integers(0, rows, hits)
+        c = self.rng.integers(0, cols, hits)
+        energy = self.rng.uniform(2000, 30000, hits).astype(np.float32)
+        frame[r, c] += energy
+        tail = np.minimum(c + 1, cols - 1)  # most hits also spill into a neighbour
+        frame[r, tail] += energy * 0.3
+
+    def render_frame(self):
+        """
+        New frame for the current configuration (independent of acquisition timing)
+        """
+        mean, sigma = self._template()
+        size = mean.size
+        start = self.rng.integers(0, self._noise.size - size)
+        frame = self._noise[start:start + size].reshape(mean.shape) * sigma
+        frame += mean
+        n_acc = self._accumulations()
+        self._add_cosmics(frame, n_acc)
+        dtype = np.dtype(self._default_image_dtype)     # an accumulated sum read as 16 bit saturates, as on the camera
+        return np.clip(frame, 0, np.iinfo(dtype).max).astype(dtype)
+
+
+TShamrockDeviceInfo = collections.namedtuple("TShamrockDeviceInfo", ["serial_number"])
+TGratingInfo = collections.namedtuple("TGratingInfo", ["lines", "blaze_wavelength", "home", "offset"])
+
+
+class SimulatedShamrock:
+    """
+    Stand-in for pylablib's ShamrockSpectrograph (Shamrock 193i, one turret with 3 gratings, two input slits).
+
+    Moves block for roughly as long as the real ones (grating swap ~12 s, wavelength move by distance,
+    slit ~0.3 s) when realtime=True. The calibration is a linear dispersion around the centre wavelength.
+    """
+
+    focal_length = 0.193
+    gratings = {1: (1200, 500e-9), 2: (600, 750e-9), 3: (300, 1000e-9)}     # lines/mm, blaze
+    slits = ("input_side", "input_direct")
+
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self.turret = 1
+        self.grating = 1
+        self.wavelength = 500e-9
+        self.slit_widths = {slit: 100e-6 for slit in self.slits}
+        self.n_pixels = 1024
+        self.pixel_width = 26e-6
+        self.moves = 0      # hardware moves done, to check that redundant ones are skipped
+
+    def _move(self, duration):
+        self.moves += 1
+        if self.realtime:
+            time.sleep(duration)
+
+    def get_device_info(self):
+        return TShamrockDeviceInfo("SR-193i (simulated)")
+
+    def close(self):
+        pass
+
+    def get_turret(self):
+        return self.turret
+
+    def get_gratings_number(self):
+        return len(self.gratings)
+
+    def get_grating_info(self, grating=None):
+        lines, blaze = self.gratings[grating or self.grating]
+        return TGratingInfo(lines * 1e3, blaze, 0, 0)
+
+    def get_grating(self):
+        return self.grating
+
+    def set_grating(self, grating, force=False):
+        if grating not in self.gratings:
+            raise Andor.AndorError(f"grating {grating} is not installed")
+        if grating != self.grating or force:
+            self._move(12.0)
+            self.grating = grating
+        return self.grating
+
+    def get_wavelength(self):
+        return self.wavelength
+
+    def set_wavelength(self, wavelength):
+        lo, hi = self.get_wavelength_limits()
+        if not lo <= wavelength <= hi:
+            raise Andor.AndorError(f"wavelength {wavelength} is outside of {lo}..{hi}")
+        self._move(0.5 + abs(wavelength - self.wavelength) / 100e-9)
+        self.wavelength = wavelength
+        return self.wavelength
+
+    def get_wavelength_limits(self, grating=None):
+        return (0.0, 1500e-9 * 1200 / self.gratings[grating or self.grating][0])
+
+    def is_slit_present(self, slit):
+        return slit in self.slit_widths
+
+    def get_slit_width(self, slit):
+        return self.slit_widths[slit]
+
+    def set_slit_width(self, slit, width):
+        self._move(0.3)
+        self.slit_widths[slit] = width
+        return width
+
+    def set_number_pixels(self, number):
+        self.n_pixels = number
+
+    def set_pixel_width(self, width):
+        self.pixel_width = width
+
+    def get_calibration(self):
+        """
+        Wavelength of every pixel in m
+        """
+        dispersion = 1e-3 / (self.gratings[self.grating][0] * self.focal_length)   # m of wavelength per m on the chip
+        return self.wavelength + (np.arange(self.n_pixels) - (self.n_pixels - 1) / 2) * self.pixel_width * dispersion
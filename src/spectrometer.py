@@ -1,17 +1,51 @@
-from pylablib.devices import Andor
-import pylablib as pll
 import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from pprint import pformat
+from calibration import CalibrationCache
+from lazy import LazyModule
+
+# imported on first connect, not at GUI startup
+pll = LazyModule("pylablib")
+Andor = LazyModule("pylablib.devices.Andor")
 
 class SpectrometerModel:
     def __init__(self):
         self.spec = None
-        pll.par["devices/dlls/andor_shamrock"] = r"C:/Program Files/Andor SDK/Shamrock64"
+        self.dlls_path = r"C:/Program Files/Andor SDK/Shamrock64"
+
+        # last known position, read once on connect and updated after every move
+        # so requests for the current position don't touch the hardware
+        self.turret = None
+        self.grating = None
+        self.wavelength = None
+        self.slits = {}     # slit name -> width (m)
+        self.wavelength_tol = 0.01e-9   # m
+        self.slit_tol = 1e-6            # m
+
+        # time of the last real move of each kind, used to account for the skipped ones
+        self.move_time = {"grating": 15.0, "wavelength": 2.0, "slit": 0.5}
+        self.skipped_moves = 0
+        self.saved_time = 0.0
+
+        self.calibration = CalibrationCache(laser_wavelength=785e-9)
+
+        # moves queued with the *_async methods run here one after another, in submission order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spectrometer")
+        self._pending = set()
+        # moves (and state reads) hold _move_lock for the whole SDK call, one at a time.
+        # _lock only guards the state above for short reads / updates: while a move runs it is marked in
+        # self.moves and get_axis returns None (pixels) instead of waiting, so the live view keeps running
+        self._move_lock = threading.RLock()
+        self._lock = threading.RLock()
+        self.moves = 0
 
 
     def connect(self):
 
+        pll.par["devices/dlls/andor_shamrock"] = self.dlls_path
         available = Andor.list_shamrock_spectrographs()
         if not available:
             print("No spectrometers found")
@@ -23,64 +57,210 @@ class SpectrometerModel:
             self.spec = Andor.ShamrockSpectrograph()
             device = self.spec.get_device_info()
             print(f"Spectrometer {device} is connected")
+            self.read_state()
         except Exception as e:
             print(f"Failed to connect spectrometer {e}")
-        
+
     def disconnect(self):
         if self.spec is None:
             return
+        self.wait_idle()    # don't close the device in the middle of a move
         try:
-            self.spec.close()
-            print("Spectrometer disconnected")
-            self.spec = None
+            with self._move_lock, self._lock:
+                self.spec.close()
+                print("Spectrometer disconnected")
+                self.spec = None
         except Exception:
             print("Failed to disconnect spectrometer")
 
+    def read_state(self):
+        """
+        Read turret, grating, wavelength and slit widths from the device
+        """
+        with self._move_lock, self._moving():
+            turret = self.spec.get_turret()
+            grating = self.spec.get_grating()
+            wavelength = self.spec.get_wavelength()
+            slits = {}
+            for slit in ("input_side", "input_direct", "output_side", "output_direct"):
+                if self.spec.is_slit_present(slit):
+                    slits[slit] = self.spec.get_slit_width(slit)
+            with self._lock:
+                self.turret, self.grating, self.wavelength, self.slits = turret, grating, wavelength, slits
+            print(f"Spectrometer state: turret {self.turret}, grating {self.grating}, wavelength {self.wavelength} m, slits {self.slits}")
+
+    def get_state(self):
+        with self._lock:
+            return {"turret": self.turret, "grating": self.grating, "wavelength": self.wavelength, "slits": dict(self.slits)}
+
+    def _skip(self,kind):
+        self.skipped_moves += 1
+        self.saved_time += self.move_time[kind]
+        print(f"{kind} already set, move skipped (saved ~{self.move_time[kind]:.1f} s, {self.saved_time:.1f} s in total)")
+
+    @contextmanager
+    def _moving(self):
+        """
+        Marks a move in progress (get_axis gives None) until the new state is stored, the cached axes are dropped after it
+        """
+        with self._lock:
+            self.moves += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.moves -= 1
+                self.calibration.invalidate()
+
+    def _timed_move(self,kind,func,*args):
+        t0 = time.perf_counter()
+        func(*args)
+        self.move_time[kind] = time.perf_counter() - t0
+
     def set_wavelength(self,wavelength):
         """
         Set the wavelength in meters
+        Returns False if it was already set (no move)
         """
-        if not self.spec:
-            return
-        
-        self.spec.set_wavelength(wavelength)
-        return
-    
+        with self._move_lock:
+            if not self.spec:
+                return
+
+            if self.wavelength is not None and abs(wavelength - self.wavelength) <= self.wavelength_tol:
+                self._skip("wavelength")
+                return False
+            with self._moving():
+                self._timed_move("wavelength", self.spec.set_wavelength, wavelength)
+                wavelength = self.spec.get_wavelength()
+                with self._lock:
+                    self.wavelength = wavelength
+            return True
+
     def set_grating(self,grating,force=False):
         """
         Set grating (counting from 1)
-        Call blocks until the grating is exchanged (up to 10-20 sec)
+        Call blocks until the grating is exchanged (up to 10-20 sec), unless it is already in place
         force=True forces to set the grating if it is the same as the current one
         """
-        if not self.spec:
-            return
-        
-        self.spec.set_grating(grating,force)
-        return
-    
+        with self._move_lock:
+            if not self.spec:
+                return
+
+            if grating == self.grating and not force:
+                self._skip("grating")
+                return False
+            with self._moving():
+                self._timed_move("grating", self.spec.set_grating, grating, force)
+                wavelength = self.spec.get_wavelength()    # can change with the grating
+                with self._lock:
+                    self.grating, self.wavelength = grating, wavelength
+            return True
+
     def set_slit_width(self,slit,width):
         """
         Set slit width in m
         slit can be either be index (starting from 1)
         OR "input_side", "input_direct", "output_side", "output_direct"
         """
+        with self._move_lock:
+            if not self.spec:
+                return
+
+            current = self.slits.get(slit)
+            if current is not None and abs(width - current) <= self.slit_tol:
+                self._skip("slit")
+                return False
+            with self._moving():    # also marked: get_axis makes SDK calls and must not run during one
+                self._timed_move("slit", self.spec.set_slit_width, slit, width)
+                width = self.spec.get_slit_width(slit)
+                with self._lock:
+                    self.slits[slit] = width
+            return True
+
+    def apply(self,wavelength=None,grating=None,slits=None):
+        """
+        Move only what differs from the current state: grating first (a swap can move the wavelength), then wavelength, then slits
+        None leaves a setting as it is, slits is {slit: width}
+        Returns the list of settings that were actually moved
+        """
         if not self.spec:
-            return
-        
-        self.spec.set_slit_width(slit,width)
-        return
-    
+            return []
+        moved = []
+        if grating is not None and self.set_grating(grating):
+            moved.append("grating")
+        if wavelength is not None and self.set_wavelength(wavelength):
+            moved.append("wavelength")
+        for slit, width in (slits or {}).items():
+            if self.set_slit_width(slit, width):
+                moved.append(slit)
+        return moved
+
+    # ===== ASYNC MOVES =====
+
+    def _submit(self,func,*args,**kwargs):
+        future = self.executor.submit(func, *args, **kwargs)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return future
+
+    def set_wavelength_async(self,wavelength):
+        return self._submit(self.set_wavelength, wavelength)
+
+    def set_grating_async(self,grating,force=False):
+        return self._submit(self.set_grating, grating, force)
+
+    def set_slit_width_async(self,slit,width):
+        return self._submit(self.set_slit_width, slit, width)
+
+    def apply_async(self,wavelength=None,grating=None,slits=None):
+        """
+        Same as apply() but returns at once with a concurrent.futures.Future (result = list of moved settings)
+        """
+        return self._submit(self.apply, wavelength=wavelength, grating=grating, slits=slits)
+
+    def is_moving(self):
+        return bool(self._pending) or self.moves > 0
+
+    def wait_idle(self,timeout=None):
+        """
+        Block until all queued moves are done
+        """
+        for future in list(self._pending):
+            try:
+                future.result(timeout)
+            except Exception as e:
+                print(f"Spectrometer move failed: {e}")
+
+    def get_axis(self,hstart,hend,hbin,n_pixels,pixel_width):
+        """
+        Wavelength (nm) and Raman shift (1/cm) of every spectrum point for camera columns hstart..hend binned by hbin
+        n_pixels, pixel_width (m): detector width, only used when the axis is not cached yet
+        None while the spectrometer moves (the position is not known yet), callers fall back to pixels
+        """
+        with self._lock:
+            if not self.spec or self.moves:
+                return None
+            key = (self.grating, self.wavelength, (hstart, hend), hbin)
+            return self.calibration.get(key, lambda: self._column_wavelengths(n_pixels, pixel_width))
+
+    def _column_wavelengths(self,n_pixels,pixel_width):
+        # calibration polynomial evaluated by the Shamrock for every column
+        self.spec.set_number_pixels(n_pixels)
+        self.spec.set_pixel_width(pixel_width)
+        return self.spec.get_calibration()
+
     def get_default_settings(self,save_path=Path("./spec_params.txt")):
 
         if not self.spec:
             return
-        
+
         info = {}
 
-        info["wavelength limits"] = self.spec.get_wavelength_limits
+        info["wavelength limits"] = self.spec.get_wavelength_limits()
+        info["state"] = self.get_state()
 
         readable_text="=== Andor Shamrock Spectrometer Parameters ===\n"
         readable_text+=pformat(info, indent=2, width=120)
 
         with open(save_path, "w") as f:
-            f.write(readable_text)
\ No newline at end of file
+            f.write(readable_text)
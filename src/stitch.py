@@ -0,0 +1,68 @@
+import numpy as np
+
+
+def plan_windows(start, stop, span, overlap=0.15):
+    """
+    Centre wavelengths (m) of the windows needed to cover start..stop (m)
+    span: width of one window (m), overlap: fraction of a window shared with the next one
+    """
+    if stop <= start:
+        raise ValueError("Stitched range must have stop > start")
+    if not 0 <= overlap < 1:
+        raise ValueError("Overlap must be in [0, 1)")
+    step = span * (1 - overlap)
+    n = max(1, int(np.ceil((stop - start - span) / step - 1e-9)) + 1)
+    first = start + span / 2
+    if n == 1:
+        return np.array([(start + stop) / 2])
+    step = (stop - start - span) / (n - 1)     # spread the windows evenly, overlap is at least the requested one
+    return first + step * np.arange(n)
+
+
+def match_scale(x_ref, y_ref, x, y):
+    """
+    Least squares factor bringing y onto y_ref where both windows overlap (1 if they don't)
+    """
+    lo, hi = max(x_ref[0], x[0]), min(x_ref[-1], x[-1])
+    inside = (x >= lo) & (x <= hi)
+    if inside.sum() < 2:
+        return 1.0
+    ref = np.interp(x[inside], x_ref, y_ref)
+    own = y[inside]
+    denom = np.dot(own, own)
+    return float(np.dot(ref, own) / denom) if denom > 0 else 1.0
+
+
+def glue(windows, match=True):
+    """
+    windows: list of (wavelength, spectrum) in increasing wavelength order, each axis increasing
+    Every window is scaled onto the previous one in their overlap (intensity matching, match=True),
+    then the overlaps are cross-faded linearly.
+    Returns (wavelength, spectrum, scales)
+    """
+    x_out = np.asarray(windows[0][0], dtype=np.float64)
+    y_out = np.asarray(windows[0][1], dtype=np.float64)
+    scales = [1.0]
+
+    for x, y in windows[1:]:
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        scale = match_scale(x_out, y_out, x, y) if match else 1.0
+        y = y * scale
+        scales.append(scale)
+
+        lo, hi = x[0], x_out[-1]
+        if hi <= lo:    # no overlap, just append
+            x_out = np.concatenate([x_out, x])
+            y_out = np.concatenate([y_out, y])
+            continue
+
+        # overlap is resampled on the new window's pixels, weight goes 0 -> 1 across it
+        inside = x <= hi
+        w = (x[inside] - lo) / (hi - lo)
+        blended = (1 - w) * np.interp(x[inside], x_out, y_out) + w * y[inside]
+        keep = x_out < lo
+        x_out = np.concatenate([x_out[keep], x])
+        y_out = np.concatenate([y_out[keep], blended, y[~inside]])
+
+    return x_out, y_out, scales
@@ -0,0 +1,165 @@
+import json
+import zipfile
+import importlib.util
+import numpy as np
+from pathlib import Path
+from lazy import LazyModule
+
+# HDF5 is optional, npz container works with numpy only; imported when the first session file is opened
+h5py = LazyModule("h5py") if importlib.util.find_spec("h5py") else None
+
+
+class StorageBackend:
+    """
+    One file per session, one record per acquisition.
+    Records are addressed by the acquisition timestamp, save_meta fields are stored next to the data.
+    flush() after every record puts it on disk, so a crash during a long run only loses the record being written.
+    frame can be None for spectrum-only records (e.g. stitched spectra)
+    axis: optional dict of 1-D arrays (e.g. wavelength_nm, raman_shift_cm1) saved next to the spectrum
+    """
+    ext = ""
+
+    def __init__(self, path, compression=None):
+        self.path = Path(path).with_suffix(self.ext)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self._names = {}    # timestamp -> latest record name (timestamps can repeat within one second)
+        self._used = set()
+
+    def _record_name(self, key):
+        name = str(key)
+        n = 1
+        while name in self._used:
+            name = f"{key}_{n}"
+            n += 1
+        self._names[key] = name
+        self._used.add(name)
+        return name
+
+    def write_data(self, key, frame, spectrum, axis=None):
+        raise NotImplementedError
+
+    def write_meta(self, key, meta):
+        raise NotImplementedError
+
+    def flush(self):
+        """
+        Make everything written so far readable from the file on disk
+        """
+        pass
+
+    def close(self):
+        pass
+
+    def size(self):
+        """
+        Bytes on disk for this session
+        """
+        return self.path.stat().st_size if self.path.exists() else 0
+
+
+class HDF5Storage(StorageBackend):
+    """
+    Session stored as an HDF5 file: /<timestamp>/frame, /<timestamp>/spectrum
+    Frames are chunked by rows so partial reads and compression stay cheap, meta is kept as group attributes.
+    """
+    ext = ".h5"
+
+    def __init__(self, path, compression=None, chunk_rows=64):
+        super().__init__(path, compression)
+        self.chunk_rows = chunk_rows
+        self.file = h5py.File(self.path, "a")
+        self._used = set(self.file.keys())
+
+    def _dataset(self, group, name, data):
+        data = np.asarray(data)
+        if data.ndim == 0 or data.size == 0:
+            return group.create_dataset(name, data=data)
+        chunks = (min(self.chunk_rows, data.shape[0]),) + data.shape[1:]
+        return group.create_dataset(name, data=data, chunks=chunks, compression=self.compression)
+
+    def write_data(self, key, frame, spectrum, axis=None):
+        group = self.file.create_group(self._record_name(key))
+        if frame is not None:
+            self._dataset(group, "frame", frame)
+        if spectrum is not None:
+            self._dataset(group, "spectrum", spectrum)
+        for name, values in (axis or {}).items():
+            group.create_dataset(name, data=values)
+
+    def write_meta(self, key, meta):
+        group = self.file.require_group(self._names.get(key, str(key)))
+        for k, v in meta.items():
+            if v is None or isinstance(v, (dict, list, tuple)):
+                v = json.dumps(v)   # attributes only hold scalars / arrays
+            group.attrs[k] = v
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class NpzStorage(StorageBackend):
+    """
+    Session stored as an .npz container (readable with np.load).
+    Every record is appended as separate <timestamp>/frame.npy, <timestamp>/spectrum.npy entries, meta as <timestamp>/meta.json
+    The zip directory is only written on close, flush() closes and reopens the container to write it.
+    Appending starts where the old directory was, so a crash in the middle of a write can still leave the
+    whole file unreadable by np.load (recoverable with zip repair tools): use h5 for long unattended runs.
+    """
+    ext = ".npz"
+
+    def __init__(self, path, compression=None):
+        super().__init__(path, compression)
+        self.mode = zipfile.ZIP_DEFLATED if compression else zipfile.ZIP_STORED
+        self.file = zipfile.ZipFile(self.path, "a", compression=self.mode, allowZip64=True)
+        self._used = {n.split("/")[0] for n in self.file.namelist()}
+
+    def _write_array(self, name, data):
+        with self.file.open(name + ".npy", "w", force_zip64=True) as f:
+            np.lib.format.write_array(f, np.asarray(data), allow_pickle=False)
+
+    def write_data(self, key, frame, spectrum, axis=None):
+        name = self._record_name(key)
+        if frame is not None:
+            self._write_array(f"{name}/frame", frame)
+        if spectrum is not None:
+            self._write_array(f"{name}/spectrum", spectrum)
+        for axis_name, values in (axis or {}).items():
+            self._write_array(f"{name}/{axis_name}", values)
+
+    def write_meta(self, key, meta):
+        name = self._names.get(key, str(key))
+        self.file.writestr(f"{name}/meta.json", json.dumps(meta, indent=2))
+
+    def flush(self):
+        if self.file:
+            self.file.close()       # writes the directory
+            self.file = zipfile.ZipFile(self.path, "a", compression=self.mode, allowZip64=True)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+BACKENDS = {
+    "h5": HDF5Storage,
+    "npz": NpzStorage,
+}
+
+
+def open_storage(path, backend="h5", compression=None):
+    """
+    Open (or append to) a session file with the selected backend.
+    compression: None | "gzip" | "lzf" (h5) or any truthy value for deflate (npz)
+    """
+    if backend == "h5" and h5py is None:
+        print("h5py not installed, falling back to npz storage")
+        backend = "npz"
+        compression = bool(compression)
+    return BACKENDS[backend](path, compression=compression)
@@ -0,0 +1,135 @@
+import threading
+import time
+import numpy as np
+
+
+SAMPLE_DTYPE = np.dtype([
+    ("time", "f8"),             # time.time() of the sample
+    ("temperature", "f4"),      # C
+    ("temp_status", "u1"),      # index in TEMP_STATUSES
+    ("acq_status", "u1"),       # index in ACQ_STATUSES
+])
+TEMP_STATUSES = ["unknown", "off", "not_reached", "not_stabilized", "stabilized", "drifted"]
+ACQ_STATUSES = ["unknown", "idle", "acquiring", "temp_cycle"]
+
+
+def _code(statuses, status):
+    return statuses.index(status) if status in statuses else 0
+
+
+class TelemetrySampler:
+    """
+    Samples camera temperature, temperature status and acquisition status on its own thread.
+
+    read() is called once per interval (and on request()) and must return (temperature, temp_status, acq_status).
+    Samples go into a fixed-size ring (history samples of SAMPLE_DTYPE), consumers read the cached values,
+    so the SDK is asked once per interval however many readers there are (GUI, cooling, dark keys, archive).
+    """
+
+    def __init__(self, read, interval=1.0, history=3600):
+        self.read = read
+        self.interval = interval
+        self.ring = np.zeros(history, dtype=SAMPLE_DTYPE)
+        self.count = 0              # samples taken since start, ring position is count % history
+        self.errors = 0
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._new_sample = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._thread = None
+        self._running = False
+
+    # ===== THREAD =====
+
+    def start(self):
+        if self._running:
+            return
+        self.count = 0
+        self._running = True
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._run, name="TelemetrySampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        with self._lock:
+            self._new_sample.notify_all()   # release wait_next callers
+
+    def is_running(self):
+        return self._running
+
+    def request(self):
+        """
+        Take the next sample now instead of waiting for the interval (e.g. right after a setpoint change)
+        """
+        self._wake.set()
+
+    def _run(self):
+        while self._running:
+            self._sample()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _sample(self):
+        try:
+            temperature, temp_status, acq_status = self.read()
+        except Exception as e:     # camera busy / disconnecting, keep the last good sample
+            self.errors += 1
+            self.last_error = e
+            return
+        with self._lock:
+            self.ring[self.count % len(self.ring)] = (time.time(), temperature,
+                                                     _code(TEMP_STATUSES, temp_status), _code(ACQ_STATUSES, acq_status))
+            self.count += 1
+            self._new_sample.notify_all()
+
+    # ===== READING =====
+
+    def latest(self):
+        """
+        Newest sample as a dict (time, temperature, temp_status, acq_status), None before the first one
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            sample = self.ring[(self.count - 1) % len(self.ring)].copy()
+        return {"time": float(sample["time"]), "temperature": float(sample["temperature"]),
+                "temp_status": TEMP_STATUSES[sample["temp_status"]], "acq_status": ACQ_STATUSES[sample["acq_status"]]}
+
+    def age(self):
+        """
+        Seconds since the newest sample (inf before the first one)
+        """
+        sample = self.latest()
+        return np.inf if sample is None else time.time() - sample["time"]
+
+    def wait_next(self, timeout=None):
+        """
+        Block until a sample newer than the current one arrives, returns it (None on timeout / stopped sampler)
+        """
+        with self._lock:
+            seen = self.count
+            if not self._new_sample.wait_for(lambda: self.count > seen or not self._running, timeout):
+                return None
+        return self.latest() if self.count > seen else None
+
+    def history(self, seconds=None):
+        """
+        Stored samples, oldest first (copy), only the last `seconds` if given
+        """
+        with self._lock:
+            size = len(self.ring)
+            if self.count <= size:
+                samples = self.ring[:self.count].copy()
+            else:
+                start = self.count % size
+                samples = np.concatenate([self.ring[start:], self.ring[:start]])
+        if seconds is not None and len(samples):
+            samples = samples[samples["time"] >= samples["time"][-1] - seconds]
+        return samples
@@ -0,0 +1,86 @@
+import queue
+import threading
+import time
+from collections import deque
+
+
+class AsyncWriter:
+    """
+    Runs save jobs on a background thread so acquisition never waits on the disk.
+    submit() blocks while the queue is full (backpressure), flush() waits until everything queued is written.
+    Errors are collected and passed to on_error (called from the writer thread).
+    """
+
+    def __init__(self, maxsize=8, on_error=None, history=256):
+        self.queue = queue.Queue(maxsize)
+        self.on_error = on_error
+        self.errors = []
+        self.latencies = deque(maxlen=history)  # seconds per job, last `history` jobs
+        self.written = 0
+        self.max_depth = 0
+        self.blocked_s = 0.0    # total time submit() waited on a full queue
+        self.closed = False
+
+        self._thread = threading.Thread(target=self._run, name="AsyncWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, timeout=None, **kwargs):
+        """
+        Queue func(*args, **kwargs) for writing.
+        Raises queue.Full if the queue is still full after `timeout` seconds (None waits forever)
+        """
+        if self.closed:
+            raise RuntimeError("Writer is closed")
+
+        t0 = time.perf_counter()
+        self.queue.put((func, args, kwargs), timeout=timeout)
+        self.blocked_s += time.perf_counter() - t0
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                self.queue.task_done()
+                return
+
+            func, args, kwargs = job
+            t0 = time.perf_counter()
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                self.errors.append(e)
+                if self.on_error:
+                    self.on_error(e)
+            finally:
+                self.latencies.append(time.perf_counter() - t0)
+                self.written += 1
+                self.queue.task_done()
+
+    def flush(self):
+        """
+        Barrier: returns once every job submitted so far is done
+        """
+        self.queue.join()
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        self.queue.put(None)
+        self._thread.join()
+
+    def metrics(self):
+        lat = sorted(self.latencies)
+        pct = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))] * 1e3 if lat else 0.0
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "written": self.written,
+            "errors": len(self.errors),
+            "blocked_s": self.blocked_s,
+            "latency_ms_p50": pct(0.50),
+            "latency_ms_p95": pct(0.95),
+            "latency_ms_max": lat[-1] * 1e3 if lat else 0.0,
+        }
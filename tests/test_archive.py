@@ -0,0 +1,88 @@
+import json
+import numpy as np
+import pytest
+from archive import FrameArchive
+
+
+META = {"spectrometer": {"grating": 1, "center_wavelength_m": 5e-07}, "axis": {"wavelength_nm": (480.0, 520.0)}}
+
+
+def frames(count, shape=(4, 8)):
+    return np.arange(count * np.prod(shape), dtype=np.uint16).reshape((count,) + shape)
+
+
+def test_append_close_and_read(tmp_path):
+    archive = FrameArchive(tmp_path / "series", shape=(4, 8), grow_by=2, meta=META)
+    for i, frame in enumerate(frames(5)):
+        archive.append(frame, timestamp=i, exposure=0.1)
+    archive.close()
+
+    stored = FrameArchive.open(tmp_path / "series")
+    assert len(stored) == 5
+    assert np.array_equal(stored[:], frames(5))
+    assert stored.index["timestamp"].tolist() == [0, 1, 2, 3, 4]
+    assert stored.meta == json.loads(json.dumps(META))
+    assert (tmp_path / "series.frames").stat().st_size == 5 * 4 * 8 * 2      # cut down to the stored frames
+
+
+def test_reopen_continues_with_same_meta(tmp_path):
+    archive = FrameArchive(tmp_path / "series", shape=(4, 8), meta=META)
+    archive.append(frames(1)[0], timestamp=0)
+    archive.close()
+
+    archive = FrameArchive(tmp_path / "series", shape=(4, 8), meta=META)     # tuples in meta are stored as lists
+    archive.append(frames(2)[1], timestamp=1)
+    archive.close()
+    assert np.array_equal(FrameArchive.open(tmp_path / "series")[:], frames(2))
+
+
+def test_reopen_with_other_meta_raises(tmp_path):
+    FrameArchive(tmp_path / "series", shape=(4, 8), meta=META).close()
+    moved = {**META, "spectrometer": {"grating": 1, "center_wavelength_m": 6e-07}}
+
+    with pytest.raises(ValueError):
+        FrameArchive(tmp_path / "series", shape=(4, 8), meta=moved)
+    with pytest.raises(ValueError):
+        FrameArchive(tmp_path / "series", shape=(2, 8), meta=META)
+    assert FrameArchive.open(tmp_path / "series").meta["spectrometer"]["center_wavelength_m"] == 5e-07
+
+
+def test_empty_readonly_archive(tmp_path):
+    FrameArchive(tmp_path / "series", shape=(4, 8)).close()
+    stored = FrameArchive.open(tmp_path / "series")
+    assert stored[:].shape == (0, 4, 8)
+    assert len(stored.index) == 0
+
+
+def test_stitched_windows_get_their_own_series(tmp_path, monkeypatch):
+    """
+    Both windows of a stitched kinetic run start within the same second, each must get its own archive
+    with the spectrometer position and axis it was taken at
+    """
+    monkeypatch.chdir(tmp_path)     # the models write ./data and parameter files
+    from controller import RamanCameraController
+    from test_cam import TestCameraModel
+    from test_spec import TestSpectrometerModel
+
+    controller = RamanCameraController(None, camera=TestCameraModel(realtime=False, seed=0),
+                                       spec=TestSpectrometerModel(realtime=False))
+    controller.connect_cam()
+    controller.connect_spec()
+    try:
+        wavelength = controller.get_spectral_axis()["wavelength_nm"]
+        span = abs(wavelength[-1] - wavelength[0]) * 1e-9
+        start = wavelength.mean() * 1e-9
+        controller.acquire_stitched({"acq_mode": "kinetic", "accum_n": 3, "read_mode": "fvb", "archive": True},
+                                    start, start + 1.5 * span, save=False)
+        controller.camera.close_archive()
+    finally:
+        controller.disconnect_cam()
+        controller.disconnect_spec()
+
+    headers = [json.loads(path.read_text()) for path in sorted((tmp_path / "data").glob("series_*.json"))]
+    assert [header["count"] for header in headers] == [3, 3]
+    centres = [header["meta"]["spectrometer"]["center_wavelength_m"] for header in headers]
+    assert centres[0] != centres[1]
+    for header, centre in zip(headers, centres):
+        axis = np.array(header["meta"]["axis"]["wavelength_nm"])
+        assert abs(axis.mean() - centre * 1e9) < 1
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from baseline import BaselineCorrector
+
+
+N = 1024
+PEAKS = ((200, 1500, 4.0), (450, 800, 6.0), (520, 2500, 3.0), (800, 1200, 5.0))     # column, height, hwhm
+
+
+def fluorescence(n=N, scale=1.0):
+    """
+    Smooth cubic background, the shape a broad fluorescence band has over a Raman window
+    """
+    t = np.linspace(-1, 1, n)
+    return scale * (3000 + 1200 * t - 900 * t ** 2 + 400 * t ** 3)
+
+
+def raman_peaks(n=N):
+    x = np.arange(n)
+    return sum(h / (1 + ((x - c) / w) ** 2) for c, h, w in PEAKS)
+
+
+# both methods settle on the lower edge of the noise (sigma 5), asls also bends a little at the chip ends
+@pytest.mark.parametrize("method, tolerance", [("poly", 15.0), ("asls", 40.0)])
+def test_known_baseline_removed(method, tolerance):
+    rng = np.random.default_rng(0)
+    background = fluorescence()
+    spectrum = background + raman_peaks() + rng.normal(0, 5, N)
+
+    corrector = BaselineCorrector(method=method)
+    baseline = corrector.baseline(spectrum)
+    corrected = corrector.correct(spectrum)
+
+    assert baseline.shape == spectrum.shape
+    assert np.abs(baseline - background).max() < tolerance
+    for column, height, _ in PEAKS:
+        assert abs(corrected[column] - height) < 0.05 * height + tolerance
+    assert np.allclose(corrected, spectrum - baseline)
+
+
+@pytest.mark.parametrize("method", ["poly", "asls"])
+def test_stack_matches_single_spectra(method):
+    rng = np.random.default_rng(1)
+    stack = np.stack([fluorescence(scale=s) + raman_peaks() + rng.normal(0, 5, N) for s in (0.5, 1.0, 2.0)])
+
+    corrector = BaselineCorrector(method=method)
+    together = corrector.baseline(stack)
+    single = np.stack([corrector.baseline(spectrum) for spectrum in stack])
+
+    assert together.shape == stack.shape
+    assert np.allclose(together, single, atol=1e-6 * np.abs(single).max())
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        BaselineCorrector(method="spline").baseline(np.zeros(16))
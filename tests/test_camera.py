@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import test_cam     # not "from test_cam import ...", pytest would try to collect the Test* class
+
+
+@pytest.fixture
+def camera(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)     # the model writes ./data and cam_params_sim.txt
+    from controller import RamanCameraController
+    controller = RamanCameraController(None, camera=test_cam.TestCameraModel(realtime=False, seed=0), spec=object())
+    controller.connect_cam()
+    yield controller.camera
+    controller.disconnect_cam()
+
+
+def test_hardware_accumulate_reads_the_full_32_bit_sum(camera):
+    camera.set_spectrum_mode("fvb")
+    single = camera.acquire_single(process=False)["frame"].astype(np.float64)
+    assert single.min() > 65535 / 200     # 200 of these overflow 16 bit
+
+    raw = camera.acquire_accumulate(200, hardware=True, process=False)
+
+    assert raw["frame"].max() > 65535
+    assert np.allclose(raw["accumulator"].mean, single, rtol=0.05)
+    assert camera.cam._default_image_dtype == "<u2"     # restored after the readout
+    assert camera.acquire_single(process=False)["frame"].dtype == np.uint16
+
+
+def test_16_bit_readout_saturates_like_the_sdk(camera):
+    camera.cam.setup_accum_mode(200)
+    camera.cam.start_acquisition()
+    camera.cam.wait_for_frame()
+    frame = camera.cam.read_newest_image()
+    camera.cam.stop_acquisition()
+    camera.settings.invalidate("acq_mode")
+
+    assert frame.dtype == np.uint16
+    assert frame.max() == 65535
+
+
+@pytest.mark.parametrize("num_frames", [0, 5])
+def test_snap_and_grab_leave_the_applied_mode_right(camera, num_frames):
+    camera.settings.apply(acq_mode="kinetic")
+    frames = camera.simple_acq(num_frames)
+
+    assert frames.shape[0] == (5 if num_frames else camera.cam.get_data_dimensions()[0])
+    assert camera.settings.applied["acq_mode"] == camera.cam.get_acquisition_mode() == "cont"
+    assert camera.settings.apply(acq_mode="kinetic") == ["acq_mode"]     # pushed again, not skipped
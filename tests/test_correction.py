@@ -0,0 +1,83 @@
+import numpy as np
+from correction import ResponseCorrection
+
+
+def pixel_gain(rows=32, cols=64, seed=0, spread=0.2):
+    return np.random.default_rng(seed).uniform(1 - spread, 1 + spread, (rows, cols))
+
+
+def test_flat_restores_uniform_image_with_roi_and_binning():
+    gain = pixel_gain()
+    corr = ResponseCorrection()
+    corr.set_flat(gain)
+    window = (8, 40, 4, 28, 2, 4)      # hstart, hend, vstart, vend, hbin, vbin
+    hstart, hend, vstart, vend, hbin, vbin = window
+
+    # uniform light of 100 counts per pixel, read out binned
+    chip = 100 * corr.flat
+    frame = chip[vstart:vend, hstart:hend].reshape(6, vbin, 16, hbin).sum(axis=(1, 3))
+    frame_map, spectrum_map = corr.get_maps("roi", "image", window, frame.shape)
+
+    assert np.allclose(corr.apply(frame.copy(), frame_map), 100 * hbin * vbin)     # float data is corrected in place
+    assert np.allclose(corr.apply(frame.sum(axis=0), spectrum_map), 100 * hbin * vbin * 6)
+
+
+def test_flat_fvb_and_single_track():
+    corr = ResponseCorrection()
+    corr.set_flat(pixel_gain())
+    chip = 50 * corr.flat
+
+    _, fvb_map = corr.get_maps("fvb", "fvb", (), (1, 64))
+    assert np.allclose(corr.apply(chip.sum(axis=0), fvb_map), 50 * 32)
+
+    track = chip[12:18].sum(axis=0, keepdims=True)     # centre 15, width 6
+    frame_map, _ = corr.get_maps("track", "single_track", (15, 6), (1, 64))
+    assert np.allclose(corr.apply(track, frame_map), 50 * 6)
+
+
+def test_response_divides_out_the_instrument_curve():
+    corr = ResponseCorrection()
+    wavelength = np.linspace(500, 900, 41)
+    response = 0.2 + np.exp(-0.5 * ((wavelength - 700) / 80) ** 2)
+    corr.set_response(wavelength[::-1], response[::-1])    # order of the file does not matter
+    axis = {"wavelength_nm": np.linspace(600, 800, 64)}
+
+    true = np.full(64, 1000.0)
+    measured = true * np.interp(axis["wavelength_nm"], wavelength, response) / response.max()
+    _, spectrum_map = corr.get_maps("g1", "fvb", (), (1, 64), axis)
+
+    assert np.allclose(corr.apply(measured, spectrum_map), true)
+
+
+def test_derive_flat_recovers_pixel_gain():
+    gain = pixel_gain(8, 256, seed=1, spread=0.02)     # a few % pixel to pixel, like a real CCD
+    x = np.arange(256)
+    lamp = (1000 + 500 * np.sin(x / 150))[None, :] * gain    # smooth continuum times pixel gain
+    flat = ResponseCorrection().derive_flat(lamp, smooth=15)
+
+    # the continuum drops out: same flat as from the gain alone (the moving average also sees the gain itself)
+    inner = slice(20, -20)
+    expected = ResponseCorrection().derive_flat(gain, smooth=15)
+    assert np.abs(flat[:, inner] / expected[:, inner] - 1).max() < 1e-3
+    # and the flat follows the pixel gain to within the averaging error
+    assert np.abs(flat[:, inner] / gain[:, inner] * gain.mean() - 1).max() < 0.02
+
+
+def test_maps_are_cached_and_read_only():
+    corr = ResponseCorrection()
+    corr.set_flat(pixel_gain())
+    maps = corr.get_maps("fvb", "fvb", (), (1, 64))
+    assert corr.get_maps("fvb", "fvb", (), (1, 64))[0] is maps[0]
+    assert not maps[0].flags.writeable
+
+    corr.set_flat(pixel_gain(seed=2))       # new flat, maps rebuilt
+    assert corr.get_maps("fvb", "fvb", (), (1, 64))[0] is not maps[0]
+
+
+def test_apply_in_place_only_for_writable_float():
+    m = np.full(4, 2.0, dtype=np.float32)
+    data = np.ones(4)
+    assert ResponseCorrection.apply(data, m) is data
+    counts = np.ones(4, dtype=np.uint16)
+    out = ResponseCorrection.apply(counts, m)
+    assert out is not counts and out.dtype.kind == "f" and counts[0] == 1
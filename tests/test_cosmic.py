@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from accumulate import StreamingAccumulator
+from cosmic import CosmicRayFilter
+
+
+BIAS = 500.0
+READ_NOISE = 5.0
+
+
+def raman_scene(rows=64, cols=256):
+    """
+    Signal above bias: weak background, a bright line and a weak line, both straight along the slit
+    """
+    x = np.arange(cols)
+    line = 20 + 4000 * np.exp(-0.5 * ((x - 80) / 2.0) ** 2) + 300 * np.exp(-0.5 * ((x - 170) / 3.0) ** 2)
+    return np.tile(line, (rows, 1))
+
+
+def noisy(scene, rng):
+    """
+    Shot noise of the signal (gain 1 e/count) + read noise on the bias, as the filter's noise model assumes
+    """
+    return BIAS + rng.poisson(scene) + rng.normal(0, READ_NOISE, scene.shape)
+
+
+def test_clean_frame_finds_injected_spike():
+    rng = np.random.default_rng(1)
+    frame = noisy(raman_scene(), rng)
+    frame[20, 40] += 3000
+    frame[45, 81] += 30000      # on top of the bright line
+
+    cleaned, mask = CosmicRayFilter().clean_frame(frame)
+
+    assert set(zip(*np.nonzero(mask))) == {(20, 40), (45, 81)}
+    assert abs(cleaned[20, 40] - BIAS - 20) < 30
+    assert abs(cleaned[45, 81] - frame[44:47:2, 81].mean()) < 1
+
+
+def test_clean_frame_keeps_clean_lines():
+    rng = np.random.default_rng(2)
+    _, mask = CosmicRayFilter().clean_frame(noisy(raman_scene(), rng))
+    assert not mask.any()
+
+
+def test_clean_frame_spectrum():
+    rng = np.random.default_rng(3)
+    spectrum = noisy(raman_scene(rows=1)[0] * 50, rng)     # row-summed levels
+    spectrum[200] *= 4
+
+    _, mask = CosmicRayFilter().clean_frame(spectrum)
+
+    assert np.flatnonzero(mask).tolist() == [200]
+
+
+@pytest.mark.parametrize("method", ["median", "sigma_clip"])
+def test_clean_stack(method):
+    rng = np.random.default_rng(4)
+    scene = raman_scene(rows=16)
+    stack = np.stack([noisy(scene, rng) for _ in range(8)])
+    stack[3, 5, 80] += 5000
+    stack[6, 10, 120] += 800
+
+    cleaned, mask = CosmicRayFilter(method=method).clean_stack(stack)
+
+    assert set(zip(*np.nonzero(mask))) == {(3, 5, 80), (6, 10, 120)}
+    assert abs(cleaned[3, 5, 80] - BIAS - scene[5, 80]) < 5 * np.sqrt(scene[5, 80])
+
+
+def test_clean_stack_needs_three_frames():
+    with pytest.raises(ValueError):
+        CosmicRayFilter().clean_stack(np.zeros((2, 4, 4)))
+
+
+def test_clean_accumulated_matches_clean_sum():
+    rng = np.random.default_rng(5)
+    scene = raman_scene(rows=16)
+    frames = [noisy(scene, rng) for _ in range(10)]
+    clean_total = np.sum(frames, axis=0)
+    frames[7][3, 60] += 10000
+
+    acc = StreamingAccumulator(track_max=True)
+    for frame in frames:
+        acc.add(frame)
+    total, mask = CosmicRayFilter().clean_accumulated(acc)
+
+    assert np.flatnonzero(mask).tolist() == [3 * scene.shape[1] + 60]
+    assert abs(total[3, 60] - clean_total[3, 60]) < 5 * np.sqrt(clean_total[3, 60])
+    assert np.array_equal(total[~mask], clean_total[~mask])
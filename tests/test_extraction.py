@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from extraction import SpectrumExtractor
+
+
+COEFFS = (0.02, 4e-4)       # up to ~3 px of smile over the chip
+CENTER = 64
+LINES = (60, 180)
+
+
+def curved_lines(rows=128, cols=256, coeffs=COEFFS, vbin=1):
+    """
+    Narrow gaussian lines whose column follows shift(y) = c1 * d + c2 * d^2 (d = unbinned row - CENTER)
+    """
+    y = (np.arange(rows) + 0.5) * vbin - 0.5
+    d = y - CENTER
+    shift = sum(c * d ** (k + 1) for k, c in enumerate(coeffs))
+    x = np.arange(cols)
+    frame = np.full((rows, cols), 10.0)
+    for column in LINES:
+        frame += 1000 * np.exp(-0.5 * ((x[None, :] - column - shift[:, None]) / 1.5) ** 2)
+    return frame
+
+
+def test_calibrate_recovers_curvature():
+    ext = SpectrumExtractor(center_row=CENTER)
+    coeffs = ext.calibrate(curved_lines(), LINES)
+
+    assert np.allclose(coeffs, COEFFS, rtol=0.05)
+    assert ext.curved()
+
+
+def test_calibrate_binned_window():
+    ext = SpectrumExtractor(center_row=CENTER)
+    coeffs = ext.calibrate(curved_lines(rows=64, vbin=2), LINES, window=(0, 256, 0, 128, 1, 2))
+
+    assert np.allclose(coeffs, COEFFS, rtol=0.05)
+
+
+def test_resample_straightens_lines():
+    frame = curved_lines()
+    ext = SpectrumExtractor(COEFFS, center_row=CENTER)
+
+    image = ext.resample(frame)
+    assert (image[:, 40:100].argmax(axis=1) + 40 == LINES[0]).all()
+    assert (image[:, 140:220].argmax(axis=1) + 140 == LINES[1]).all()
+
+    # the curvature corrected peak is nearly as high as the sum of straight lines, the plain sum is smeared out
+    straight = curved_lines(coeffs=(0.0,)).sum(axis=0)
+    corrected = ext.extract(frame)
+    plain = SpectrumExtractor().extract(frame)
+    assert corrected.dtype == np.float64
+    assert corrected[LINES[0]] > 0.95 * straight[LINES[0]]
+    assert plain[LINES[0]] < 0.9 * straight[LINES[0]]
+    assert np.isclose(corrected.sum(), frame.sum(), rtol=0.01)     # interpolation keeps the flux
+
+
+def test_tracks_are_row_sums():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 65535, (32, 16), dtype=np.uint16)
+    tracks = [(0, 4), (10, 10), (12, 20), (28, 32)]
+
+    spectra = SpectrumExtractor().extract(frame, tracks=tracks)
+
+    assert spectra.dtype == np.int64
+    expected = [frame[first:end].sum(axis=0, dtype=np.int64) for first, end in tracks]
+    assert np.array_equal(spectra, expected)
+    assert np.array_equal(SpectrumExtractor().extract(frame), frame.sum(axis=0, dtype=np.int64))
+
+
+@pytest.mark.parametrize("tracks", [[(4, 2)], [(0, 8), (6, 12)], [(20, 40)]])
+def test_bad_tracks(tracks):
+    with pytest.raises(ValueError):
+        SpectrumExtractor().extract(np.zeros((32, 16), dtype=np.uint16), tracks=tracks)
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from peaks import PeakAnalyzer
+
+
+N = 512
+NOISE = 3.0
+
+
+def lorentzian(x, centre, fwhm, height):
+    return height / (1 + ((x - centre) / (fwhm / 2)) ** 2)
+
+
+def gaussian(x, centre, fwhm, height):
+    return height * np.exp(-4 * np.log(2) * ((x - centre) / fwhm) ** 2)
+
+
+def spectrum_with(peaks, rng, offset=100.0, eta=1.0):
+    """
+    offset + pseudo-Voigt peaks (centre, fwhm, height) + gaussian noise
+    """
+    x = np.arange(N)
+    y = np.full(N, offset)
+    for centre, fwhm, height in peaks:
+        y += eta * lorentzian(x, centre, fwhm, height) + (1 - eta) * gaussian(x, centre, fwhm, height)
+    return y + rng.normal(0, NOISE, N)
+
+
+def test_lorentzian_recovers_centre_fwhm_height():
+    rng = np.random.default_rng(0)
+    truth = [(120.3, 6.0, 1000.0), (300.7, 4.0, 400.0)]
+    found = PeakAnalyzer(half_window=12).analyze(spectrum_with(truth, rng))
+
+    assert len(found) == 2
+    assert found["converged"].all()
+    for peak, (centre, fwhm, height) in zip(found, truth):
+        assert abs(peak["position"] - centre) < 0.05
+        assert abs(peak["fwhm"] - fwhm) < 0.05 * fwhm
+        assert abs(peak["height"] - height) < 0.05 * height
+        assert abs(peak["area"] - np.pi * height * fwhm / 2) < 0.1 * np.pi * height * fwhm / 2
+        assert peak["eta"] == 1
+
+
+def test_pseudo_voigt_recovers_mixing():
+    rng = np.random.default_rng(1)
+    found = PeakAnalyzer(profile="pseudo_voigt", half_window=12).analyze(spectrum_with([(250.4, 8.0, 2000.0)], rng, eta=0.4))
+
+    assert len(found) == 1
+    assert abs(found["position"][0] - 250.4) < 0.05
+    assert abs(found["fwhm"][0] - 8.0) < 0.3
+    assert abs(found["eta"][0] - 0.4) < 0.1
+    assert abs(found["offset"][0] - 100) < 20
+
+
+def test_stack_peaks_per_spectrum():
+    rng = np.random.default_rng(2)
+    centres = [100.2, 150.5, 200.8]
+    stack = np.stack([spectrum_with([(c, 5.0, 800.0)], rng) for c in centres])
+
+    found = PeakAnalyzer().analyze(stack)
+
+    assert found["spectrum"].tolist() == [0, 1, 2]
+    assert np.allclose(found["position"], centres, atol=0.05)
+
+
+def test_axis_units():
+    rng = np.random.default_rng(3)
+    y = spectrum_with([(200.5, 6.0, 1000.0)], rng)
+    axis = 1800 - 0.5 * np.arange(N)       # Raman shift falling along the chip, 0.5 cm-1 per pixel
+
+    pixels = PeakAnalyzer().analyze(y)
+    shifted = PeakAnalyzer().analyze(y, axis=axis)
+
+    assert shifted["column"][0] == pixels["column"][0]
+    assert abs(shifted["position"][0] - (1800 - 0.5 * pixels["column"][0])) < 1e-6
+    assert np.isclose(shifted["fwhm"][0], 0.5 * pixels["fwhm"][0])
+    assert np.isclose(shifted["area"][0], 0.5 * pixels["area"][0])
+
+
+def test_noise_only_has_no_peaks():
+    rng = np.random.default_rng(4)
+    stack = 100 + rng.normal(0, NOISE, (50, N))
+    assert len(PeakAnalyzer(nsigma=7).analyze(stack)) == 0
+    # the prominence compares extremes of the noise, at the default 5 sigma a stray detection is rare but possible
+    assert len(PeakAnalyzer().find(stack)[0]) < len(stack) / 4
+    sigma = PeakAnalyzer.noise(stack)
+    assert np.allclose(sigma, NOISE, rtol=0.2) and abs(sigma.mean() - NOISE) < 0.02 * NOISE
+
+
+def test_max_peaks_keeps_strongest():
+    rng = np.random.default_rng(5)
+    y = spectrum_with([(100, 5.0, 300.0), (200, 5.0, 1500.0), (300, 5.0, 800.0)], rng)
+
+    spectrum, column = PeakAnalyzer(max_peaks=2).find(y)
+
+    assert spectrum.tolist() == [0, 0]
+    assert column.tolist() == [200, 300]
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        PeakAnalyzer(profile="voigt")
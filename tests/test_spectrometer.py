@@ -0,0 +1,43 @@
+import time
+import numpy as np
+import test_spec     # not "from test_spec import ...", pytest would try to collect the Test* class
+
+
+def axis(spec):
+    return spec.get_axis(0, 1024, 1, 1024, 26e-6)
+
+
+def test_axis_does_not_wait_for_a_move():
+    spec = test_spec.TestSpectrometerModel(realtime=True)
+    spec.connect()
+    try:
+        before = axis(spec)
+        move = spec.set_wavelength_async(spec.wavelength + 50e-9)     # ~1 s on the simulated Shamrock
+        while not spec.moves:
+            time.sleep(0.001)
+
+        t0 = time.perf_counter()
+        assert axis(spec) is None      # position unknown while moving: pixels
+        assert spec.get_state()["wavelength"] == 500e-9
+        assert time.perf_counter() - t0 < 0.1
+        assert spec.is_moving()
+
+        assert move.result() is True
+        after = axis(spec)
+        assert spec.moves == 0
+        assert np.isclose(np.mean(after["wavelength_nm"]) - np.mean(before["wavelength_nm"]), 50, atol=1)
+    finally:
+        spec.disconnect()
+
+
+def test_skipped_move_keeps_the_axis():
+    spec = test_spec.TestSpectrometerModel(realtime=False)
+    spec.connect()
+    try:
+        before = axis(spec)
+        assert spec.set_wavelength(spec.wavelength) is False
+        assert spec.set_grating(spec.grating) is False
+        assert axis(spec) is before     # cached, nothing moved
+        assert spec.skipped_moves == 2
+    finally:
+        spec.disconnect()
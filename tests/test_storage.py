@@ -0,0 +1,66 @@
+import shutil
+import numpy as np
+import pytest
+from storage import open_storage
+
+
+PARAMS = {"exposure": 0.1, "hbin": 1, "vbin": 1, "roi": None, "temp": -80}
+
+
+def crash_copy(path, tmp_path):
+    """
+    The session file as a crash would leave it: copied while the writer still has it open
+    """
+    copy = tmp_path / ("crashed" + path.suffix)
+    shutil.copyfile(path, copy)
+    return copy
+
+
+def read_spectra(path):
+    if path.suffix == ".npz":
+        with np.load(path) as data:
+            return {name.split("/")[0]: data[name] for name in data.files if name.endswith("/spectrum")}
+    import h5py
+    with h5py.File(path, "r") as f:
+        return {name: f[name]["spectrum"][()] for name in f}
+
+
+@pytest.mark.parametrize("backend", ["npz", "h5"])
+def test_flushed_records_survive_a_crash(backend, tmp_path):
+    if backend == "h5":
+        pytest.importorskip("h5py")
+    storage = open_storage(tmp_path / "session", backend)
+    for ts in (100, 101):
+        storage.write_data(ts, np.zeros((4, 8), dtype=np.uint16), np.full(8, ts))
+        storage.write_meta(ts, {"timestamp": ts})
+        storage.flush()
+
+    spectra = read_spectra(crash_copy(storage.path, tmp_path))
+    assert sorted(spectra) == ["100", "101"]
+    assert spectra["101"].tolist() == [101] * 8
+
+    storage.write_data(102, None, np.full(8, 102))      # still appends after a flush
+    storage.close()
+    assert sorted(read_spectra(storage.path)) == ["100", "101", "102"]
+
+
+@pytest.mark.parametrize("backend", ["npz", "h5"])
+def test_saved_results_are_on_disk_before_close(backend, tmp_path, monkeypatch):
+    if backend == "h5":
+        pytest.importorskip("h5py")
+    monkeypatch.chdir(tmp_path)     # the camera model creates ./data
+    from controller import RamanCameraController
+    import test_cam
+    import test_spec
+
+    controller = RamanCameraController(None, camera=test_cam.TestCameraModel(realtime=False),
+                                       spec=test_spec.TestSpectrometerModel(realtime=False))
+    controller.camera.storage_backend = backend
+    controller.camera.set_save_path(tmp_path / "out")
+    controller.save_results(PARAMS, np.zeros((4, 8), dtype=np.uint16), np.arange(8))
+    controller.flush_writer()
+    assert controller.pop_write_errors() == []
+    try:
+        assert len(read_spectra(crash_copy(controller.camera.storage.path, tmp_path))) == 1
+    finally:
+        controller.close_writer()